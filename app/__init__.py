@@ -5,12 +5,14 @@ from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy # Import
 from flask_migrate import Migrate       # Import
 from flask_wtf.csrf import CSRFProtect
+from .sharding import ShardedSession
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize extensions (outside the factory function)
-db = SQLAlchemy()
+# Reads may go to a replica (app/db_routing.py), recipe tables to their user's shard (app/sharding.py)
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 migrate = Migrate()
 
 csrf = CSRFProtect() # Initialize CSRFProtect instance
@@ -18,17 +20,173 @@ csrf = CSRFProtect() # Initialize CSRFProtect instance
 def create_app():
     """Application Factory Function"""
     app = Flask(__name__)
+    # orjson when installed, the stdlib json module otherwise (JSON_USE_ORJSON=false forces the stdlib)
+    from .json_provider import JSONProvider
+    app.json = JSONProvider(app, use_orjson=os.getenv('JSON_USE_ORJSON', 'true').lower() in ('1', 'true', 'yes'))
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a_default_fallback_secret_key')
     db_url = os.getenv('DATABASE_URL')
     if not db_url:
         raise ValueError("DATABASE_URL environment variable not set.")
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Connection pool, for the primary and each replica (below). Only what is set is passed on,
+    # so unset options keep SQLAlchemy's defaults (pool_size 5, max_overflow 10, no pre-ping)
+    pool_options = {
+        'pool_size': ('DB_POOL_SIZE', int),          # Connections kept open per process
+        'max_overflow': ('DB_MAX_OVERFLOW', int),    # Extra connections allowed under load
+        'pool_timeout': ('DB_POOL_TIMEOUT', float),  # Seconds to wait for a free connection
+        'pool_recycle': ('DB_POOL_RECYCLE', int),    # Reconnect connections older than this (seconds)
+        'pool_pre_ping': ('DB_POOL_PRE_PING', lambda value: value.lower() in ('1', 'true', 'yes')), # Test before use
+    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {option: parse(os.environ[name])
+                                               for option, (name, parse) in pool_options.items() if os.getenv(name)}
+    # Optional read replicas (comma-separated URLs), see app/db_routing.py. The engine
+    # options above only reach the primary, so each replica bind carries its own copy
+    replica_urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {f'replica{i}': {'url': url, **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+                                      for i, url in enumerate(replica_urls)}
+    app.config['DB_REPLICA_PIN_SECONDS'] = float(os.getenv('DB_REPLICA_PIN_SECONDS', 5)) # Reads stay on the primary this long after a write
+    # Optional recipe shards (comma-separated URLs; the primary is a shard too), see app/sharding.py
+    shard_urls = [url.strip() for url in os.getenv('DATABASE_SHARD_URLS', '').split(',') if url.strip()]
+    app.config['SQLALCHEMY_BINDS'].update({f'shard{i}': {'url': url, **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+                                           for i, url in enumerate(shard_urls, start=1)})
+    app.config['SHARD_DIRECTORY_TTL'] = float(os.getenv('SHARD_DIRECTORY_TTL', 30)) # Seconds a user's shard is cached per process
+    app.config['SHARD_ID_BLOCK_SIZE'] = int(os.getenv('SHARD_ID_BLOCK_SIZE', 100))  # Recipe ids reserved at a time per process
+    # Seconds a cached pantry-match index may lag behind writes made by other worker processes
+    app.config['PANTRY_INDEX_TTL'] = int(os.getenv('PANTRY_INDEX_TTL', 60))
+    app.config['PANTRY_INDEX_MAX_USERS'] = int(os.getenv('PANTRY_INDEX_MAX_USERS', 1000)) # Users' indexes kept per worker
+    # Title autocomplete (see app/suggest_index.py): seconds a cached index may lag behind other
+    # worker processes, and the memory bounds (titles over all cached users, TheMealDB names)
+    app.config['SUGGEST_INDEX_TTL'] = int(os.getenv('SUGGEST_INDEX_TTL', 60))
+    app.config['SUGGEST_MAX_TITLES'] = int(os.getenv('SUGGEST_MAX_TITLES', 100000))
+    app.config['SUGGEST_MAX_MEALS'] = int(os.getenv('SUGGEST_MAX_MEALS', 20000))
+    # "Similar recipes" (see app/similarity.py; needs numpy and scipy): same meaning as the SUGGEST_* settings,
+    # in recipes kept over all cached users and TheMealDB meals
+    app.config['SIMILAR_INDEX_TTL'] = int(os.getenv('SIMILAR_INDEX_TTL', 60))
+    app.config['SIMILAR_MAX_RECIPES'] = int(os.getenv('SIMILAR_MAX_RECIPES', 200000))
+    app.config['SIMILAR_MAX_MEALS'] = int(os.getenv('SIMILAR_MAX_MEALS', 20000))
+    # Seconds the logged-in user's row is cached per process (0 = only cache within a request)
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 30))
+
+    # --- Metrics (GET /metrics, Prometheus text format) ---
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN') # Scrapers send "Authorization: Bearer <token>"; unset: /metrics is 404
+
+    # --- Profiling (see app/profiling.py); off by default and free when off ---
+    app.config['PROFILING_ENABLED'] = os.getenv('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))     # Share of requests profiled without a header
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILE_MAX_FILES'] = int(os.getenv('PROFILE_MAX_FILES', 200))
+    app.config['PROFILE_TOKEN_MAX_AGE'] = int(os.getenv('PROFILE_TOKEN_MAX_AGE', 3600)) # Seconds an X-Profile token stays valid
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 100))
+
+    # --- Password hashing (see app/passwords.py) ---
+    # Any werkzeug method; stored hashes with other parameters are upgraded on the next login
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)) # 0 = hash on the request thread
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0)) or None     # Default: 8 per worker
+
+    # --- Response compression (see app/compression.py) ---
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 500))   # Smaller bodies are sent as they are, bytes
+    app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))           # gzip level, 1 (fast) - 9 (small)
+    app.config['COMPRESS_BR_QUALITY'] = int(os.getenv('COMPRESS_BR_QUALITY', 4)) # brotli quality, 0 - 11 (if installed)
+
+    # --- Static assets (`flask assets build`, see app/assets.py) ---
+    app.config['ASSETS_DEBUG'] = os.getenv('ASSETS_DEBUG', 'false').lower() in ('1', 'true', 'yes') # Serve the unbundled sources
+    app.config['ASSETS_MAX_AGE'] = int(os.getenv('ASSETS_MAX_AGE', 365 * 24 * 3600)) # Browser cache for hashed files, seconds
+
+    # --- Image proxy (/img, see app/image_proxy.py) ---
+    app.config['IMAGE_PROXY_ENABLED'] = os.getenv('IMAGE_PROXY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['IMAGE_CACHE_DIR'] = os.getenv('IMAGE_CACHE_DIR', os.path.join(app.instance_path, 'images'))
+    app.config['IMAGE_CACHE_MAX_BYTES'] = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)) # Disk cache size
+    app.config['IMAGE_CACHE_MAX_AGE'] = int(os.getenv('IMAGE_CACHE_MAX_AGE', 365 * 24 * 3600))        # Browser cache, seconds
+    app.config['IMAGE_MAX_SOURCE_BYTES'] = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', 10 * 1024 * 1024))
+    app.config['IMAGE_FETCH_TIMEOUT'] = float(os.getenv('IMAGE_FETCH_TIMEOUT', 5))
+    app.config['IMAGE_FETCH_MAX_CONCURRENCY'] = int(os.getenv('IMAGE_FETCH_MAX_CONCURRENCY', 8))     # Cache misses fetching at once
+    app.config['IMAGE_FETCH_QUEUE_SIZE'] = int(os.getenv('IMAGE_FETCH_QUEUE_SIZE', 16))              # Misses waiting for a slot
+    app.config['IMAGE_FETCH_QUEUE_TIMEOUT'] = float(os.getenv('IMAGE_FETCH_QUEUE_TIMEOUT', 0.5))     # Then the browser gets the source URL
+    # Allow images on private/loopback addresses (local development and stubs only)
+    app.config['IMAGE_PROXY_ALLOW_PRIVATE'] = os.getenv('IMAGE_PROXY_ALLOW_PRIVATE', 'false').lower() in ('1', 'true', 'yes')
+
+    # --- Initial page data (see app/routes.py) ---
+    # Serialized first page / recipe embedded in the HTML, cached per process. Keys include
+    # updated_at, so edits never serve stale data; the TTL just bounds how long old versions linger.
+    app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 1024))
+    app.config['PAGE_CACHE_TTL'] = int(os.getenv('PAGE_CACHE_TTL', 300))
+
+    # --- TheMealDB settings ---
+    app.config['MEALDB_API_BASE'] = os.getenv('MEALDB_API_BASE', 'https://www.themealdb.com/api/json/v1/1')
+    app.config['MEALDB_CACHE_TTL'] = int(os.getenv('MEALDB_CACHE_TTL', 300))             # Seconds a result is fresh
+    app.config['MEALDB_CACHE_STALE_TTL'] = int(os.getenv('MEALDB_CACHE_STALE_TTL', 3600)) # Extra seconds served stale while refreshing
+    app.config['MEALDB_CACHE_MAX_ENTRIES'] = int(os.getenv('MEALDB_CACHE_MAX_ENTRIES', 1024))
+    app.config['MEALDB_CONNECT_TIMEOUT'] = float(os.getenv('MEALDB_CONNECT_TIMEOUT', 3.05))
+    app.config['MEALDB_READ_TIMEOUT'] = float(os.getenv('MEALDB_READ_TIMEOUT', 5))
+    app.config['MEALDB_MAX_RETRIES'] = int(os.getenv('MEALDB_MAX_RETRIES', 2))
+    app.config['MEALDB_RETRY_BUDGET_RATIO'] = float(os.getenv('MEALDB_RETRY_BUDGET_RATIO', 0.2)) # Retries allowed per request, on average
+    app.config['MEALDB_BREAKER_THRESHOLD'] = int(os.getenv('MEALDB_BREAKER_THRESHOLD', 5))       # Consecutive failures before failing fast
+    app.config['MEALDB_BREAKER_COOLDOWN'] = float(os.getenv('MEALDB_BREAKER_COOLDOWN', 30))      # Seconds to fail fast before trying again
+    app.config['MEALDB_POOL_SIZE'] = int(os.getenv('MEALDB_POOL_SIZE', 20))
+    app.config['MEALDB_FANOUT_WORKERS'] = int(os.getenv('MEALDB_FANOUT_WORKERS', 8))   # Threads for parallel ingredient lookups
+    app.config['MEALDB_MAX_INGREDIENTS'] = int(os.getenv('MEALDB_MAX_INGREDIENTS', 6)) # Per multi-ingredient search
+    # Admission control for TheMealDB-backed endpoints (see app/admission.py)
+    app.config['MEALDB_MAX_CONCURRENCY'] = int(os.getenv('MEALDB_MAX_CONCURRENCY', 8))      # Requests inside at once
+    app.config['MEALDB_QUEUE_SIZE'] = int(os.getenv('MEALDB_QUEUE_SIZE', 16))               # Requests waiting for a slot
+    app.config['MEALDB_QUEUE_TIMEOUT'] = float(os.getenv('MEALDB_QUEUE_TIMEOUT', 0.5))      # Seconds to wait before a 503
+    app.config['MEALDB_REQUEST_DEADLINE'] = float(os.getenv('MEALDB_REQUEST_DEADLINE', 8))  # Seconds per request, retries included
+    # Per-client token buckets: requests per second and burst size (rate 0 = no limit)
+    app.config['RATE_LIMIT_SEARCH_RATE'] = float(os.getenv('RATE_LIMIT_SEARCH_RATE', 5))
+    app.config['RATE_LIMIT_SEARCH_BURST'] = int(os.getenv('RATE_LIMIT_SEARCH_BURST', 20))
+    app.config['RATE_LIMIT_LOGIN_RATE'] = float(os.getenv('RATE_LIMIT_LOGIN_RATE', 0.2))
+    app.config['RATE_LIMIT_LOGIN_BURST'] = int(os.getenv('RATE_LIMIT_LOGIN_BURST', 10))
+    # ASGI mode (`uvicorn asgi:application`, see app/asgi.py): TheMealDB routes run on the event loop
+    app.config['MEALDB_ASYNC_MAX_CONCURRENCY'] = int(os.getenv('MEALDB_ASYNC_MAX_CONCURRENCY', 256)) # Searches in flight per worker
+    app.config['MEALDB_ASYNC_POOL_SIZE'] = int(os.getenv('MEALDB_ASYNC_POOL_SIZE', 100))             # Connections to TheMealDB per worker
+    app.config['ASGI_WSGI_THREADS'] = int(os.getenv('ASGI_WSGI_THREADS', 8))                         # Threads for all other routes
+    # Answer searches from the local mirror (`flask mealdb ingest`) instead of calling TheMealDB
+    app.config['MEALDB_LOCAL_FIRST'] = os.getenv('MEALDB_LOCAL_FIRST', 'false').lower() in ('1', 'true', 'yes')
 
     db.init_app(app)
+    from . import db_routing, sharding
+    db_routing.init_app(app)
+    sharding.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app) # Initialize CSRF protection for the app
 
+    # Pooled HTTP client and response cache for TheMealDB, shared by all requests in this process
+    from .mealdb_client import MealDBClient, RetryBudget, CircuitBreaker
+    from . import metrics
+    app.extensions['mealdb_client'] = MealDBClient(
+        app.config['MEALDB_API_BASE'],
+        connect_timeout=app.config['MEALDB_CONNECT_TIMEOUT'],
+        read_timeout=app.config['MEALDB_READ_TIMEOUT'],
+        max_retries=app.config['MEALDB_MAX_RETRIES'],
+        pool_size=app.config['MEALDB_POOL_SIZE'],
+        retry_budget=RetryBudget(ratio=app.config['MEALDB_RETRY_BUDGET_RATIO']),
+        breaker=CircuitBreaker(threshold=app.config['MEALDB_BREAKER_THRESHOLD'],
+                               cooldown=app.config['MEALDB_BREAKER_COOLDOWN']),
+        observe=metrics.observe_mealdb if app.config['METRICS_ENABLED'] else None)
+    # Bounded thread pool for multi-ingredient searches (one TheMealDB lookup per ingredient)
+    from concurrent.futures import ThreadPoolExecutor
+    app.extensions['mealdb_pool'] = ThreadPoolExecutor(max_workers=app.config['MEALDB_FANOUT_WORKERS'],
+                                                       thread_name_prefix='mealdb')
+    from .cache import TTLCache
+    app.extensions['mealdb_cache'] = TTLCache(max_entries=app.config['MEALDB_CACHE_MAX_ENTRIES'],
+                                              ttl=app.config['MEALDB_CACHE_TTL'],
+                                              stale_ttl=app.config['MEALDB_CACHE_STALE_TTL'])
+    app.extensions['page_cache'] = TTLCache(max_entries=app.config['PAGE_CACHE_MAX_ENTRIES'],
+                                            ttl=app.config['PAGE_CACHE_TTL'])
+    from .admission import ConcurrencyLimiter, RateLimiter
+    app.extensions['limiters'] = {
+        'mealdb': ConcurrencyLimiter(app.config['MEALDB_MAX_CONCURRENCY'],
+                                     queue_size=app.config['MEALDB_QUEUE_SIZE'],
+                                     queue_timeout=app.config['MEALDB_QUEUE_TIMEOUT']),
+    }
+    app.extensions['rate_limits'] = {
+        name: RateLimiter(app.config[f'RATE_LIMIT_{name.upper()}_RATE'], app.config[f'RATE_LIMIT_{name.upper()}_BURST'])
+        for name in ('search', 'login') if app.config[f'RATE_LIMIT_{name.upper()}_RATE'] > 0
+    }
+
     # --- Context Processor ---
     # Makes session data available in all templates automatically
     @app.context_processor
@@ -41,6 +199,33 @@ def create_app():
 
     # Import models AFTER db initialization
     from . import models
+    from . import passwords
+    passwords.init_app(app)
+
+    # Keep the recipe search, ingredient, title suggestion and similarity indexes in sync with every flush
+    from . import search_index, ingredient_index, suggest_index, similarity
+    search_index.init_app(app)
+    ingredient_index.init_app(app)
+    suggest_index.init_app(app)
+    similarity.init_app(app)
+    # ...and drop cached users whenever a User row changes
+    from . import user_cache
+    user_cache.init_app(app)
+
+    # Request, SQL and upstream metrics at /metrics
+    metrics.init_app(app)
+    # gzip/brotli responses. Registered after metrics, so it runs first and the metrics include its time
+    from . import compression
+    compression.init_app(app)
+    # Per-request profiles and the slow-query log, only when PROFILING_ENABLED
+    from . import profiling
+    profiling.init_app(app)
+    # Cached, resized copies of recipe and TheMealDB images at /img
+    from . import image_proxy
+    image_proxy.init_app(app)
+    # Hashed, precompressed static bundles (asset_url() / asset_urls() in templates)
+    from . import assets
+    assets.init_app(app)
 
     # --- Register Blueprints ---
     from .auth_routes import auth_bp # Import the blueprint
@@ -52,6 +237,14 @@ def create_app():
     from .routes import main_bp        # Import main blueprint
     app.register_blueprint(main_bp)    # Register main blueprint
 
+    # --- CLI Commands ---
+    from .cli import mealdb_cli, recipes_cli, profile_cli, assets_cli, shards_cli
+    app.cli.add_command(mealdb_cli)    # flask mealdb ...
+    app.cli.add_command(recipes_cli)   # flask recipes ...
+    app.cli.add_command(profile_cli)   # flask profile ...
+    app.cli.add_command(assets_cli)    # flask assets ...
+    app.cli.add_command(shards_cli)    # flask shards ...
+
     # @app.route('/hello') # Keep this for basic testing if you like
     # def hello():
     #     return "<h1>Hello from the App Factory!</h1>"
@@ -0,0 +1,225 @@
+# app/admission.py
+# Admission control: shed load early instead of letting slow dependencies tie up every worker.
+#
+# - ConcurrencyLimiter: at most `limit` requests inside an endpoint group, a
+#   short bounded queue in front of it, and 503 + Retry-After for the rest.
+#   AsyncConcurrencyLimiter is the same for coroutines (ASGI mode, app/asgi.py).
+# - RateLimiter: one token bucket per client (IP address), 429 + Retry-After
+#   when the bucket is empty.
+# Both are created in create_app() (app.extensions['limiters'] / ['rate_limits'])
+# and applied with the decorators below; their counters show up in /api/recipes/cache-stats (needs METRICS_TOKEN).
+import asyncio
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit, queue_size=0, queue_timeout=0.5):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout # Seconds a request may wait for a slot
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        # Counters
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0      # Rejected right away, the queue was full
+        self.timed_out = 0 # Waited queue_timeout without getting a slot
+
+    def acquire(self):
+        """Take a slot, waiting at most queue_timeout. Returns False if the request should be shed."""
+        with self._cond:
+            if self._active < self.limit:
+                self._active += 1
+                self.admitted += 1
+                return True
+            if self._waiting >= self.queue_size:
+                self.shed += 1
+                return False
+            self._waiting += 1
+            self.queued += 1
+            try:
+                got_slot = self._cond.wait_for(lambda: self._active < self.limit, timeout=self.queue_timeout)
+            finally:
+                self._waiting -= 1
+            if not got_slot:
+                self.timed_out += 1
+                return False
+            self._active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self._active, "waiting": self._waiting,
+                "admitted": self.admitted, "queued": self.queued, "shed": self.shed, "timed_out": self.timed_out}
+
+
+class AsyncConcurrencyLimiter:
+    """ConcurrencyLimiter for coroutines on one event loop: waiting for a slot doesn't block the loop."""
+
+    def __init__(self, limit, queue_size=0, queue_timeout=0.5):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(limit)
+        self._active = 0
+        self._waiting = 0
+        # Counters
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    async def acquire(self):
+        """Take a slot, waiting at most queue_timeout. Returns False if the request should be shed."""
+        if self._slots.locked():
+            if self._waiting >= self.queue_size:
+                self.shed += 1
+                return False
+            self._waiting += 1
+            self.queued += 1
+            try:
+                async with asyncio.timeout(self.queue_timeout):
+                    await self._slots.acquire()
+            except TimeoutError:
+                self.timed_out += 1
+                return False
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire() # A slot is free, so this doesn't wait
+        self._active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self._active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self._active, "waiting": self._waiting,
+                "admitted": self.admitted, "queued": self.queued, "shed": self.shed, "timed_out": self.timed_out}
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {} # client key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+        # Counters
+        self.allowed = 0
+        self.limited = 0
+
+    def allow(self, key):
+        """Take a token for `key`. Returns (allowed, seconds until the next token)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                return False, (1 - tokens) / self.rate
+            if len(self._buckets) >= self.max_clients and key not in self._buckets:
+                self._prune(now)
+            self._buckets[key] = (tokens - 1, now)
+            self.allowed += 1
+            return True, 0
+
+    def _prune(self, now):
+        # Clients whose bucket has refilled completely look exactly like new clients, so drop them
+        full_after = self.burst / self.rate
+        self._buckets = {key: (tokens, last) for key, (tokens, last) in self._buckets.items()
+                         if now - last < full_after}
+        if len(self._buckets) >= self.max_clients: # Still too many active clients: start over
+            self._buckets.clear()
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets),
+                "allowed": self.allowed, "limited": self.limited}
+
+
+def _retry_after(seconds):
+    return str(max(1, math.ceil(seconds)))
+
+
+def limit_concurrency(name, deadline_config=None):
+    """Run the view inside app.extensions['limiters'][name]; shed with 503 when it is full.
+
+    deadline_config names a config key (seconds). g.deadline is then set to
+    time.monotonic() + that value when the request arrives, so queue time counts too.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if deadline_config:
+                g.deadline = time.monotonic() + current_app.config[deadline_config]
+            limiter = current_app.extensions['limiters'][name]
+            if not limiter.acquire():
+                return jsonify({"error": "Server is busy, please retry shortly."}), 503, \
+                    {"Retry-After": _retry_after(limiter.queue_timeout)}
+            try:
+                return f(*args, **kwargs)
+            finally:
+                limiter.release()
+        return decorated_function
+    return decorator
+
+
+def limit_concurrency_async(name, deadline_config=None):
+    """limit_concurrency() for async views, with an AsyncConcurrencyLimiter."""
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            if deadline_config:
+                g.deadline = time.monotonic() + current_app.config[deadline_config]
+            limiter = current_app.extensions['limiters'][name]
+            if not await limiter.acquire():
+                return jsonify({"error": "Server is busy, please retry shortly."}), 503, \
+                    {"Retry-After": _retry_after(limiter.queue_timeout)}
+            try:
+                return await f(*args, **kwargs)
+            finally:
+                limiter.release()
+        return decorated_function
+    return decorator
+
+
+def rate_limit(name):
+    """Allow each client app.extensions['rate_limits'][name] requests; 429 beyond that.
+
+    Works for async views too: the check itself doesn't wait, and their coroutine is returned as is.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            limiter = current_app.extensions['rate_limits'].get(name)
+            if limiter is not None: # Not configured (rate 0) -> unlimited
+                allowed, wait = limiter.allow(request.remote_addr)
+                if not allowed:
+                    return jsonify({"error": "Too many requests, please slow down."}), 429, \
+                        {"Retry-After": _retry_after(wait)}
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def stats(app):
+    return {
+        "concurrency": {name: limiter.stats() for name, limiter in app.extensions['limiters'].items()},
+        "rate_limits": {name: limiter.stats() for name, limiter in app.extensions['rate_limits'].items()},
+    }
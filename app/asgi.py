@@ -0,0 +1,308 @@
+# app/asgi.py
+# ASGI mode: `uvicorn asgi:application` (see asgi.py at the project root).
+#
+# The TheMealDB-backed routes, GET /api/recipes/search and
+# /api/recipes/external/<id>, run as coroutines on the worker's event loop with
+# an async HTTP client (httpx). While they wait on TheMealDB they hold no
+# thread, so one worker keeps up to MEALDB_ASYNC_MAX_CONCURRENCY searches in
+# flight instead of one per thread.
+# Every other route is the unchanged Flask app, run on a bounded thread pool
+# (ASGI_WSGI_THREADS) the way a threaded WSGI server would.
+#
+# The async views run inside a normal Flask request context, so sessions,
+# before/after_request hooks (metrics, compression, profiling), rate limits,
+# the response cache and the circuit breaker work as in WSGI mode. (A profile
+# of an async request also covers whatever else the event loop ran meanwhile.)
+import asyncio
+import inspect
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import current_app, g, jsonify
+from werkzeug.exceptions import HTTPException
+
+from .admission import AsyncConcurrencyLimiter, limit_concurrency_async, rate_limit
+from .mealdb_client import AsyncMealDBClient, CircuitOpenError
+from . import mealdb_mirror
+from .recipe_routes import (_normalize_key, _simplify_meals, _upstream_unavailable,
+                            parse_search_args, merge_ingredient_results, external_detail_response)
+
+
+# --- Async TheMealDB views ---
+
+def _query_local(app, endpoint, value):
+    with app.app_context(): # Its own app context, so its own database session
+        return mealdb_mirror.query_local(endpoint, value)
+
+async def fetch_mealdb_async(endpoint, param, value, deadline=None):
+    """fetch_mealdb() for coroutines: same mirror, cache (shared with WSGI views) and client policies."""
+    value = _normalize_key(value)
+    app = current_app._get_current_object()
+    if app.config['MEALDB_LOCAL_FIRST']:
+        data = await asyncio.to_thread(_query_local, app, endpoint, value) # SQL stays off the event loop
+        if data is not None:
+            return data
+
+    client = app.extensions['mealdb_async_client']
+    if deadline is None:
+        deadline = g.get('deadline')
+
+    # The loader may run as a background refresh task, so it must not touch the request context
+    async def load():
+        return await client.get_json(endpoint, params={param: value}, deadline=deadline)
+
+    return await app.extensions['mealdb_cache'].get_or_load_async((endpoint, value), load)
+
+
+async def _gather(*coroutines):
+    """asyncio.gather(), but when one fails (or we are cancelled) the others are cancelled, not left running."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+@rate_limit('search')
+@limit_concurrency_async('mealdb_async', deadline_config='MEALDB_REQUEST_DEADLINE')
+async def search_external_recipes():
+    search_query, ingredients, match_mode, error = parse_search_args()
+    if error:
+        return error
+    try:
+        if search_query:
+            data = await fetch_mealdb_async('search.php', 's', search_query)
+        elif len(ingredients) == 1:
+            data = await fetch_mealdb_async('filter.php', 'i', ingredients[0])
+        else:
+            # One lookup per ingredient, all in flight at once on the event loop
+            results = await _gather(*(fetch_mealdb_async('filter.php', 'i', ingredient)
+                                       for ingredient in ingredients))
+            merged = merge_ingredient_results([data.get('meals') for data in results], len(ingredients), match_mode)
+            return jsonify(merged), 200
+        return jsonify(_simplify_meals(data.get('meals'))), 200
+
+    except CircuitOpenError as e:
+        return _upstream_unavailable(e)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"Failed to fetch recipes from external source: {e}"}), 503
+    except Exception as e:
+        return jsonify({"error": "Failed to process external recipe data."}), 500
+
+
+@limit_concurrency_async('mealdb_async', deadline_config='MEALDB_REQUEST_DEADLINE')
+async def get_external_recipe_detail(meal_id):
+    try:
+        return external_detail_response(await fetch_mealdb_async('lookup.php', 'i', meal_id))
+    except CircuitOpenError as e:
+        return _upstream_unavailable(e)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"Failed to fetch recipe details from external source: {e}"}), 503
+    except Exception as e:
+        return jsonify({"error": "Failed to process external recipe detail data."}), 500
+
+
+# Flask endpoint -> async view that replaces it in ASGI mode
+ASYNC_VIEWS = {
+    'recipes.search_external_recipes': search_external_recipes,
+    'recipes.get_external_recipe_detail': get_external_recipe_detail,
+}
+
+
+# --- ASGI <-> WSGI ---
+
+def _environ(scope):
+    """WSGI environ for an ASGI http scope (strings are bytes-as-latin-1, as WSGI wants)."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.input_terminated': True, # Read the body to EOF, also when chunked (no Content-Length)
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in environ: # Repeated header: one comma-separated value (cookies use '; ')
+            value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+        environ[name] = value
+    return environ
+
+
+class _RequestBody(io.RawIOBase):
+    """wsgi.input that pulls the ASGI request body as the app reads it, so uploads aren't buffered whole."""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._pending = b''
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._more = False
+                break
+            self._pending = message.get('body', b'')
+            self._more = message.get('more_body', False)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _response_start(status, headers):
+    return {'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]}
+
+
+class ASGIApp:
+    """The ASGI application: async views for ASYNC_VIEWS, the Flask app on a thread pool for the rest."""
+
+    def __init__(self, app, threads=8):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return await send({'type': 'websocket.close'}) # No websockets here
+        environ = _environ(scope)
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException: # 404/405/redirects: Flask produces those responses
+            endpoint = None
+        view = ASYNC_VIEWS.get(endpoint)
+        if view is not None:
+            await self._call_async_view(view, environ, send)
+        else:
+            await self._call_wsgi(environ, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.app.extensions['mealdb_async_client'].aclose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _call_async_view(self, view, environ, send):
+        # What Flask.wsgi_app() does, with an await in the middle
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        started = {}
+        try:
+            ctx.push() # Request and app context live in this task's contextvars, so awaiting is fine
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = view(**ctx.request.view_args)
+                    if inspect.isawaitable(rv): # Not when a decorator answered first (e.g. 429)
+                        rv = await rv
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        try:
+            # JSON responses: small and already complete, so render them before the context goes
+            body = b''.join(response(environ, lambda status, headers, exc_info=None:
+                                     started.update(_response_start(status, headers))))
+        finally:
+            ctx.pop(error)
+        await send(started)
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _call_wsgi(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        environ['wsgi.input'] = io.BufferedReader(_RequestBody(receive, loop))
+        started = {}
+        headers_sent = False
+
+        def send_from_thread(message):
+            # Blocks the worker thread until the event loop has sent it (backpressure)
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and headers_sent:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started.update(_response_start(status, headers))
+            return write
+
+        def write(data):
+            nonlocal headers_sent
+            if not headers_sent:
+                send_from_thread(started)
+                headers_sent = True
+            if data:
+                send_from_thread({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        def run():
+            body = self.app(environ, start_response)
+            try:
+                for chunk in body: # Streamed responses (e.g. the export) go out chunk by chunk
+                    write(chunk)
+                write(b'') # Headers, if there was no body
+                send_from_thread({'type': 'http.response.body', 'body': b''})
+            finally:
+                close = getattr(body, 'close', None)
+                if close is not None:
+                    close()
+
+        await loop.run_in_executor(self.executor, run)
+
+
+def create_asgi_app(app=None):
+    """Wrap a Flask app (by default create_app()) for an ASGI server."""
+    if app is None:
+        from . import create_app
+        app = create_app()
+    from . import metrics
+    sync_client = app.extensions['mealdb_client']
+    app.extensions['mealdb_async_client'] = AsyncMealDBClient(
+        app.config['MEALDB_API_BASE'],
+        connect_timeout=app.config['MEALDB_CONNECT_TIMEOUT'],
+        read_timeout=app.config['MEALDB_READ_TIMEOUT'],
+        max_retries=app.config['MEALDB_MAX_RETRIES'],
+        pool_size=app.config['MEALDB_ASYNC_POOL_SIZE'],
+        # Same upstream as the WSGI views (e.g. the page routes): one breaker and one retry budget
+        retry_budget=sync_client.retry_budget,
+        breaker=sync_client.breaker,
+        observe=metrics.observe_mealdb if app.config['METRICS_ENABLED'] else None)
+    app.extensions['limiters']['mealdb_async'] = AsyncConcurrencyLimiter(
+        app.config['MEALDB_ASYNC_MAX_CONCURRENCY'],
+        queue_size=app.config['MEALDB_QUEUE_SIZE'],
+        queue_timeout=app.config['MEALDB_QUEUE_TIMEOUT'])
+    return ASGIApp(app, threads=app.config['ASGI_WSGI_THREADS'])
@@ -0,0 +1,237 @@
+# app/assets.py
+# Static asset pipeline: `flask assets build` bundles and minifies the page
+# scripts and the stylesheet, names each output after its content hash and
+# writes .gz (and .br, if the brotli package is installed) copies next to it:
+#
+#   app/static/dist/search.3f9c1a2b7d4e.js(.gz/.br)
+#   app/static/dist/manifest.json   {"search.js": "dist/search.3f9c1a2b7d4e.js", ...}
+#
+# Templates call asset_url() / asset_urls() instead of url_for('static', ...).
+# They return the hashed files once a build exists, and the source files
+# otherwise (or when ASSETS_DEBUG is set), so development needs no build.
+# /static/dist/* is served with year-long immutable caching and the
+# precompressed copy the browser accepts.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError: # Optional: without it only .gz copies are written
+    brotli = None
+
+# Output name -> source files (relative to app/static), concatenated in order.
+# Every page loads script.js (logout link) plus its own script, so each page gets one bundle.
+BUNDLES = {
+    'site.css': ['css/style.css'],
+    'base.js': ['js/script.js'],
+    'search.js': ['js/script.js', 'js/search.js'],
+    'auth.js': ['js/script.js', 'js/auth.js'],
+    'my_recipes.js': ['js/script.js', 'js/my_recipes.js'],
+    'recipe_detail.js': ['js/script.js', 'js/recipe_detail.js'],
+    'recipe_form.js': ['js/script.js', 'js/recipe_form.js'],
+}
+# Copied with a hashed name but otherwise unchanged
+FILES = ['favicon.ico']
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE = ('.js', '.css', '.svg', '.ico')
+KEEP_PREVIOUS_BUILDS = 1 # Pages rendered by not-yet-restarted workers still reference the previous build
+
+
+# --- Minifiers ---
+# Deliberately conservative: no new dependency, and nothing that needs a real
+# parser. Line breaks are kept, so automatic semicolon insertion is unaffected.
+
+def minify_js(source):
+    """Drop indentation, blank lines and whole-line // comments; template literals are left alone."""
+    lines = []
+    in_template = False # Inside a multi-line `...` string, where whitespace is content
+    for line in source.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            line = line.strip()
+            if not line or line.startswith('//'):
+                continue
+            lines.append(line)
+        # Unescaped backticks toggle template-literal state
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def minify_css(source):
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S) # Comments
+    source = re.sub(r'\s+', ' ', source)                  # Runs of whitespace
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)    # Around punctuation
+    source = re.sub(r':\s+', ':', source)                 # Not before ':', "a :hover" differs from "a:hover"
+    return source.replace(';}', '}').strip() + '\n'
+
+
+# --- Build ---
+
+def _hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path) # Never serve half a file
+
+
+def _write_compressed(path, data):
+    if not path.endswith(COMPRESSIBLE):
+        return
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))] # mtime=0: same bytes for the same input
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.9: # Not worth a Content-Encoding otherwise (e.g. favicon.ico)
+            _write(path + suffix, compressed)
+
+
+def build(static_folder):
+    """Build every bundle and file into static/dist. Returns {name: (hashed path, source bytes, output bytes)}."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    report = {}
+    manifest = {}
+
+    def emit(name, data, source_size):
+        hashed = _hashed_name(name, data)
+        path = os.path.join(dist, hashed)
+        if not os.path.exists(path): # Same content, same name: nothing to do
+            _write(path, data)
+            _write_compressed(path, data)
+        manifest[name] = f"{DIST_DIR}/{hashed}"
+        report[name] = (manifest[name], source_size, len(data))
+
+    for name, sources in BUNDLES.items():
+        texts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                texts.append(f.read())
+        source_size = sum(len(text.encode('utf-8')) for text in texts)
+        if name.endswith('.css'):
+            data = ''.join(minify_css(text) for text in texts)
+        else:
+            # ';' between files, in case one ends without a semicolon
+            data = ';\n'.join(minify_js(text) for text in texts)
+        emit(name, data.encode('utf-8'), source_size)
+
+    for name in FILES:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        emit(name, data, len(data))
+
+    _prune(dist, manifest)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return report
+
+
+def _prune(dist, manifest):
+    """Delete outputs of older builds, keeping this one and the previous KEEP_PREVIOUS_BUILDS."""
+    history_path = os.path.join(dist, 'builds.json') # Newest first: [[hashed paths of a build], ...]
+    try:
+        with open(history_path) as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = []
+    current = sorted(manifest.values())
+    if not history or history[0] != current:
+        history.insert(0, current)
+    history = history[:KEEP_PREVIOUS_BUILDS + 1]
+    keep = {os.path.basename(path) for build in history for path in build}
+    for name in os.listdir(dist):
+        if name in (MANIFEST, 'builds.json'):
+            continue
+        base = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if base not in keep:
+            os.remove(os.path.join(dist, name))
+    _write(history_path, json.dumps(history).encode('utf-8'))
+
+
+# --- Template helpers ---
+
+class Manifest:
+    """manifest.json, re-read whenever a new build replaces it (one stat() per lookup)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._entries = {}
+
+    def get(self, name):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError: # No build yet
+            return None
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+        return self._entries.get(name)
+
+
+def _built(name):
+    if current_app.config['ASSETS_DEBUG']:
+        return None
+    return current_app.extensions['assets_manifest'].get(name)
+
+
+def asset_url(filename, **values):
+    """url_for('static', filename=...) that returns the hashed build output when there is one."""
+    built = _built(filename)
+    if built is None:
+        sources = BUNDLES.get(filename)
+        if sources is not None:
+            if len(sources) != 1:
+                raise ValueError(f"Bundle {filename} has several sources, use asset_urls()")
+            filename = sources[0]
+    return url_for('static', filename=built or filename, **values)
+
+
+def asset_urls(name):
+    """URLs to load for a bundle: the built file, or its sources when there is no build."""
+    built = _built(name)
+    if built is not None:
+        return [url_for('static', filename=built)]
+    return [url_for('static', filename=source) for source in BUNDLES.get(name, [name])]
+
+
+# --- Serving /static/dist ---
+
+def serve_built_asset(filename):
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    if filename.endswith('.json'): # Manifest and build history: not fingerprinted, so no long caching
+        return send_from_directory(dist, filename)
+    max_age = current_app.config['ASSETS_MAX_AGE']
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            # The mimetype comes from the uncompressed name; the bytes go out as they are on disk
+            response = send_from_directory(dist, filename + suffix, max_age=max_age,
+                                           mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True # The name changes whenever the content does
+    return response
+
+
+def init_app(app):
+    app.extensions['assets_manifest'] = Manifest(os.path.join(app.static_folder, DIST_DIR, MANIFEST))
+    app.jinja_env.globals.update(asset_url=asset_url, asset_urls=asset_urls)
+    # More specific than the /static/<path:filename> rule, so it takes precedence for dist/
+    app.add_url_rule(f'{app.static_url_path}/{DIST_DIR}/<path:filename>', 'built_assets', serve_built_asset)
@@ -1,8 +1,16 @@
 # app/auth_routes.py
+import logging
+
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy import or_
+from sqlalchemy.exc import SQLAlchemyError
 from .models import User
 from . import db # Import db from app/__init__
-from werkzeug.security import generate_password_hash, check_password_hash # Already in models, but good practice
+from .user_cache import current_user, remember
+from .passwords import PasswordHasherBusy
+from .admission import rate_limit
+
+logger = logging.getLogger(__name__)
 
 # Create a Blueprint for authentication routes
 # 'auth' is the name of the blueprint
@@ -34,7 +42,10 @@ def register():
 
     # --- Create new user ---
     new_user = User(username=username, email=email)
-    new_user.set_password(password) # Hash the password
+    try:
+        new_user.set_password(password) # Hash the password
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
 
     # --- Add to database ---
     try:
@@ -54,7 +65,14 @@ def register():
         return jsonify({"error": "Registration failed due to a server issue."}), 500
 
 
+def _hasher_busy(e):
+    # All password workers are busy: tell the client to retry instead of queueing without limit
+    return jsonify({"error": "Too many login attempts right now, please retry shortly."}), 503, \
+        {"Retry-After": str(e.retry_after)}
+
+
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login')
 def login():
     data = request.get_json()
 
@@ -68,18 +86,35 @@ def login():
     if not identifier or not password:
         return jsonify({"error": "Missing identifier or password"}), 400
 
-    # Try finding user by email first, then by username
-    user = User.query.filter_by(email=identifier).first()
-    if not user:
-        user = User.query.filter_by(username=identifier).first()
+    # Find the user by email or username in one query; an email match wins if both exist
+    candidates = User.query.filter(or_(User.email == identifier, User.username == identifier)).limit(2).all()
+    user = next((u for u in candidates if u.email == identifier), candidates[0] if candidates else None)
 
     # --- Validate user and password ---
-    if user and user.check_password(password):
+    try:
+        password_ok = bool(user) and user.check_password(password)
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
+
+    if password_ok:
+        # Stored with older hash parameters: upgrade it now that we know the password.
+        # Best effort: if it fails, the user still logs in and the next login tries again.
+        try:
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+        except (PasswordHasherBusy, SQLAlchemyError) as e:
+            user_id = user.user_id # Read before the rollback expires it
+            db.session.rollback()
+            logger.warning("password_rehash_failed user_id=%s error=%r", user_id, e)
+
+    if password_ok:
         # User authenticated successfully
         # Store user ID in session - this marks the user as logged in
         session.clear() # Clear previous session data
         session['user_id'] = user.user_id
         session['username'] = user.username # Store username too, might be useful
+        remember(user) # Next requests find the user in the cache
 
         return jsonify({
             "message": "Login successful!",
@@ -111,7 +146,7 @@ def logout():
 def status():
     user_id = session.get('user_id')
     if user_id:
-        user = User.query.get(user_id) # Fetch user details based on ID in session
+        user = current_user() # Cached, so page loads usually don't touch the database
         if user:
              return jsonify({
                 "logged_in": True,
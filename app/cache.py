@@ -0,0 +1,187 @@
+# app/cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a per-entry TTL.
+
+    - Entries younger than `ttl` seconds are served as fresh hits.
+    - Entries up to `stale_ttl` seconds past expiry are still served, while a
+      background thread refreshes them (stale-while-revalidate).
+    - Concurrent misses for the same key are merged into one loader call.
+
+    get_or_load_async() is the same for coroutines (ASGI mode), sharing the
+    entries and counters; its in-flight loads are tasks on one event loop.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, stale_ttl=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict() # key -> (value, expires_at), oldest first
+        self._inflight = {}           # key -> _Flight
+        self._tasks = {}              # key -> asyncio.Task, for get_or_load_async()
+        self._lock = threading.Lock()
+        # Counters (read through stats())
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.merged = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.load_errors = 0
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() to fill it if needed."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    # Serve the stale value and refresh it in the background (once)
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        flight = self._inflight[key] = _Flight()
+                        self.refreshes += 1
+                        threading.Thread(target=self._load, args=(key, loader, flight), daemon=True).start()
+                    return value
+            flight = self._inflight.get(key)
+            if flight is not None:
+                # Someone is already loading this key, wait for their result
+                self.merged += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._inflight[key] = _Flight()
+                leader = True
+
+        if leader:
+            self._load(key, loader, flight)
+        return flight.wait()
+
+    async def get_or_load_async(self, key, loader):
+        """get_or_load() where loader is an async callable; waiting never blocks the event loop."""
+        now = time.monotonic()
+        with self._lock: # Never held across an await
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if now < expires_at + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._tasks:
+                        self.refreshes += 1
+                        self._start_task(key, loader)
+                    return value
+            task = self._tasks.get(key)
+            if task is not None:
+                self.merged += 1
+            else:
+                self.misses += 1
+                task = self._start_task(key, loader)
+        # shield(): a caller that goes away doesn't cancel the load the others are waiting for
+        return await asyncio.shield(task)
+
+    def _start_task(self, key, loader):
+        task = self._tasks[key] = asyncio.ensure_future(self._load_async(key, loader))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception()) # Background refreshes may fail unobserved
+        return task
+
+    async def _load_async(self, key, loader):
+        try:
+            value = await loader()
+        except Exception:
+            with self._lock:
+                self.load_errors += 1
+            raise
+        else:
+            self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._tasks.pop(key, None)
+
+    def _load(self, key, loader, flight):
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.load_errors += 1
+        else:
+            self.set(key, flight.value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def get(self, key):
+        """Return a fresh cached value or None, without loading."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Drop least recently used
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses + self.merged
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "merged": self.merged,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+                "load_errors": self.load_errors,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            }
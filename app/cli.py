@@ -0,0 +1,153 @@
+# app/cli.py
+# Custom `flask` commands, registered in create_app()
+import json
+import string
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+mealdb_cli = AppGroup('mealdb', help='Manage the local TheMealDB mirror.')
+recipes_cli = AppGroup('recipes', help='Maintenance tasks for personal recipes.')
+profile_cli = AppGroup('profile', help='Request profiling (needs PROFILING_ENABLED=true on the server).')
+assets_cli = AppGroup('assets', help='Static asset bundles.')
+shards_cli = AppGroup('shards', help='Recipe shards (needs DATABASE_SHARD_URLS).')
+
+
+@mealdb_cli.command('ingest')
+@click.option('--from-file', 'dump_path', type=click.Path(exists=True, dir_okay=False),
+              help='Load meals from a JSON dump instead of calling TheMealDB.')
+@click.option('--letters', default=string.ascii_lowercase, show_default=True,
+              help='First letters to crawl from the API (e.g. "abc" for a partial refresh).')
+@click.option('--prune', is_flag=True,
+              help='Delete mirrored meals that are missing from the source. Only use with a full catalog.')
+def ingest(dump_path, letters, prune):
+    """Fill or refresh the mirror. Only new and changed meals are written."""
+    from .mealdb_mirror import fetch_catalog, load_dump, upsert_meals
+
+    if dump_path:
+        meals = load_dump(dump_path)
+        click.echo(f"Loaded {len(meals)} meals from {dump_path}")
+    else:
+        if prune and set(letters) != set(string.ascii_lowercase):
+            raise click.UsageError("--prune needs the full catalog, don't combine it with --letters.")
+        meals = fetch_catalog(current_app.extensions['mealdb_client'], letters=letters.lower())
+
+    counts = upsert_meals(meals, prune=prune)
+    click.echo("Mirror updated: {added} added, {updated} updated, {unchanged} unchanged, {removed} removed".format(**counts))
+
+
+@mealdb_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def export(path):
+    """Write the mirror to a JSON dump that `ingest --from-file` can load offline."""
+    from .models import MealDBMeal
+
+    meals = [json.loads(data) for (data,) in MealDBMeal.query.with_entities(MealDBMeal.data).order_by(MealDBMeal.meal_id)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"meals": meals}, f)
+    click.echo(f"Exported {len(meals)} meals to {path}")
+
+
+@recipes_cli.command('reindex')
+def reindex():
+    """Rebuild the full-text search index for every recipe."""
+    from .search_index import reindex_all
+    from .sharding import each_shard
+
+    click.echo(f"Indexed {sum(reindex_all() for _ in each_shard())} recipes")
+
+
+@recipes_cli.command('backfill-ingredients')
+def backfill_ingredients():
+    """Parse every recipe's ingredients into the ingredient vocabulary."""
+    from .ingredient_index import backfill
+    from .sharding import each_shard
+
+    click.echo(f"Parsed ingredients for {sum(backfill() for _ in each_shard())} recipes")
+
+
+@profile_cli.command('token')
+def profile_token():
+    """Print a signed X-Profile header value; requests sending it are profiled."""
+    from .profiling import make_token, PROFILE_HEADER
+    click.echo(f"{PROFILE_HEADER}: {make_token(current_app)}")
+    click.echo(f"Valid for {current_app.config['PROFILE_TOKEN_MAX_AGE']} seconds, "
+               f"profiles are written to {current_app.config['PROFILE_DIR']}")
+
+
+@assets_cli.command('build')
+def assets_build():
+    """Bundle, minify, fingerprint and precompress the static assets into static/dist."""
+    from .assets import build, brotli
+
+    report = build(current_app.static_folder)
+    for name, (path, source_size, size) in report.items():
+        click.echo(f"{name:20} {path:40} {source_size:>7} -> {size:>7} bytes")
+    click.echo(f"Wrote {len(report)} assets and the manifest"
+               + ("" if brotli else " (.gz only: pip install brotli for .br copies)"))
+
+
+def _sharding():
+    if 'sharding' not in current_app.extensions:
+        raise click.UsageError("Sharding is off: set DATABASE_SHARD_URLS first.")
+    return current_app.extensions['sharding']
+
+
+@shards_cli.command('init')
+def shards_init():
+    """Create the recipe tables on every shard and start the shared recipe id sequence. Safe to re-run."""
+    from .sharding import init_shards
+
+    _sharding()
+    for key, recipes in init_shards().items():
+        click.echo(f"{key:12} ready, {recipes} recipes")
+
+
+@shards_cli.command('status')
+def shards_status():
+    """Users and recipes per shard."""
+    from .sharding import shard_loads
+
+    _sharding()
+    for key, users in shard_loads().items():
+        click.echo(f"{key:12} {len(users):>7} users {sum(users.values()):>9} recipes")
+
+
+@shards_cli.command('move')
+@click.argument('user_id', type=int)
+@click.argument('shard')
+@click.option('--no-wait', is_flag=True,
+              help="Don't wait SHARD_DIRECTORY_TTL for other processes (only when no server is running).")
+def shards_move(user_id, shard, no_wait):
+    """Move one user's recipes to SHARD."""
+    from .sharding import move_users
+
+    _sharding()
+    try:
+        moved = move_users([(user_id, shard)], wait=not no_wait, echo=click.echo)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='SHARD')
+    click.echo(f"Moved {moved} recipes")
+
+
+@shards_cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only print the moves.')
+@click.option('--no-wait', is_flag=True,
+              help="Don't wait SHARD_DIRECTORY_TTL for other processes (only when no server is running).")
+def shards_rebalance(dry_run, no_wait):
+    """Move users so every shard holds about the same number of recipes."""
+    from .sharding import shard_loads, plan_rebalance, move_users
+
+    _sharding()
+    moves = plan_rebalance(shard_loads())
+    if not moves:
+        click.echo("Shards are balanced, nothing to move")
+        return
+    for user_id, source, target in moves:
+        click.echo(f"User {user_id}: {source} -> {target}")
+    if not dry_run:
+        moved = move_users([(user_id, target) for user_id, _, target in moves], wait=not no_wait, echo=click.echo)
+        click.echo(f"Moved {len(moves)} users, {moved} recipes")
+        for key, users in shard_loads().items():
+            click.echo(f"{key:12} {len(users):>7} users {sum(users.values()):>9} recipes")
@@ -0,0 +1,129 @@
+# app/compression.py
+# Response compression (gzip, or brotli when the package is installed),
+# chosen from the request's Accept-Encoding.
+#
+# - Buffered responses are compressed in one go, if at least COMPRESS_MIN_SIZE bytes.
+# - Streamed responses (e.g. the NDJSON export) are compressed chunk by chunk
+#   as they are sent, so they are never buffered whole.
+# - Files (send_file) and responses that already have a Content-Encoding
+#   (precompressed static assets) are left alone.
+# Compressed responses get a weak ETag: the bytes differ from the
+# uncompressed representation, the content doesn't (RFC 9110 8.8.1).
+import time
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError: # Optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/plain', 'text/css', 'text/javascript', 'image/svg+xml',
+}
+
+
+class Compressor:
+    """Settings plus the `observe` callback(encoding, bytes_in, bytes_out, cpu_seconds), e.g. for metrics."""
+
+    def __init__(self, min_size=500, gzip_level=6, brotli_quality=4, observe=None):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.observe = observe
+
+    def choose(self, accept_encodings):
+        # Brotli compresses text better than gzip at a similar cost, when both sides support it
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def _new(self, encoding):
+        """(compress(chunk) -> bytes, finish() -> bytes) for one response."""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31) # 31: gzip container
+        return compressor.compress, compressor.flush
+
+    def compress(self, data, encoding):
+        started = time.thread_time() # CPU time of this thread, not wall time
+        compress, finish = self._new(encoding)
+        out = compress(data) + finish()
+        self._observe(encoding, len(data), len(out), time.thread_time() - started)
+        return out
+
+    def compress_stream(self, chunks, encoding):
+        """Compress an iterable of chunks lazily, closing it when done (as the WSGI server would)."""
+        compress, finish = self._new(encoding)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                started = time.thread_time()
+                out = compress(chunk)
+                cpu += time.thread_time() - started
+                bytes_in += len(chunk)
+                if out: # zlib and brotli buffer small inputs; only send what they hand back
+                    bytes_out += len(out)
+                    yield out
+            started = time.thread_time()
+            out = finish()
+            cpu += time.thread_time() - started
+            bytes_out += len(out)
+            yield out
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close() # e.g. stream_with_context() tears down its request context here
+            self._observe(encoding, bytes_in, bytes_out, cpu)
+
+    def _observe(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        if self.observe is not None:
+            self.observe(encoding, bytes_in, bytes_out, cpu_seconds)
+
+
+def _after_request(response):
+    if (request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough # Files: served as they are (dist/ has precompressed copies)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+    compressor = current_app.extensions['compressor']
+    response.vary.add('Accept-Encoding') # The body depends on it from here on
+    encoding = compressor.choose(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compressor.compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < compressor.min_size:
+            return response # Headers and CPU cost more than the few bytes saved
+        response.set_data(compressor.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if not app.config['COMPRESS_ENABLED']:
+        return
+    from . import metrics
+    app.extensions['compressor'] = Compressor(
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        gzip_level=app.config['COMPRESS_LEVEL'],
+        brotli_quality=app.config['COMPRESS_BR_QUALITY'],
+        observe=metrics.observe_compression if app.config['METRICS_ENABLED'] else None)
+    app.after_request(_after_request)
@@ -0,0 +1,42 @@
+# app/conditional.py
+# Helpers for conditional GET (ETag / Last-Modified -> 304 Not Modified).
+# Routes compute validators from cheap queries first and only build the
+# JSON body when the client's copy is out of date.
+import hashlib
+
+from flask import request, make_response
+
+
+def make_etag(*parts):
+    """Strong ETag value from anything that changes whenever the response body would."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def not_modified_response(etag, last_modified=None, honor_if_modified_since=True):
+    """Return a 304 response if the client's cached copy is still current, else None.
+
+    If-None-Match wins over If-Modified-Since (RFC 9110). Set
+    honor_if_modified_since=False when last_modified can't see every change
+    (e.g. a deleted row doesn't move a list's max(updated_at)).
+    """
+    if request.if_none_match:
+        # Weak comparison (RFC 9110): compressed responses carry W/"..." (see compression.py)
+        fresh = request.if_none_match.contains_weak(etag)
+    elif honor_if_modified_since and last_modified and request.if_modified_since:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = make_response('', 304)
+    return add_validators(response, etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Per-user data: browsers may keep it but must revalidate (cheaply, thanks to the ETag) every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,96 @@
+# app/db_routing.py
+# Read replicas: SELECTs of GET/HEAD requests go to a replica, everything else
+# to the primary (DATABASE_URL).
+#
+# - Replicas are Flask-SQLAlchemy binds ('replica0', 'replica1', ...) built from
+#   DATABASE_REPLICA_URLS. They must be copies of the primary kept in sync by the
+#   database's own replication; migrations only ever run on the primary.
+# - Writes, SELECT ... FOR UPDATE, raw SQL (text()) and every statement after
+#   the request's first flush use the primary.
+# - After a request that wrote, the client gets a short-lived cookie that keeps
+#   its reads on the primary for DB_REPLICA_PIN_SECONDS, so users see their own
+#   changes despite replication lag. A plain cookie rather than the session:
+#   reading the session would add "Vary: Cookie" to every GET response.
+import math
+import random
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.selectable import SelectBase
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+PIN_COOKIE = 'db_primary_until'
+
+
+class Router:
+    """Replica bind keys, the pin window and routing counters (read through stats())."""
+
+    def __init__(self, replica_keys, pin_seconds=5):
+        self.replica_keys = list(replica_keys)
+        self.pin_seconds = pin_seconds
+        # Counters
+        self.replica_reads = 0
+        self.primary_reads = 0  # SELECTs that could have used a replica but didn't (write, pin, ...)
+        self.pinned_requests = 0
+
+    def stats(self):
+        return {"replicas": len(self.replica_keys), "pin_seconds": self.pin_seconds,
+                "replica_reads": self.replica_reads, "primary_reads": self.primary_reads,
+                "pinned_requests": self.pinned_requests}
+
+
+def _request_may_use_replica(router):
+    if request.method not in READ_METHODS:
+        return False
+    try:
+        pinned = float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        pinned = False
+    if pinned:
+        router.pinned_requests += 1
+    return not pinned
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy's session, sending plain reads to a replica when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        router = current_app.extensions.get('db_routing')
+        if (bind is None and router is not None and isinstance(clause, SelectBase)
+                and getattr(clause, '_for_update_arg', None) is None and has_request_context()):
+            ctx_g = g._get_current_object()
+            use_replica = ctx_g.get('db_use_replica')
+            if use_replica is None: # Decided once per request, on its first SELECT
+                use_replica = ctx_g.db_use_replica = _request_may_use_replica(router)
+            if use_replica and not self._flushing and not self.info.get('wrote'):
+                router.replica_reads += 1
+                return self._db.engines[random.choice(router.replica_keys)]
+            router.primary_reads += 1
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _after_flush(session, flush_context):
+    session.info['wrote'] = True # Later reads in this session see its own writes
+    if has_request_context():
+        g.db_wrote = True
+
+
+def _after_request(response):
+    if g.pop('db_wrote', False):
+        pin_seconds = current_app.extensions['db_routing'].pin_seconds
+        # The value holds the exact expiry; Max-Age must be whole seconds
+        response.set_cookie(PIN_COOKIE, f"{time.time() + pin_seconds:.3f}", max_age=math.ceil(pin_seconds),
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def init_app(app):
+    replica_keys = [key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('replica')]
+    if not replica_keys:
+        return
+    app.extensions['db_routing'] = Router(replica_keys, pin_seconds=app.config['DB_REPLICA_PIN_SECONDS'])
+    if not event.contains(RoutingSession, 'after_flush', _after_flush):
+        event.listen(RoutingSession, 'after_flush', _after_flush)
+    app.after_request(_after_request)
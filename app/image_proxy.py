@@ -0,0 +1,494 @@
+# app/image_proxy.py
+# Same-origin image proxy with an on-disk thumbnail cache.
+#
+# Recipe images and TheMealDB thumbnails are served as
+#   /img/<size>/<signature>?u=<source url>
+# The signature (an HMAC of size and URL under SECRET_KEY) means /img only
+# fetches URLs the app handed out itself, so it is not an open proxy.
+#
+# Each source is downloaded once. Originals are stored under the SHA-256 of
+# their bytes (content-addressed: URLs serving the same picture share a file)
+# and each thumbnail size is made from them once. When the cache directory
+# grows past IMAGE_CACHE_MAX_BYTES, the least recently used files go first.
+# Thumbnails need Pillow; without it the original is served (still cached,
+# same origin and immutable).
+import base64
+import functools
+import hashlib
+import hmac
+import ipaddress
+import io
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urljoin, urlsplit
+
+import requests
+from flask import current_app, jsonify, redirect, request, send_file
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .admission import ConcurrencyLimiter
+from .cache import _Flight
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Optional: without Pillow the original image is served
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height); thumbnails are cropped to fill the box (like CSS object-fit: cover)
+SIZES = {
+    'thumb': (480, 360), # Search and list cards (200px high, up to 2x for high-DPI screens)
+}
+THUMB_QUALITY = 82
+MAX_SOURCE_PIXELS = 40_000_000 # Refuse decompression bombs before decoding them
+MAX_REDIRECTS = 3
+FAILURE_TTL = 60               # Seconds a failed source is not retried
+# Formats served as-is when Pillow is missing (no SVG: it can carry scripts)
+RASTER_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif'}
+
+
+class ImageFetchError(Exception):
+    """The source image could not be fetched or decoded."""
+
+    def __init__(self, message, blocked=False):
+        super().__init__(message)
+        self.blocked = blocked # True when the URL itself is refused (never redirect the browser to it)
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+_PLAIN_URL = re.compile(r"[A-Za-z0-9\-._~:/@]+") # Fine inside a query value without escaping
+
+
+def _signature(key, size, source):
+    mac = hmac.digest(key, f'{size}\n{source}'.encode(), 'sha256')[:16]
+    return base64.urlsafe_b64encode(mac).decode().rstrip('=')
+
+
+def sign(source, size):
+    return _signature(current_app.config['SECRET_KEY'].encode(), size, source)
+
+
+@functools.lru_cache(maxsize=65536) # The same rows come back page after page
+def _proxied(key, prefix, size, source):
+    # quote() costs several microseconds; most image URLs don't need it
+    query = source if _PLAIN_URL.fullmatch(source) else quote(source, safe='')
+    return f"{prefix}{size}/{_signature(key, size, source)}?u={query}"
+
+
+def _url_builder(size='thumb'):
+    """Function turning a source URL into its proxied URL (config and request looked up once)."""
+    if not current_app.config['IMAGE_PROXY_ENABLED']:
+        return lambda source: source
+    key = current_app.config['SECRET_KEY'].encode()
+    prefix = f"{request.script_root}/img/"
+
+    def build(source):
+        if not source or not source.startswith(('http://', 'https://')):
+            return source # Nothing to proxy
+        # Built by hand rather than with url_for(): this runs for every row of a list
+        return _proxied(key, prefix, size, source)
+    return build
+
+
+def thumbnail_url(source, size='thumb'):
+    """Proxied URL for an image URL, or the URL unchanged if it can't (or shouldn't) be proxied."""
+    return _url_builder(size)(source)
+
+
+def add_thumbnails(items, field='image_url'):
+    """Add thumbnail_url next to `field` in each dict of a list response."""
+    build = _url_builder()
+    for item in items:
+        item['thumbnail_url'] = build(item[field])
+    return items
+
+
+def _public_address(host, port):
+    """The address to connect to for host, or ImageFetchError if any address it resolves to isn't public."""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise ImageFetchError(f"Cannot resolve {host}: {e}")
+    for info in infos:
+        if not ipaddress.ip_address(info[4][0].split('%')[0]).is_global:
+            raise ImageFetchError(f"{host} is not a public address", blocked=True)
+    return infos[0][4][0]
+
+
+class _PublicOnlyConnection:
+    """Resolves and checks the host itself, then connects to exactly that address.
+
+    A check before the request isn't enough: the connection would resolve the
+    name again, and a DNS-rebinding host can answer with a private address the
+    second time. TLS still uses the hostname (SNI and certificate checks).
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        self._dns_host = _public_address(host, self.port)
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+
+
+class _PublicHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = type('PublicHTTPConnection', (_PublicOnlyConnection, HTTPConnection), {})
+
+
+class _PublicHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = type('PublicHTTPSConnection', (_PublicOnlyConnection, HTTPSConnection), {})
+
+
+class _PublicOnlyAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _PublicHTTPConnectionPool,
+                                                   'https': _PublicHTTPSConnectionPool}
+
+
+class ImageStore:
+    """Content-addressed image files under `directory`, trimmed to `max_bytes`.
+
+    Layout:
+      sources/ab/<sha256(url)>        "<content digest> <mimetype>" of the URL's image
+      blobs/ab/<content digest>       original bytes
+      thumbs/ab/<digest>-<size>.jpg   resized copies
+    File mtimes record the last use, for LRU eviction.
+    """
+
+    def __init__(self, directory, max_bytes, max_source_bytes=10 * 1024 * 1024, timeout=5,
+                 allow_private=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_source_bytes = max_source_bytes
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self._size = None    # Bytes on disk, counted by the first _evict()
+        self._inflight = {}  # (url, size) -> _Flight
+        self._failed = {}    # url -> monotonic time the failure expires
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        # Counters (read through stats())
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.bytes_fetched = 0
+        self.evictions = 0
+
+        self.session = requests.Session()
+        adapter_class = HTTPAdapter if allow_private else _PublicOnlyAdapter
+        adapter = adapter_class(pool_connections=4, pool_maxsize=10, max_retries=0)
+        if not allow_private:
+            self.session.trust_env = False # No proxy from the environment: the check must see the real peer
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    # --- Paths ---
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, name[:2], name)
+
+    def _source_path(self, url):
+        return self._path('sources', _sha256(url.encode()))
+
+    def _variant(self, digest, mimetype, size):
+        """(path, mimetype) of the file served for this size."""
+        if Image is None:
+            return self._path('blobs', digest), mimetype
+        return self._path('thumbs', f'{digest}-{size}.jpg'), 'image/jpeg'
+
+    # --- Lookup ---
+
+    def cached(self, url, size):
+        """(path, mimetype, etag) of url's image at size if it is on disk, else None. Never fetches."""
+        return self._cached(self._read_source(url), size)
+
+    def _cached(self, source, size):
+        if source is not None:
+            path, mimetype = self._variant(*source, size)
+            if self._touch(path):
+                self.hits += 1
+                return path, mimetype, f'{source[0][:32]}-{size}'
+        return None
+
+    def get(self, url, size):
+        """Return (path, mimetype, etag) for url's image at size, fetching and resizing on first use.
+
+        Raises ImageFetchError.
+        """
+        source = self._read_source(url)
+        found = self._cached(source, size)
+        if found is not None:
+            return found
+
+        key = (url, size)
+        with self._lock:
+            expires = self._failed.get(url)
+            if expires is not None and expires > time.monotonic():
+                raise ImageFetchError("Image source failed recently")
+            flight = self._inflight.get(key)
+            if flight is not None:
+                # Someone is already fetching this image, wait for their result
+                self.merged += 1
+                leader = False
+            else:
+                self.misses += 1
+                flight = self._inflight[key] = _Flight()
+                leader = True
+        if leader:
+            try:
+                flight.value = self._build(url, size, source)
+            except Exception as e:
+                flight.error = e
+                if not isinstance(e, ImageFetchError) or not e.blocked:
+                    with self._lock:
+                        if len(self._failed) > 10000: # Bounded: forget old failures wholesale
+                            self._failed.clear()
+                        self._failed[url] = time.monotonic() + FAILURE_TTL
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.done.set()
+        return flight.wait()
+
+    def _read_source(self, url):
+        try:
+            with open(self._source_path(url)) as f:
+                digest, mimetype = f.read().split(' ', 1)
+            return digest, mimetype
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, path):
+        # Marks the file as used for eviction; False if it isn't there (never made, or evicted)
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _build(self, url, size, source):
+        data = None
+        if source is not None:
+            digest, mimetype = source
+            try:
+                with open(self._path('blobs', digest), 'rb') as f:
+                    data = f.read()
+            except OSError: # Original evicted, fetch it again
+                data = None
+        if data is None:
+            data, mimetype = self._fetch(url)
+            digest = _sha256(data)
+            self._write(self._path('blobs', digest), data)
+            self._write(self._source_path(url), f'{digest} {mimetype}'.encode())
+
+        path, served_type = self._variant(digest, mimetype, size)
+        if Image is not None and not self._touch(path):
+            self._write(path, _make_thumbnail(data, SIZES[size]))
+        return path, served_type, f'{digest[:32]}-{size}'
+
+    # --- Fetching ---
+
+    def _check_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ImageFetchError("Only http(s) image URLs can be proxied", blocked=True)
+        if self.allow_private:
+            return
+        # Recipe image URLs are user input: don't let them reach the server's own network.
+        # (Refused early here; _PublicOnlyAdapter enforces it on the address actually connected to.)
+        _public_address(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+
+    def _fetch(self, url):
+        """Download url. Returns (bytes, mimetype)."""
+        self.fetches += 1
+        started = time.perf_counter()
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                self._check_url(url) # Every hop, so a redirect can't lead somewhere private
+                with self.session.get(url, timeout=self.timeout, stream=True, allow_redirects=False) as response:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers['Location'])
+                        continue
+                    response.raise_for_status()
+                    mimetype = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    if not mimetype.startswith('image/') or (Image is None and mimetype not in RASTER_TYPES):
+                        raise ImageFetchError(f"Not a supported image ({mimetype or 'no Content-Type'})")
+                    if int(response.headers.get('Content-Length') or 0) > self.max_source_bytes:
+                        raise ImageFetchError("Image is too large")
+                    chunks, total = [], 0
+                    for chunk in response.iter_content(64 * 1024):
+                        total += len(chunk)
+                        if total > self.max_source_bytes:
+                            raise ImageFetchError("Image is too large")
+                        chunks.append(chunk)
+                    self.bytes_fetched += total
+                    logger.info("image_fetch url=%s bytes=%d elapsed_ms=%.1f",
+                                url, total, (time.perf_counter() - started) * 1000)
+                    return b''.join(chunks), mimetype
+            raise ImageFetchError("Too many redirects")
+        except requests.exceptions.RequestException as e:
+            self.fetch_errors += 1
+            logger.warning("image_fetch url=%s error=%r", url, e)
+            raise ImageFetchError(f"Failed to fetch image: {e}")
+        except ImageFetchError as e:
+            self.fetch_errors += 1
+            logger.warning("image_fetch url=%s error=%s", url, e)
+            raise
+
+    # --- Writing and eviction ---
+
+    def _write(self, path, data):
+        # Write to a temporary file and rename, so readers (and other workers) never see half a file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            # Not counted yet: _evict() walks the directory, outside _lock so hits and misses don't wait on it
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _scan(self):
+        """(mtime, bytes, path) of every cached file."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError: # Removed meanwhile (another worker's eviction)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _evict(self):
+        if not self._evict_lock.acquire(blocking=False):
+            return # Another thread is already evicting
+        try:
+            files = sorted(self._scan()) # Least recently used first
+            total = sum(size for _, size, _ in files)
+            if total > self.max_bytes: # (Only counting, on the first call after startup)
+                target = self.max_bytes * 0.9 # Some headroom, so we don't rescan on every write
+                for _, size, path in files:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        self.evictions += 1
+                    except OSError:
+                        pass
+                    total -= size
+            with self._lock:
+                self._size = total
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "merged": self.merged,
+            "fetches": self.fetches,
+            "fetch_errors": self.fetch_errors,
+            "bytes_fetched": self.bytes_fetched,
+            "evictions": self.evictions,
+            "bytes_cached": self._size if self._size is not None else -1, # -1 until the first write
+            "thumbnails": Image is not None,
+        }
+
+
+def _make_thumbnail(data, box):
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_SOURCE_PIXELS:
+            raise ImageFetchError("Image has too many pixels")
+        image.draft('RGB', (box[0] * 2, box[1] * 2)) # JPEGs decode at a reduced scale: much faster
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGBA') if 'A' in image.getbands() or 'transparency' in image.info else image.convert('RGB')
+        if image.mode == 'RGBA': # JPEG has no alpha: flatten onto white
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        image = ImageOps.fit(image, box, Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, 'JPEG', quality=THUMB_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+    except ImageFetchError:
+        raise
+    except Exception as e: # Pillow raises many types for broken or unsupported files
+        raise ImageFetchError(f"Cannot read image: {e}")
+
+
+def _source_redirect(source):
+    # Let the browser try the source itself rather than show a broken image
+    response = redirect(source, 302)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def image_view(size, signature):
+    source = request.args.get('u', '')
+    if size not in SIZES or not source or not hmac.compare_digest(signature, sign(source, size)):
+        return jsonify({"error": "Image not found"}), 404
+    store = current_app.extensions['image_store']
+    found = store.cached(source, size)
+    if found is None:
+        # A miss fetches from the source: at most IMAGE_FETCH_MAX_CONCURRENCY at once, like the TheMealDB routes
+        limiter = current_app.extensions['limiters']['images']
+        if not limiter.acquire():
+            return _source_redirect(source)
+        try:
+            found = store.get(source, size)
+        except ImageFetchError as e:
+            if e.blocked:
+                return jsonify({"error": str(e)}), 404
+            return _source_redirect(source)
+        finally:
+            limiter.release()
+    path, mimetype, etag = found
+    # The URL names one image at one size forever (a changed image_url gets a new URL): cache for good
+    response = send_file(path, mimetype=mimetype, etag=etag, conditional=True,
+                         max_age=current_app.config['IMAGE_CACHE_MAX_AGE'])
+    response.cache_control.immutable = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'; sandbox"
+    return response
+
+
+def init_app(app):
+    if not app.config['IMAGE_PROXY_ENABLED']:
+        return
+    app.extensions['image_store'] = ImageStore(
+        app.config['IMAGE_CACHE_DIR'],
+        max_bytes=app.config['IMAGE_CACHE_MAX_BYTES'],
+        max_source_bytes=app.config['IMAGE_MAX_SOURCE_BYTES'],
+        timeout=app.config['IMAGE_FETCH_TIMEOUT'],
+        allow_private=app.config['IMAGE_PROXY_ALLOW_PRIVATE'])
+    app.extensions['limiters']['images'] = ConcurrencyLimiter(app.config['IMAGE_FETCH_MAX_CONCURRENCY'],
+                                                              queue_size=app.config['IMAGE_FETCH_QUEUE_SIZE'],
+                                                              queue_timeout=app.config['IMAGE_FETCH_QUEUE_TIMEOUT'])
+    app.add_url_rule('/img/<size>/<signature>', 'image_proxy', image_view)
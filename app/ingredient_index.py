@@ -0,0 +1,253 @@
+# app/ingredient_index.py
+# Structured ingredients for "what can I cook with what I have" queries.
+#
+# Recipe.ingredients is free text (one ingredient per line). On every flush
+# the lines are parsed into a shared vocabulary (ingredients table) and a
+# recipe_ingredients association, so nothing ever has to LIKE-scan recipes.
+# Pantry matching then runs on an in-memory per-user bitset index built from
+# that association table.
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, delete, insert, select, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Recipe, Ingredient, RecipeIngredient
+from .search_index import stem
+from .sharding import recipe_connections
+
+MAX_INGREDIENTS_PER_RECIPE = 50
+
+_WORD_RE = re.compile(r"[a-z]+")
+UNITS = {
+    'cup', 'cups', 'c', 'tbsp', 'tbs', 'tablespoon', 'tablespoons', 'tsp', 'teaspoon', 'teaspoons',
+    'g', 'gram', 'grams', 'kg', 'mg', 'ml', 'l', 'litre', 'liter', 'litres', 'liters', 'dl', 'cl',
+    'oz', 'ounce', 'ounces', 'lb', 'lbs', 'pound', 'pounds', 'pinch', 'dash', 'handful', 'clove',
+    'cloves', 'can', 'cans', 'tin', 'tins', 'jar', 'packet', 'pack', 'slice', 'slices', 'piece',
+    'pieces', 'bunch', 'sprig', 'sprigs', 'stick', 'sticks', 'head', 'knob', 'drop', 'drops', 'loaf', 'loaves',
+}
+DESCRIPTORS = {
+    'fresh', 'freshly', 'chopped', 'finely', 'roughly', 'minced', 'diced', 'sliced', 'grated',
+    'crushed', 'ground', 'large', 'small', 'medium', 'ripe', 'peeled', 'optional', 'about',
+    'of', 'a', 'an', 'the', 'to', 'taste', 'some', 'for', 'serving', 'plus', 'extra', 'x',
+}
+
+
+def parse_ingredient_line(line):
+    """Turn one free-text line into a normalized ingredient name, or None.
+
+    "2 cups finely chopped Onions (about 2)" -> "onion"
+    "3 garlic cloves, crushed"             -> "garlic"
+    """
+    line = re.sub(r"\(.*?\)", " ", line.lower()) # Drop parentheticals
+    line = line.split(',')[0]                     # "onion, finely chopped" -> "onion"
+    words = [stem(word) for word in _WORD_RE.findall(line) # Letters only, so quantities disappear
+             if word not in UNITS and word not in DESCRIPTORS]
+    name = ' '.join(words)[:100].strip()
+    return name or None
+
+
+def parse_ingredients(text):
+    """Distinct normalized ingredient names for a recipe's ingredients text."""
+    names = []
+    for line in (text or '').splitlines():
+        name = parse_ingredient_line(line)
+        if name and name not in names:
+            names.append(name)
+    return names[:MAX_INGREDIENTS_PER_RECIPE]
+
+
+def _ingredient_ids(connection, names):
+    """Return {name: ingredient_id}, adding missing names to the vocabulary."""
+    table = Ingredient.__table__
+    ids = dict(connection.execute(select(table.c.name, table.c.ingredient_id).where(table.c.name.in_(names))).all())
+    for name in names:
+        if name in ids:
+            continue
+        try:
+            with connection.begin_nested(): # Another request may add the same name concurrently
+                ids[name] = connection.execute(insert(table).values(name=name)).inserted_primary_key[0]
+        except IntegrityError:
+            ids[name] = connection.execute(select(table.c.ingredient_id).where(table.c.name == name)).scalar_one()
+    return ids
+
+
+# --- Keeping the association in sync ---
+
+def _sync_after_flush(session, flush_context):
+    changed = [obj for obj in session.new if isinstance(obj, Recipe)]
+    changed += [obj for obj in session.dirty
+                if isinstance(obj, Recipe) and inspect(obj).attrs.ingredients.history.has_changes()]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Recipe)]
+    if not changed and not deleted:
+        return
+
+    to_index = set(changed) # Deleted recipes only lose their rows
+    # session.execute() is not allowed mid-flush. One connection per shard when recipes are
+    # sharded; each shard keeps its own vocabulary (see app/sharding.py)
+    for connection, recipes in recipe_connections(session, changed + deleted):
+        connection.execute(delete(RecipeIngredient.__table__).where(
+            RecipeIngredient.recipe_id.in_([recipe.recipe_id for recipe in recipes])))
+
+        parsed = {recipe.recipe_id: parse_ingredients(recipe.ingredients)
+                  for recipe in recipes if recipe in to_index}
+        all_names = sorted({name for names in parsed.values() for name in names})
+        if all_names:
+            ids = _ingredient_ids(connection, all_names)
+            connection.execute(insert(RecipeIngredient.__table__), [
+                {"recipe_id": recipe.recipe_id, "ingredient_id": ids[name], "user_id": recipe.user_id}
+                for recipe in recipes if recipe.recipe_id in parsed for name in parsed[recipe.recipe_id]])
+
+    for user_id in {recipe.user_id for recipe in changed + deleted}:
+        pantry_index.invalidate(user_id)
+
+
+def init_app(app):
+    pantry_index.ttl = app.config['PANTRY_INDEX_TTL']
+    pantry_index.max_users = app.config['PANTRY_INDEX_MAX_USERS']
+    if not event.contains(Session, 'after_flush', _sync_after_flush):
+        event.listen(Session, 'after_flush', _sync_after_flush)
+
+
+def backfill(batch_size=500):
+    """(Re)build recipe_ingredients for every recipe. Returns the number of recipes processed.
+
+    With sharding, runs on one shard: call it inside sharding.using_shard().
+    """
+    db.session.execute(delete(RecipeIngredient.__table__))
+    connection = db.session.connection(bind_arguments={'mapper': RecipeIngredient}) # The shard's connection, if sharded
+    count = 0
+    batch = []
+    for recipe_id, user_id, text in (db.session.query(Recipe.recipe_id, Recipe.user_id, Recipe.ingredients)
+                                     .order_by(Recipe.recipe_id).yield_per(batch_size)):
+        batch.append((recipe_id, user_id, parse_ingredients(text)))
+        count += 1
+        if len(batch) >= batch_size:
+            _insert_batch(connection, batch)
+            batch = []
+    _insert_batch(connection, batch)
+    db.session.commit()
+    pantry_index.invalidate()
+    return count
+
+
+def _insert_batch(connection, batch):
+    names = sorted({name for _, _, names in batch for name in names})
+    if not names:
+        return
+    ids = _ingredient_ids(connection, names)
+    connection.execute(insert(RecipeIngredient.__table__), [
+        {"recipe_id": recipe_id, "ingredient_id": ids[name], "user_id": user_id}
+        for recipe_id, user_id, names in batch for name in names])
+
+
+# --- Pantry matching ---
+
+class _UserIndex:
+    """Bitsets for one user: one bit per ingredient they use, one int mask per recipe."""
+
+    def __init__(self, rows):
+        self.built_at = time.monotonic()
+        self.bit_of = {}      # ingredient_id -> bit position
+        self.names = []       # bit position -> ingredient name
+        self.word_bits = {}   # word -> mask of ingredients whose name contains it
+        masks = {}            # recipe_id -> mask
+        for recipe_id, ingredient_id, name in rows:
+            bit = self.bit_of.get(ingredient_id)
+            if bit is None:
+                bit = self.bit_of[ingredient_id] = len(self.names)
+                self.names.append(name)
+                for word in name.split():
+                    self.word_bits[word] = self.word_bits.get(word, 0) | (1 << bit)
+            masks[recipe_id] = masks.get(recipe_id, 0) | (1 << bit)
+        self.recipes = [(recipe_id, mask, _popcount(mask)) for recipe_id, mask in masks.items()]
+
+    def pantry_mask(self, pantry_names):
+        # "chicken" in the pantry covers "chicken thigh" and "chicken breast" in recipes
+        mask = 0
+        for name in pantry_names:
+            words = name.split()
+            item_mask = self.word_bits.get(words[0], 0) if words else 0
+            for word in words[1:]:
+                item_mask &= self.word_bits.get(word, 0)
+            mask |= item_mask
+        return mask
+
+    def names_for(self, mask):
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+
+def _popcount(mask):
+    return bin(mask).count('1') # int.bit_count() needs Python 3.10
+
+
+class PantryIndex:
+    """Per-process cache of _UserIndex objects.
+
+    Writes in this process invalidate a user's entry right away (see
+    _sync_after_flush); `ttl` bounds how stale an entry can get when another
+    worker process made the change. At most `max_users` entries are kept,
+    least recently used dropped first.
+    """
+
+    def __init__(self, ttl=60, max_users=1000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users = OrderedDict() # user_id -> _UserIndex, least recently used first
+        self._lock = threading.Lock()
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def for_user(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+        if index is None or time.monotonic() - index.built_at > self.ttl:
+            rows = (db.session.query(RecipeIngredient.recipe_id, Ingredient.ingredient_id, Ingredient.name)
+                    .join(Ingredient, Ingredient.ingredient_id == RecipeIngredient.ingredient_id)
+                    .filter(RecipeIngredient.user_id == user_id)
+                    .all())
+            index = _UserIndex(rows)
+            with self._lock:
+                self._users[user_id] = index
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+        return index
+
+    def match(self, user_id, pantry, limit=20, min_coverage=0.0):
+        """Rank a user's recipes by the share of their ingredients found in `pantry`.
+
+        Returns a list of dicts (recipe_id, coverage, have, missing), best first.
+        """
+        index = self.for_user(user_id)
+        pantry_names = [name for name in (parse_ingredient_line(item) for item in pantry) if name]
+        have_mask = index.pantry_mask(pantry_names)
+        if not have_mask:
+            return []
+
+        scored = []
+        for recipe_id, mask, total in index.recipes:
+            have = _popcount(mask & have_mask)
+            if have and have / total >= min_coverage:
+                scored.append((have / total, -(total - have), recipe_id, mask))
+        scored.sort(reverse=True) # Best coverage, then fewest missing, then newest id
+        return [{
+            "recipe_id": recipe_id,
+            "coverage": round(coverage, 3),
+            "have": index.names_for(mask & have_mask),
+            "missing": index.names_for(mask & ~have_mask),
+        } for coverage, _, recipe_id, mask in scored[:limit]]
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,59 @@
+# app/json_provider.py
+# Flask JSON provider that uses orjson when it is installed (pip install orjson)
+# and Python's json module otherwise. Either way the output is the same JSON:
+# sorted keys, and datetimes as ISO 8601 strings (like .isoformat()) instead
+# of Flask's default HTTP dates, so serializers can hand over raw datetimes.
+import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError: # Optional dependency
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime.date, datetime.time)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def __init__(self, app, use_orjson=True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    @property
+    def backend(self):
+        return 'orjson' if self.use_orjson else 'json'
+
+    def _orjson_options(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATACLASS # Let _default handle dataclasses like Flask does
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Callers passing json.dumps options (cls, separators, ...) get the stdlib encoder
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self.use_orjson:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # orjson produces bytes, which go into the response as-is (no str round trip)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
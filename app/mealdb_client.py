@@ -0,0 +1,304 @@
+# app/mealdb_client.py
+# Shared HTTP client for TheMealDB: pooled keep-alive connections, retries
+# with jittered backoff (limited by a retry budget) and a circuit breaker.
+# AsyncMealDBClient is the same client for coroutines (used by app/asgi.py).
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError: # Optional: only needed by AsyncMealDBClient (ASGI mode)
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without calling TheMealDB while the circuit breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__("TheMealDB is temporarily unavailable, try again later.")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The request's deadline ran out before TheMealDB could be (re)tried."""
+
+
+class RetryBudget:
+    """Allows retries only up to `ratio` of recent requests (plus a small floor).
+
+    Every request deposits `ratio` tokens and every retry spends one, so when
+    upstream is failing everywhere we stop multiplying the load on it.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=3, max_tokens=50):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and stays open for `cooldown` seconds.
+
+    After the cooldown one trial call is let through (half-open): success
+    closes the circuit again, failure re-opens it. A trial that ends neither
+    way (deadline, cancellation) must still call release_trial().
+    """
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self._opened_at >= self.cooldown else 'open'
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not go out; True if the caller is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            waited = time.monotonic() - self._opened_at
+            if waited < self.cooldown or self._trial_running:
+                raise CircuitOpenError(retry_after=max(1, int(self.cooldown - waited)))
+            self._trial_running = True # Half-open: this caller is the trial
+            return True
+
+    def release_trial(self):
+        """End a trial without an outcome: the next caller may try again. No-op once recorded."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning("mealdb_circuit_open failures=%d cooldown_s=%s", self._failures, self.cooldown)
+                self._opened_at = time.monotonic() # (Re)start the cooldown
+            self._trial_running = False
+
+
+class MealDBClient:
+    def __init__(self, api_base, connect_timeout=3.05, read_timeout=5, max_retries=2,
+                 backoff_base=0.2, backoff_max=2.0, pool_size=20,
+                 retry_budget=None, breaker=None, observe=None):
+        self.api_base = api_base.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout) # requests' (connect, read) tuple
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.observe = observe # Optional callback(endpoint, outcome, elapsed_seconds), e.g. for metrics
+        # Counters (read through stats())
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+        # One session for the whole process, so TCP+TLS connections are kept alive and reused
+        self.session = self._make_session(pool_size)
+
+    def _make_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0) # We retry ourselves
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _backoff(self, attempt):
+        # "Full jitter": a random wait up to the exponential cap, so retries don't line up
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _observe(self, endpoint, outcome, elapsed):
+        if self.observe is not None:
+            self.observe(endpoint, outcome, elapsed)
+
+    # --- Call policy, shared by the sync and async get_json() ---
+
+    def _begin(self, endpoint):
+        """Count the call, or raise CircuitOpenError without making it. True if it is the breaker's trial."""
+        try:
+            trial = self.breaker.before_call()
+        except CircuitOpenError:
+            self.short_circuited += 1
+            self._observe(endpoint, 'short_circuited', 0.0)
+            raise
+        self.calls += 1
+        self.retry_budget.record_request()
+        return trial
+
+    def _timeout(self, deadline, attempt):
+        """(connect, read) timeouts for the next attempt, cut to what is left of the deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded after {attempt} attempt(s)")
+        return (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+
+    def _retry_delay(self, status, attempt, deadline):
+        """Seconds to wait before retrying a failed attempt, or None to give up."""
+        retryable = status is None or status in RETRYABLE_STATUS # Connection errors/timeouts have no status
+        backoff = self._backoff(attempt + 1)
+        in_time = deadline is None or time.monotonic() + backoff < deadline # No retry that can't even start
+        if retryable and in_time and attempt < self.max_retries and self.retry_budget.try_spend():
+            self.retries += 1
+            return backoff
+        return None
+
+    def _deadline_exceeded(self, endpoint, params, attempt, started):
+        self.failures += 1
+        logger.warning("mealdb_call endpoint=%s params=%s status=deadline attempts=%d elapsed_ms=%.1f",
+                       endpoint, params, attempt, (time.perf_counter() - started) * 1000)
+        self._observe(endpoint, 'deadline', time.perf_counter() - started)
+
+    def _failed(self, endpoint, params, status, attempt, started, error):
+        if status is None or status in RETRYABLE_STATUS:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success() # A 4xx means upstream is up, the request was just bad
+        self.failures += 1
+        logger.warning("mealdb_call endpoint=%s params=%s status=%s attempts=%d elapsed_ms=%.1f error=%r",
+                       endpoint, params, status, attempt + 1, (time.perf_counter() - started) * 1000, error)
+        self._observe(endpoint, 'error', time.perf_counter() - started)
+
+    def _succeeded(self, endpoint, params, status, attempt, started):
+        self.breaker.record_success()
+        logger.info("mealdb_call endpoint=%s params=%s status=%s attempts=%d elapsed_ms=%.1f",
+                    endpoint, params, status, attempt + 1, (time.perf_counter() - started) * 1000)
+        self._observe(endpoint, 'ok', time.perf_counter() - started)
+
+    def get_json(self, endpoint, params=None, deadline=None):
+        """GET {api_base}/{endpoint} and return the parsed JSON.
+
+        `deadline` (a time.monotonic() value) caps the whole call, retries included.
+        Raises CircuitOpenError while upstream is unhealthy, or another
+        requests.exceptions.RequestException when the call (and its retries) failed.
+        """
+        trial = self._begin(endpoint)
+        try:
+            url = f"{self.api_base}/{endpoint}"
+            started = time.perf_counter()
+            attempt = 0
+            while True:
+                status = None
+                try:
+                    response = self.session.get(url, params=params, timeout=self._timeout(deadline, attempt))
+                    status = response.status_code
+                    response.raise_for_status()
+                    data = response.json()
+                except DeadlineExceeded:
+                    self._deadline_exceeded(endpoint, params, attempt, started)
+                    raise
+                except requests.exceptions.RequestException as e:
+                    delay = self._retry_delay(status, attempt, deadline)
+                    if delay is not None:
+                        attempt += 1
+                        time.sleep(delay)
+                        continue
+                    self._failed(endpoint, params, status, attempt, started, e)
+                    raise
+                self._succeeded(endpoint, params, status, attempt, started)
+                return data
+        finally:
+            if trial:
+                self.breaker.release_trial() # Ended without an outcome (deadline, cancelled): let another caller try
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class AsyncMealDBClient(MealDBClient):
+    """MealDBClient for coroutines, on httpx.AsyncClient: waiting on TheMealDB holds no thread.
+
+    Same retries, deadline and logging. Pass the sync client's retry_budget and
+    breaker to share them, since both call the same upstream. get_json() raises
+    the same (requests) exceptions, so callers handle both clients alike.
+    Use from one event loop only (the httpx connection pool belongs to it).
+    """
+
+    def _make_session(self, pool_size):
+        if httpx is None:
+            raise RuntimeError("AsyncMealDBClient needs the httpx package (pip install httpx)")
+        return httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size,
+                                                     max_keepalive_connections=pool_size))
+
+    async def get_json(self, endpoint, params=None, deadline=None):
+        trial = self._begin(endpoint)
+        try:
+            url = f"{self.api_base}/{endpoint}"
+            started = time.perf_counter()
+            attempt = 0
+            while True:
+                status = None
+                try:
+                    connect, read = self._timeout(deadline, attempt)
+                    # pool: time to wait for a free connection when all pool_size are busy
+                    response = await self.session.get(url, params=params,
+                                                      timeout=httpx.Timeout(read, connect=connect, pool=connect))
+                    status = response.status_code
+                    response.raise_for_status()
+                    data = response.json()
+                except DeadlineExceeded:
+                    self._deadline_exceeded(endpoint, params, attempt, started)
+                    raise
+                except (httpx.HTTPError, ValueError) as e: # ValueError: the body wasn't JSON
+                    delay = self._retry_delay(status, attempt, deadline)
+                    if delay is not None:
+                        attempt += 1
+                        await asyncio.sleep(delay)
+                        continue
+                    self._failed(endpoint, params, status, attempt, started, e)
+                    if isinstance(e, httpx.TimeoutException):
+                        raise requests.exceptions.Timeout(str(e)) from e
+                    raise requests.exceptions.RequestException(str(e)) from e
+                self._succeeded(endpoint, params, status, attempt, started)
+                return data
+        finally:
+            if trial:
+                self.breaker.release_trial() # Ended without an outcome (deadline, cancelled): let another caller try
+
+    async def aclose(self):
+        await self.session.aclose()
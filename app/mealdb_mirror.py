@@ -0,0 +1,116 @@
+# app/mealdb_mirror.py
+# Local copy of TheMealDB's catalog, so searches don't have to leave our network.
+# Filled and refreshed by `flask mealdb ingest` (see cli.py).
+import hashlib
+import json
+import string
+from datetime import datetime
+
+from . import db
+from .models import MealDBMeal, MealDBIngredient
+
+
+def meal_ingredients(meal):
+    """Return the distinct, lowercased strIngredient1..20 values of a meal."""
+    found = []
+    for i in range(1, 21):
+        ingredient = (meal.get(f'strIngredient{i}') or '').strip().lower()
+        if ingredient and ingredient not in found:
+            found.append(ingredient[:100])
+    return found
+
+
+def _content_hash(meal):
+    # sort_keys so the same meal always hashes the same way
+    return hashlib.sha256(json.dumps(meal, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fetch_catalog(client, letters=string.ascii_lowercase):
+    """Yield every meal from TheMealDB, one search.php?f=<letter> call per letter."""
+    for letter in letters:
+        for meal in client.get_json('search.php', params={'f': letter}).get('meals') or []:
+            yield meal
+
+
+def load_dump(path):
+    """Read meals from a JSON dump, either {"meals": [...]} or a plain list."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('meals') or []
+    return data
+
+
+def upsert_meals(meals, prune=False):
+    """Insert new meals and rewrite changed ones. Unchanged meals are not touched.
+
+    With prune=True, meals that are in the mirror but not in `meals` are deleted,
+    so only pass it a complete catalog.
+    Returns a dict with added/updated/unchanged/removed counts.
+    """
+    known = dict(db.session.query(MealDBMeal.meal_id, MealDBMeal.content_hash)) # One query for all hashes
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    seen = set()
+
+    for meal in meals:
+        meal_id = meal.get('idMeal')
+        if not meal_id or not meal.get('strMeal') or meal_id in seen:
+            continue
+        seen.add(meal_id)
+        content_hash = _content_hash(meal)
+        if known.get(meal_id) == content_hash:
+            counts["unchanged"] += 1
+            continue
+
+        if meal_id in known:
+            row = db.session.get(MealDBMeal, meal_id)
+            row.ingredients = [] # Replaced below
+            counts["updated"] += 1
+        else:
+            row = MealDBMeal(meal_id=meal_id)
+            db.session.add(row)
+            counts["added"] += 1
+        row.name = meal['strMeal']
+        row.category = meal.get('strCategory')
+        row.area = meal.get('strArea')
+        row.thumb_url = meal.get('strMealThumb')
+        row.data = json.dumps(meal)
+        row.content_hash = content_hash
+        row.fetched_at = datetime.utcnow()
+        db.session.flush() # Delete replaced ingredient rows before adding the new ones
+        row.ingredients = [MealDBIngredient(ingredient=name) for name in meal_ingredients(meal)]
+
+    if prune:
+        missing = [meal_id for meal_id in known if meal_id not in seen]
+        if missing:
+            MealDBIngredient.query.filter(MealDBIngredient.meal_id.in_(missing)).delete(synchronize_session=False)
+            MealDBMeal.query.filter(MealDBMeal.meal_id.in_(missing)).delete(synchronize_session=False)
+        counts["removed"] = len(missing)
+
+    db.session.commit()
+    return counts
+
+
+def query_local(endpoint, value):
+    """Answer a TheMealDB call from the mirror, in TheMealDB's own response shape.
+
+    `value` is already normalized (see recipe_routes._normalize_key).
+    Returns None when the mirror can't answer (unknown endpoint, or a lookup
+    for an id we don't have), so the caller can go upstream instead.
+    """
+    if endpoint == 'lookup.php':
+        row = db.session.get(MealDBMeal, value)
+        return {"meals": [json.loads(row.data)]} if row else None
+
+    if endpoint == 'search.php':
+        # autoescape: "%" and "_" in the search are literal characters, as upstream treats them
+        query = MealDBMeal.query.filter(MealDBMeal.name.icontains(value, autoescape=True))
+    elif endpoint == 'filter.php':
+        query = MealDBMeal.query.join(MealDBIngredient).filter(MealDBIngredient.ingredient == value)
+    else:
+        return None
+
+    # Only the columns the search results need, skip parsing the stored JSON
+    rows = query.with_entities(MealDBMeal.meal_id, MealDBMeal.name, MealDBMeal.thumb_url).order_by(MealDBMeal.name).all()
+    meals = [{"idMeal": meal_id, "strMeal": name, "strMealThumb": thumb} for meal_id, name, thumb in rows]
+    return {"meals": meals or None} # TheMealDB returns null, not [], when nothing matches
@@ -0,0 +1,269 @@
+# app/metrics.py
+# In-process metrics served at /metrics in the Prometheus text format.
+#
+# A deliberately small registry (counters and histograms with labels) so the
+# app needs no extra dependency. Collected:
+# - per-route request latency and status counts (before/after_request hooks)
+# - SQL statements and time per request (SQLAlchemy engine events)
+# - TheMealDB call latency and outcomes (MealDBClient's `observe` callback)
+# - response compression: bytes in/out and CPU time per encoding (Compressor's `observe` callback)
+# - cache, circuit breaker, admission and image cache counters, read when /metrics is scraped
+# Each worker process keeps its own numbers; Prometheus sums them per instance.
+import bisect
+import hmac
+import threading
+import time
+
+from flask import Response, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {} # label values tuple -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {} # label values tuple -> [per-bucket counts (last one is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value) # Only one bucket is touched; render() accumulates
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(label_values, list(counts), total) for label_values, (counts, total) in self._series.items()]
+        names = self.labels + ('le',)
+        for label_values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, label_values + (bound,))} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = {} # name -> callable returning exposition lines, run at scrape time
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def set_collector(self, name, collector):
+        self._collectors[name] = collector # Replaces, so a second create_app() doesn't duplicate lines
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in list(self._collectors.values()):
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'flavorfind_http_requests_total', 'HTTP requests by route and status.',
+    labels=('blueprint', 'endpoint', 'method', 'status'))
+http_latency = registry.histogram(
+    'flavorfind_http_request_duration_seconds', 'Time to build the response, per route.',
+    labels=('blueprint', 'endpoint'))
+db_statements = registry.histogram(
+    'flavorfind_db_statements_per_request', 'SQL statements executed per request.',
+    labels=('endpoint',), buckets=COUNT_BUCKETS)
+db_time = registry.histogram(
+    'flavorfind_db_time_per_request_seconds', 'Time spent in SQL statements per request.',
+    labels=('endpoint',))
+mealdb_calls = registry.counter(
+    'flavorfind_mealdb_calls_total', 'TheMealDB calls by outcome (ok, error, deadline).',
+    labels=('endpoint', 'outcome'))
+mealdb_latency = registry.histogram(
+    'flavorfind_mealdb_call_duration_seconds', 'TheMealDB call latency, retries included.',
+    labels=('endpoint',))
+compression_responses = registry.counter(
+    'flavorfind_compression_responses_total', 'Compressed responses by encoding.',
+    labels=('encoding',))
+compression_bytes = registry.counter(
+    'flavorfind_compression_bytes_total', 'Response bytes before (in) and after (out) compression.',
+    labels=('encoding', 'direction'))
+compression_cpu = registry.counter(
+    'flavorfind_compression_cpu_seconds_total', 'CPU time spent compressing responses.',
+    labels=('encoding',))
+
+
+def observe_mealdb(endpoint, outcome, elapsed):
+    """MealDBClient `observe` callback."""
+    mealdb_calls.inc(endpoint, outcome)
+    mealdb_latency.observe(elapsed, endpoint)
+
+
+def observe_compression(encoding, bytes_in, bytes_out, cpu_seconds):
+    """Compressor `observe` callback; bytes saved = in - out."""
+    compression_responses.inc(encoding)
+    compression_bytes.inc(encoding, 'in', amount=bytes_in)
+    compression_bytes.inc(encoding, 'out', amount=bytes_out)
+    compression_cpu.inc(encoding, amount=cpu_seconds)
+
+
+# --- Request and SQL instrumentation ---
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db = [0, 0.0] # statements, seconds
+
+
+def _after_request(response):
+    ctx_g = g._get_current_object() # Resolve the context-local proxies once; each lookup costs ~1us
+    started = ctx_g.pop('metrics_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    req = request._get_current_object()
+    endpoint = req.endpoint or 'unmatched' # 404s share one series instead of one per URL
+    blueprint = endpoint.rpartition('.')[0]  # What request.blueprint computes, without the extra lookups
+    http_requests.inc(blueprint, endpoint, req.method, response.status_code)
+    http_latency.observe(elapsed, blueprint, endpoint)
+    statements, seconds = ctx_g.pop('metrics_db')
+    db_statements.observe(statements, endpoint)
+    db_time.observe(seconds, endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['metrics_started'].pop()
+    if has_app_context():
+        counts = g.get('metrics_db')
+        if counts is not None: # Inside a request (not a CLI command or background thread)
+            counts[0] += 1
+            counts[1] += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_started'):
+        connection.info['metrics_started'].pop()
+
+
+def _collect_app_stats(app):
+    def collect():
+        lines = []
+        gauges = {
+            'flavorfind_mealdb_cache': app.extensions['mealdb_cache'].stats(),
+            'flavorfind_page_cache': app.extensions['page_cache'].stats(),
+            'flavorfind_mealdb_client': app.extensions['mealdb_client'].stats(),
+        }
+        if 'suggest_index' in app.extensions:
+            gauges['flavorfind_suggest'] = app.extensions['suggest_index'].stats()
+        if 'similarity_index' in app.extensions:
+            gauges['flavorfind_similarity'] = app.extensions['similarity_index'].stats()
+        if 'db_routing' in app.extensions: # Read replicas configured
+            gauges['flavorfind_db_routing'] = app.extensions['db_routing'].stats()
+        if 'sharding' in app.extensions: # Recipe shards configured
+            gauges['flavorfind_sharding'] = app.extensions['sharding'].stats()
+        if 'mealdb_async_client' in app.extensions: # ASGI mode
+            gauges['flavorfind_mealdb_async_client'] = app.extensions['mealdb_async_client'].stats()
+        if 'image_store' in app.extensions:
+            gauges['flavorfind_image_cache'] = app.extensions['image_store'].stats()
+        for name, limiter in app.extensions['limiters'].items():
+            gauges[f'flavorfind_admission_{name}'] = limiter.stats()
+        for name, limiter in app.extensions['rate_limits'].items():
+            gauges[f'flavorfind_rate_limit_{name}'] = limiter.stats()
+        for prefix, stats in gauges.items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"{prefix}_{key} {value}")
+        circuit = app.extensions['mealdb_client'].breaker.state
+        for state in ('closed', 'open', 'half-open'):
+            lines.append(f'flavorfind_mealdb_circuit_state{{state="{state}"}} {int(circuit == state)}')
+        return lines
+    return collect
+
+
+def token_denied():
+    """None if the request carries "Authorization: Bearer <METRICS_TOKEN>", else the response to send.
+
+    Operational endpoints are not exposed at all (404) until METRICS_TOKEN is set.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        return Response('Not Found\n', status=404, mimetype='text/plain')
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return None
+
+
+def metrics_view():
+    denied = token_denied()
+    if denied is not None:
+        return denied
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    registry.set_collector('app', _collect_app_stats(app))
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
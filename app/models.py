@@ -1,7 +1,8 @@
 # app/models.py
 from . import db # Import the db instance from app/__init__.py
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.dialects import mysql
+from .passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users' # Explicitly name the table
@@ -19,13 +20,17 @@ class User(db.Model):
     # cascade="all, delete-orphan" ensures recipes are deleted if user is deleted
     recipes = db.relationship('Recipe', backref='author', lazy=True, cascade="all, delete-orphan")
 
-    # Method to set password securely
+    # Method to set password securely (hashed on the password process pool, may raise PasswordHasherBusy)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     # Method to check password
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    # True if the stored hash uses older parameters than PASSWORD_HASH_METHOD
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         # Helpful representation for debugging
@@ -44,8 +49,116 @@ class Recipe(db.Model):
     instructions = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow) # Automatically updates
+    # Microsecond precision on MySQL too: updated_at feeds the recipe ETags, and two edits in the same second must differ
+    updated_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'), nullable=False,
+                           default=datetime.utcnow, onupdate=datetime.utcnow) # Automatically updates
+
+    __table_args__ = (
+        # Serves "this user's recipes, newest first" (the My Recipes list) straight from the index
+        db.Index('ix_recipes_user_created', 'user_id', 'created_at', 'recipe_id'),
+        # max(updated_at) per user for the list ETag, without touching the rows
+        db.Index('ix_recipes_user_updated', 'user_id', 'updated_at'),
+    )
 
     def __repr__(self):
         # Helpful representation for debugging
-        return f"<Recipe {self.title}>"
\ No newline at end of file
+        return f"<Recipe {self.title}>"
+
+
+class RecipeSearchTerm(db.Model):
+    # Inverted index for full-text search, maintained by search_index.py
+    __tablename__ = 'recipe_search_terms'
+
+    # Primary key order matters: lookups are "this user's postings for these terms"
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False) # Copied from the recipe so searches never scan other users
+    term = db.Column(db.String(64), primary_key=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.recipe_id', ondelete='CASCADE'), primary_key=True, index=True)
+    weight = db.Column(db.Integer, nullable=False) # Field-weighted term frequency
+
+    __table_args__ = (
+        # Lets a query read only the best postings of a term ("impact-ordered")
+        db.Index('ix_recipe_search_terms_impact', 'user_id', 'term', 'weight'),
+    )
+
+    def __repr__(self):
+        return f"<RecipeSearchTerm {self.term}:{self.recipe_id}>"
+
+class Ingredient(db.Model):
+    # Normalized ingredient vocabulary, filled by ingredient_index.py
+    __tablename__ = 'ingredients'
+
+    ingredient_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False) # e.g. "chicken thigh"
+
+    def __repr__(self):
+        return f"<Ingredient {self.name}>"
+
+
+class RecipeIngredient(db.Model):
+    # Which vocabulary ingredients each recipe uses (parsed from Recipe.ingredients)
+    __tablename__ = 'recipe_ingredients'
+
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.recipe_id', ondelete='CASCADE'), primary_key=True)
+    ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredients.ingredient_id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False) # Copied from the recipe so a user's rows can be read in one index range
+
+    __table_args__ = (
+        db.Index('ix_recipe_ingredients_user', 'user_id', 'recipe_id'),
+    )
+
+    def __repr__(self):
+        return f"<RecipeIngredient {self.recipe_id}:{self.ingredient_id}>"
+
+
+# --- Local mirror of TheMealDB (filled by `flask mealdb ingest`) ---
+
+class MealDBMeal(db.Model):
+    __tablename__ = 'mealdb_meals'
+
+    meal_id = db.Column(db.String(20), primary_key=True) # TheMealDB's idMeal
+    name = db.Column(db.String(255), nullable=False, index=True)
+    category = db.Column(db.String(100), nullable=True)
+    area = db.Column(db.String(100), nullable=True)
+    thumb_url = db.Column(db.String(255), nullable=True)
+    data = db.Column(db.Text, nullable=False) # Full meal JSON as returned by lookup.php
+    content_hash = db.Column(db.String(64), nullable=False) # Lets refreshes skip unchanged meals
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    ingredients = db.relationship('MealDBIngredient', backref='meal', lazy=True, cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<MealDBMeal {self.name}>"
+
+
+class MealDBIngredient(db.Model):
+    __tablename__ = 'mealdb_meal_ingredients'
+
+    meal_id = db.Column(db.String(20), db.ForeignKey('mealdb_meals.meal_id', ondelete='CASCADE'), primary_key=True)
+    ingredient = db.Column(db.String(100), primary_key=True, index=True) # Lowercased, used for filter.php lookups
+
+    def __repr__(self):
+        return f"<MealDBIngredient {self.meal_id}:{self.ingredient}>"
+
+
+# --- Sharding directory (see app/sharding.py), on the primary ---
+
+class UserShard(db.Model):
+    # Which shard holds a user's recipes; users without a row are on the primary
+    __tablename__ = 'user_shards'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    shard = db.Column(db.String(50), nullable=False, index=True) # 'primary', 'shard1', ...
+
+    def __repr__(self):
+        return f"<UserShard {self.user_id}:{self.shard}>"
+
+
+class IdSequence(db.Model):
+    # Id counters shared by all shards (recipe ids are handed out in blocks from here)
+    __tablename__ = 'id_sequences'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<IdSequence {self.name}:{self.next_value}>"
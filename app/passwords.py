@@ -0,0 +1,97 @@
+# app/passwords.py
+# Password hashing on a bounded process pool.
+#
+# scrypt is deliberately slow and CPU bound; run inline it blocks the request
+# worker (and, through the GIL, every other thread in it). Here hashes are
+# computed in separate processes so concurrent logins use all cores, and at
+# most `max_pending` can be queued: beyond that PasswordHasherBusy is raised
+# and the route answers 503 instead of letting a login burst pile up.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes in flight; the caller should retry later."""
+    retry_after = 1
+
+
+def _mp_context():
+    # Not fork (the Linux default): the server has threads running (fan-out pool, cache refreshes,
+    # the WSGI server's), and a child forked while one of them holds a lock can deadlock on it
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    """generate/check werkzeug password hashes, on a process pool when workers > 0."""
+
+    def __init__(self, method='scrypt', workers=0, max_pending=None, timeout=10):
+        self.configure(method, workers, max_pending, timeout)
+
+    def configure(self, method='scrypt', workers=0, max_pending=None, timeout=10):
+        if getattr(self, '_pool', None) is not None:
+            self._pool.shutdown(wait=False)
+        self.method = method     # Any werkzeug method, e.g. 'scrypt', 'scrypt:65536:8:1', 'pbkdf2:sha256:600000'
+        self.workers = workers
+        self.max_pending = max_pending or max(1, workers) * 8
+        self.timeout = timeout   # Seconds to wait for one hash before giving up
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None        # Created on first use, so importing the app never spawns processes
+        self._pool_lock = threading.Lock()
+        self._method_prefix = None
+        self.busy_rejections = 0
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        slots = self._slots # configure() may swap it while this job runs
+        if not slots.acquire(blocking=False):
+            self.busy_rejections += 1
+            raise PasswordHasherBusy()
+        try:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the job is really finished (or cancelled), not just until we stop
+        # waiting for it: a timed-out job still occupies the pool, so it must still count as pending
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel() # Only succeeds if it hasn't started yet
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with other parameters than the configured method."""
+        if self._method_prefix is None:
+            # werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'); compare against that.
+            # Costs one hash, once per process.
+            self._method_prefix = self.hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def stats(self):
+        return {"method": self.method, "workers": self.workers, "max_pending": self.max_pending,
+                "busy_rejections": self.busy_rejections}
+
+
+password_hasher = PasswordHasher()
+
+
+def init_app(app):
+    password_hasher.configure(method=app.config['PASSWORD_HASH_METHOD'],
+                              workers=app.config['PASSWORD_HASH_WORKERS'],
+                              max_pending=app.config['PASSWORD_HASH_MAX_PENDING'])
@@ -0,0 +1,153 @@
+# app/profiling.py
+# Opt-in profiling of single requests, plus a slow-query log.
+#
+# Nothing here is registered unless PROFILING_ENABLED is set, so it costs
+# nothing otherwise. When enabled:
+# - a request is profiled (cProfile) if it carries a valid signed
+#   X-Profile header (`flask profile token`) or is picked by
+#   PROFILE_SAMPLE_RATE. The stats are written as .pstats files to
+#   PROFILE_DIR, keeping the newest PROFILE_MAX_FILES
+#   (open them with `python -m pstats FILE` or snakeviz).
+# - every SQL statement slower than SLOW_QUERY_MS is logged to
+#   PROFILE_DIR/slow_queries.log with its parameters and EXPLAIN plan.
+import cProfile
+import logging
+import os
+import random
+import re
+import time
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(__name__ + '.slow_queries')
+_slow_query_ms = float('inf') # Set from SLOW_QUERY_MS by init_app()
+
+PROFILE_HEADER = 'X-Profile'
+_TOKEN_SALT = 'flavorfind-profile'
+
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=_TOKEN_SALT)
+
+
+def make_token(app):
+    """Value for the X-Profile header, valid for PROFILE_TOKEN_MAX_AGE seconds."""
+    return _serializer(app).dumps('profile')
+
+
+def _wants_profile(app):
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        try:
+            _serializer(app).loads(token, max_age=app.config['PROFILE_TOKEN_MAX_AGE'])
+            return True
+        except BadSignature: # Also covers expired tokens
+            logger.warning("profile_token_rejected path=%s", request.path)
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+# --- Request profiling ---
+
+def _before_request():
+    app = current_app._get_current_object()
+    if not _wants_profile(app):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError: # Another profiler is already active in this process (Python 3.12+)
+        return
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+
+
+def _after_request(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    elapsed_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+    directory = current_app.config['PROFILE_DIR']
+    # e.g. 20250101-120000-123456789-recipes.get_my_recipes-84ms.pstats (sorts by time)
+    name = '{}-{:09d}-{}-{:.0f}ms.pstats'.format(
+        time.strftime('%Y%m%d-%H%M%S'), time.time_ns() % 10**9,
+        re.sub(r'[^A-Za-z0-9_.]+', '_', request.endpoint or 'unmatched'), elapsed_ms)
+    profiler.dump_stats(os.path.join(directory, name))
+    _rotate(directory, current_app.config['PROFILE_MAX_FILES'])
+    response.headers['X-Profile-File'] = name
+    return response
+
+
+def _rotate(directory, keep):
+    files = sorted(f for f in os.listdir(directory) if f.endswith('.pstats')) # Names start with the time
+    for old in files[:-keep]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError: # Already removed by another worker
+            pass
+
+
+# --- Slow-query log ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['profile_started'].pop()) * 1000
+    if elapsed_ms < _slow_query_ms:
+        return
+    plan = None
+    if not executemany and statement.lstrip().upper().startswith('SELECT'): # EXPLAIN never runs writes
+        plan = _explain(conn, statement, parameters)
+    slow_query_logger.warning("slow_query ms=%.1f statement=%r params=%r plan=%r",
+                              elapsed_ms, statement, parameters, plan)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('profile_started'):
+        connection.info['profile_started'].pop()
+
+
+def _explain(conn, statement, parameters):
+    # Through a raw DBAPI cursor, so the EXPLAIN doesn't go through (and re-trigger) these events
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [tuple(row) for row in cursor.fetchall()]
+    except Exception as e: # Best effort, never break the request over a plan
+        return f"EXPLAIN failed: {e!r}"
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    if not app.config['PROFILING_ENABLED']:
+        return # Nothing registered: zero cost
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    if not slow_query_logger.handlers:
+        handler = RotatingFileHandler(os.path.join(directory, 'slow_queries.log'),
+                                      maxBytes=10 * 1024 * 1024, backupCount=3)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.WARNING)
+
+    global _slow_query_ms
+    _slow_query_ms = app.config['SLOW_QUERY_MS']
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
@@ -1,8 +1,28 @@
 # app/recipe_routes.py
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app, make_response, g, stream_with_context
 from .models import Recipe, User
 from . import db
+from . import mealdb_mirror
+from . import search_index
+from .ingredient_index import pantry_index
+from .suggest_index import suggest_index
+from . import similarity
+from .similarity import similarity_index
+from .mealdb_client import CircuitOpenError
+from .conditional import make_etag, not_modified_response, add_validators
+from .user_cache import current_user
+from . import admission
+from .admission import limit_concurrency, rate_limit
+from .serializers import recipe_summary, recipe_detail, recipe_export
+from .image_proxy import add_thumbnails
+from .metrics import token_denied
 from functools import wraps # For creating decorators
+from datetime import datetime
+from sqlalchemy import or_, and_, func, select
+from sqlalchemy.orm import load_only
+import base64
+import binascii
+import io
 import requests # Import the requests library
 import os       # Import os to potentially get API key if needed (though TheMealDB v1 is free)
 
@@ -17,13 +37,35 @@ def login_required(f):
         if user_id is None:
             # If user_id is not in session, return Unauthorized
             return jsonify({"error": "Authentication required"}), 401
-        # You could optionally add code here to check if the user_id in session
-        # still corresponds to a valid user in the DB, but for simplicity we'll omit for now.
+        # Check the user still exists. current_user() caches it in g.current_user for the
+        # rest of the request (and per process), so this is usually free.
+        if current_user() is None:
+            session.clear()
+            return jsonify({"error": "Authentication required"}), 401
         return f(*args, **kwargs) # Otherwise, proceed with the original function
     return decorated_function
 
 # --- API Routes ---
 
+RECIPE_FIELDS = ('title', 'description', 'ingredients', 'instructions', 'image_url')
+
+def validate_recipe_data(data):
+    """Check one recipe payload. Returns (fields for Recipe(...), None) or (None, error message)."""
+    if not isinstance(data, dict):
+        return None, "Recipe must be a JSON object"
+    # Validate required fields
+    title = data.get('title')
+    ingredients = data.get('ingredients')
+    instructions = data.get('instructions')
+    if not title or not ingredients or not instructions:
+        return None, "Missing required fields: title, ingredients, instructions"
+    if any(data.get(field) is not None and not isinstance(data.get(field), str) for field in RECIPE_FIELDS):
+        return None, "Recipe fields must be strings"
+    if len(title) > 255 or len(data.get('image_url') or '') > 255: # String(255) columns
+        return None, "title and image_url must be at most 255 characters"
+    # Optional fields (description, image_url) may be missing
+    return {field: data.get(field) for field in RECIPE_FIELDS}, None
+
 # Route to CREATE a new personal recipe
 @recipe_bp.route('', methods=['POST']) # POST to /api/recipes
 @login_required # Protect this route
@@ -34,26 +76,12 @@ def create_recipe():
     if not data:
         return jsonify({"error": "No input data provided"}), 400
 
-    # Validate required fields
-    title = data.get('title')
-    ingredients = data.get('ingredients')
-    instructions = data.get('instructions')
-    if not title or not ingredients or not instructions:
-        return jsonify({"error": "Missing required fields: title, ingredients, instructions"}), 400
-
-    # Optional fields
-    description = data.get('description')
-    image_url = data.get('image_url')
+    fields, error = validate_recipe_data(data)
+    if error:
+        return jsonify({"error": error}), 400
 
     # Create new recipe instance
-    new_recipe = Recipe(
-        user_id=user_id,
-        title=title,
-        description=description,
-        ingredients=ingredients,
-        instructions=instructions,
-        image_url=image_url
-    )
+    new_recipe = Recipe(user_id=user_id, **fields)
 
     # Add to database
     try:
@@ -62,39 +90,170 @@ def create_recipe():
         # Return the newly created recipe data (excluding user_id maybe)
         return jsonify({
             "message": "Recipe created successfully!",
-            "recipe": {
-                "recipe_id": new_recipe.recipe_id,
-                "title": new_recipe.title,
-                "description": new_recipe.description,
-                "image_url": new_recipe.image_url,
-                "created_at": new_recipe.created_at.isoformat(), # Use ISO format for consistency
-                "updated_at": new_recipe.updated_at.isoformat()
-            }
+            "recipe": recipe_summary.one(new_recipe)
         }), 201 # 201 Created
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to create recipe due to server issue."}), 500
 
 
-# Route to READ all personal recipes for the logged-in user
+# --- Keyset pagination for the recipe list ---
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the columns the list shows; ingredients/instructions can be large and aren't needed
+LIST_COLUMNS = (Recipe.recipe_id, Recipe.user_id, Recipe.title, Recipe.description, Recipe.image_url,
+                Recipe.created_at, Recipe.updated_at)
+
+def encode_cursor(recipe):
+    # Opaque to clients: "<created_at>|<recipe_id>" of the last row on the page
+    raw = f"{recipe.created_at.isoformat()}|{recipe.recipe_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (created_at, recipe_id) or None. Raises ValueError for malformed cursors."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, recipe_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(recipe_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+def recipe_list_page(user_id, limit=DEFAULT_PAGE_SIZE, after=None):
+    """One page of a user's recipes, newest first. Returns (recipes, next_cursor or None).
+
+    Uses the (user_id, created_at, recipe_id) index, so every page costs the
+    same no matter how deep into the list it is.
+    """
+    query = (Recipe.query.options(load_only(*LIST_COLUMNS))
+             .filter(Recipe.user_id == user_id)
+             .order_by(Recipe.created_at.desc(), Recipe.recipe_id.desc()))
+    if after:
+        created_at, recipe_id = after
+        query = query.filter(or_(Recipe.created_at < created_at,
+                                 and_(Recipe.created_at == created_at, Recipe.recipe_id < recipe_id)))
+    recipes = query.limit(limit + 1).all() # One extra row tells us if there is a next page
+    if len(recipes) > limit:
+        return recipes[:limit], encode_cursor(recipes[limit - 1])
+    return recipes, None
+
+def recipe_list_payload(user_id, limit=DEFAULT_PAGE_SIZE, after=None):
+    """One page as GET /api/recipes returns it: (list of recipe dicts, next cursor or None)."""
+    user_recipes, next_cursor = recipe_list_page(user_id, limit=limit, after=after)
+    # Same-origin thumbnails for the cards
+    return add_thumbnails(recipe_summary.many(user_recipes)), next_cursor
+
+def recipe_list_version(user_id):
+    """(row count, newest updated_at) of the user's recipes: changes whenever any page of the list would.
+
+    Both come from the (user_id, updated_at) index without loading recipe rows.
+    """
+    return (db.session.query(func.count(Recipe.recipe_id), func.max(Recipe.updated_at))
+            .filter(Recipe.user_id == user_id).one())
+
+
+# Route to READ the personal recipes of the logged-in user, one page at a time
+# e.g. /api/recipes?limit=50, then /api/recipes?limit=50&after=<X-Next-Cursor header>
 @recipe_bp.route('', methods=['GET']) # GET /api/recipes
 @login_required
 def get_my_recipes():
     user_id = session.get('user_id')
-    # Query the database for recipes belonging to this user
-    user_recipes = Recipe.query.filter_by(user_id=user_id).order_by(Recipe.created_at.desc()).all()
 
-    # Format the recipes for JSON response
-    recipes_list = [{
-        "recipe_id": recipe.recipe_id,
-        "title": recipe.title,
-        "description": recipe.description,
-        "image_url": recipe.image_url,
-        "created_at": recipe.created_at.isoformat(),
-        "updated_at": recipe.updated_at.isoformat()
-    } for recipe in user_recipes]
+    # Conditional GET: validators from the list's version, before any recipe row is loaded
+    count, newest = recipe_list_version(user_id)
+    etag = make_etag('recipes', user_id, count, newest, request.query_string)
+    # A deleted recipe doesn't move max(updated_at), so only trust the ETag here
+    cached = not_modified_response(etag, newest, honor_if_modified_since=False)
+    if cached:
+        return cached
+
+    # ?q=... switches to ranked full-text search (see search_index.py)
+    search_text = request.args.get('q', '').strip()
+    if search_text:
+        response = make_response(search_my_recipes(user_id, search_text))
+    else:
+        response = make_response(list_my_recipes(user_id))
+    if response.status_code == 200:
+        add_validators(response, etag, newest)
+    return response
+
+
+def list_my_recipes(user_id):
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    try:
+        after = decode_cursor(request.args.get('after'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    recipes_list, next_cursor = recipe_list_payload(user_id, limit=limit, after=after)
+
+    # The next page's cursor goes in headers so the body stays a plain list
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.path}?limit={limit}&after={next_cursor}>; rel="next"'
+    return jsonify(recipes_list), 200, headers
+
+
+def search_my_recipes(user_id, search_text):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    if page < 1 or not 1 <= per_page <= 100:
+        return jsonify({"error": "page must be >= 1 and per_page between 1 and 100"}), 400
+
+    recipe_ids, total = search_index.search_recipes(user_id, search_text, page=page, per_page=per_page)
+    recipes_by_id = {recipe.recipe_id: recipe for recipe in
+                     Recipe.query.options(load_only(*LIST_COLUMNS))
+                     .filter(Recipe.user_id == user_id, Recipe.recipe_id.in_(recipe_ids))} if recipe_ids else {}
 
-    return jsonify(recipes_list), 200
+    # Keep the ranking order from the index
+    recipes_list = add_thumbnails(recipe_summary.many(
+        recipes_by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in recipes_by_id))
+
+    # Paging info goes in headers so the body stays the same list as the unfiltered endpoint
+    return jsonify(recipes_list), 200, {"X-Total-Count": str(total), "X-Page": str(page), "X-Per-Page": str(per_page)}
+
+
+# Route to rank the user's recipes by how much of them they can cook from their pantry
+# e.g. /api/recipes/pantry-match?ingredients=chicken,garlic,lemon&limit=10&min_coverage=0.5
+@recipe_bp.route('/pantry-match', methods=['GET'])
+@login_required
+def pantry_match():
+    user_id = session.get('user_id')
+    pantry = [item for value in request.args.getlist('ingredients') for item in value.split(',') if item.strip()]
+    limit = request.args.get('limit', 20, type=int)
+    min_coverage = request.args.get('min_coverage', 0.0, type=float)
+    if not pantry:
+        return jsonify({"error": "Missing ingredients parameter"}), 400
+    if not 1 <= limit <= 100 or not 0 <= min_coverage <= 1:
+        return jsonify({"error": "limit must be 1-100 and min_coverage between 0 and 1"}), 400
+
+    matches = pantry_index.match(user_id, pantry, limit=limit, min_coverage=min_coverage)
+    titles = dict(Recipe.query.filter(Recipe.user_id == user_id, Recipe.recipe_id.in_([m["recipe_id"] for m in matches]))
+                  .with_entities(Recipe.recipe_id, Recipe.title)) if matches else {}
+    return jsonify([dict(match, title=titles[match["recipe_id"]]) for match in matches if match["recipe_id"] in titles]), 200
+
+
+# Route to autocomplete a recipe title while the user types (see suggest_index.py)
+# e.g. /api/recipes/suggest?prefix=chiken%20cur&limit=8
+# Open to anonymous visitors (TheMealDB names only); logged-in users get their own titles first
+@recipe_bp.route('/suggest', methods=['GET'])
+def suggest_titles():
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', 8, type=int)
+    if not prefix.strip():
+        return jsonify({"error": "Missing prefix parameter"}), 400
+    if len(prefix) > 100 or not 1 <= limit <= 20:
+        return jsonify({"error": "prefix must be at most 100 characters and limit 1-20"}), 400
+
+    suggestions = suggest_index.suggest(prefix, user_id=session.get('user_id'), limit=limit)
+    response = jsonify(suggestions)
+    response.headers['Cache-Control'] = 'private, max-age=30' # Per user; browsers may reuse it while typing
+    return response, 200
 
 
 # Route to READ a specific personal recipe
@@ -106,23 +265,45 @@ def get_recipe_detail(recipe_id):
     recipe = Recipe.query.filter_by(recipe_id=recipe_id, user_id=user_id).first()
 
     if recipe:
+        # Conditional GET: unchanged since the client's copy -> 304 without building the JSON
+        # The recipe belongs to the logged-in user, so its author is g.current_user (no extra query)
+        author_username = g.current_user.username
+        etag = make_etag('recipe', recipe.recipe_id, recipe.updated_at, author_username)
+        cached = not_modified_response(etag, recipe.updated_at)
+        if cached:
+            return cached
+
         # Return full details
-        return jsonify({
-            "recipe_id": recipe.recipe_id,
-            "title": recipe.title,
-            "description": recipe.description,
-            "ingredients": recipe.ingredients,
-            "instructions": recipe.instructions,
-            "image_url": recipe.image_url,
-            "created_at": recipe.created_at.isoformat(),
-            "updated_at": recipe.updated_at.isoformat(),
-            "author_username": recipe.author.username # Access related user via backref
-        }), 200
+        response = jsonify(recipe_detail.one(recipe, author_username=author_username))
+        return add_validators(response, etag, recipe.updated_at), 200
     else:
         # Recipe not found OR doesn't belong to this user
         return jsonify({"error": "Recipe not found or access denied"}), 404 # 404 Not Found
 
 
+# Route to list recipes whose ingredients are most like this one's: the user's own, then TheMealDB meals
+# e.g. /api/recipes/123/similar?limit=10 (see similarity.py)
+@recipe_bp.route('/<int:recipe_id>/similar', methods=['GET'])
+@login_required
+def similar_recipes(recipe_id):
+    user_id = session.get('user_id')
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= 50:
+        return jsonify({"error": "limit must be 1-50"}), 400
+    if not similarity.available():
+        return _similarity_unavailable()
+
+    columns = similarity_index.recipe_terms(user_id, recipe_id)
+    if columns is None:
+        return jsonify({"error": "Recipe not found or access denied"}), 404
+    [similar] = similarity_index.similar([columns], user_id=user_id, k=limit, exclude=[('recipe', recipe_id)])
+    return jsonify(similar), 200
+
+
+def _similarity_unavailable():
+    return jsonify({"error": "Similar recipes are not available on this server (needs numpy and scipy)"}), 503
+
+
 # Route to UPDATE a specific personal recipe
 @recipe_bp.route('/<int:recipe_id>', methods=['PUT']) # PUT /api/recipes/123
 @login_required
@@ -155,14 +336,7 @@ def update_recipe(recipe_id):
         # Return updated recipe data
         return jsonify({
              "message": "Recipe updated successfully!",
-             "recipe": {
-                "recipe_id": recipe.recipe_id,
-                "title": recipe.title,
-                "description": recipe.description,
-                "image_url": recipe.image_url,
-                "created_at": recipe.created_at.isoformat(),
-                "updated_at": recipe.updated_at.isoformat()
-             }
+             "recipe": recipe_summary.one(recipe)
         }), 200
     except Exception as e:
         db.session.rollback()
@@ -188,64 +362,258 @@ def delete_recipe(recipe_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to delete recipe due to server issue."}), 500
-    
-    
-    # --- External Recipe Search Route ---
+
+
+# --- Bulk export / import (NDJSON: one JSON recipe per line) ---
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500   # Rows per INSERT batch and per transaction
+IMPORT_MAX_ROWS = 20000
+IMPORT_MAX_ERRORS = 100   # Per-row errors reported back (the counts are always complete)
+
+EXPORT_COLUMNS = tuple(getattr(Recipe, field) for field in recipe_export.fields)
+
+# Route to EXPORT all of the user's recipes as NDJSON, streamed
+@recipe_bp.route('/export', methods=['GET']) # GET /api/recipes/export
+@login_required
+def export_recipes():
+    user_id = session.get('user_id')
+    # Plain rows read in yield_per batches (a server-side cursor where the driver supports one),
+    # so memory stays flat however many recipes the user has
+    rows = db.session.execute(
+        select(*EXPORT_COLUMNS).where(Recipe.user_id == user_id).order_by(Recipe.recipe_id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+    def generate():
+        dumps = current_app.json.dumps
+        for row in rows:
+            yield dumps(recipe_export.one(row)) + '\n'
+
+    response = current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+    return response
+
+
+def _import_rows():
+    """Yield (row number, parsed JSON or None, error or None) from a JSON array or NDJSON body."""
+    if request.mimetype == 'application/json':
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON array of recipes")
+        for number, item in enumerate(data, start=1):
+            yield number, item, None
+        return
+    # NDJSON is read line by line from the request stream, never held in memory as a whole
+    number = 0
+    for line in io.BufferedReader(request.stream, 64 * 1024): # The raw stream reads lines a byte at a time
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, current_app.json.loads(line), None
+        except ValueError:
+            yield number, None, "Invalid JSON"
+
+
+# Route to IMPORT many recipes at once (application/x-ndjson, or application/json with an array)
+@recipe_bp.route('/import', methods=['POST']) # POST /api/recipes/import
+@login_required
+def import_recipes():
+    user_id = session.get('user_id')
+    imported = 0
+    failed = 0
+    errors = []
+
+    def report(number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": number, "error": message})
+
+    def flush(batch):
+        # One transaction per batch: multi-row INSERTs, and the search/ingredient indexes are
+        # updated for the whole batch in the same flush
+        nonlocal imported
+        if not batch:
+            return
+        try:
+            db.session.add_all([Recipe(user_id=user_id, **fields) for _, fields in batch])
+            db.session.commit()
+            imported += len(batch)
+        except Exception:
+            db.session.rollback()
+            for number, _ in batch:
+                report(number, "Failed to save recipe due to server issue.")
+
+    batch = []
+    try:
+        for number, data, error in _import_rows():
+            if number > IMPORT_MAX_ROWS:
+                report(number, f"Too many rows (at most {IMPORT_MAX_ROWS} per import)")
+                break
+            if error is None:
+                fields, error = validate_recipe_data(data)
+            if error:
+                report(number, error)
+                continue
+            batch.append((number, fields))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush(batch)
+                batch = []
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    flush(batch)
+
+    status = 201 if imported else 400
+    return jsonify({"imported": imported, "failed": failed, "errors": errors}), status
+
+
+# --- External Recipe Search Route ---
+
+def _normalize_key(value):
+    # 'Chicken ', 'chicken' and 'CHICKEN' should all share one cache entry
+    return ' '.join(value.split()).lower()
+
+def fetch_mealdb(endpoint, param, value, deadline=None):
+    """Return TheMealDB's JSON for endpoint?param=value, served from the mirror or cache when possible.
+
+    `deadline` (time.monotonic() value) defaults to the request's g.deadline, if any.
+    """
+    value = _normalize_key(value)
+    if current_app.config['MEALDB_LOCAL_FIRST']:
+        # Searches are answered entirely by the mirror, lookups only go upstream for ids it doesn't have
+        data = mealdb_mirror.query_local(endpoint, value)
+        if data is not None:
+            return data
+
+    cache = current_app.extensions['mealdb_cache']
+    client = current_app.extensions['mealdb_client']
+    if deadline is None:
+        deadline = g.get('deadline')
+
+    # The loader may run on a background refresh thread, so it must not touch the app context
+    def load():
+        return client.get_json(endpoint, params={param: value}, deadline=deadline) # Retries, timeouts and logging live in the client
+
+    return cache.get_or_load((endpoint, value), load)
+
+
+def _upstream_unavailable(e):
+    # Circuit breaker is open: fail fast and tell the client when to come back
+    return jsonify({"error": str(e)}), 503, {"Retry-After": str(e.retry_after)}
+
+def _simplify_meals(meals):
+    # If searching by ingredient, the result only contains name, image, id.
+    # If searching by name, it contains more details, but we might want to standardize
+    # For consistency, let's return a list of basic meal info
+    # Frontend can call a separate lookup endpoint if more detail is needed per recipe
+    simplified_meals = []
+    for meal in meals or []: # TheMealDB returns {'meals': null} if nothing found
+        # Check if essential keys exist before accessing
+        meal_id = meal.get('idMeal')
+        meal_name = meal.get('strMeal')
+        meal_thumb = meal.get('strMealThumb')
+        if meal_id and meal_name and meal_thumb:
+             simplified_meals.append({
+                "id": meal_id,
+                "name": meal_name,
+                "image_url": meal_thumb
+            })
+    # Names seen in search results become title suggestions (sync and async views both come through here)
+    suggest_index.add_meals(simplified_meals)
+    return add_thumbnails(simplified_meals) # thumbnail_url: resized and cached by /img
+
+
+def _parse_ingredients(values):
+    # Accept ?ingredient=chicken,garlic as well as ?ingredient=chicken&ingredient=garlic
+    ingredients = []
+    for value in values:
+        for part in value.split(','):
+            part = _normalize_key(part)
+            if part and part not in ingredients:
+                ingredients.append(part)
+    return ingredients
+
+
+def _search_by_ingredients(ingredients, match_mode):
+    """Look up every ingredient in parallel, then merge the results by match count.
+
+    match_mode 'all' keeps only meals containing every ingredient, 'any' keeps
+    every meal, best matches first.
+    """
+    app = current_app._get_current_object() # Worker threads need their own app context (and no g)
+    deadline = g.get('deadline')
+
+    def lookup(ingredient):
+        with app.app_context():
+            return fetch_mealdb('filter.php', 'i', ingredient, deadline=deadline).get('meals')
+
+    # filter.php only takes one ingredient, so fan out on the shared bounded pool.
+    # Total time is roughly the slowest lookup instead of the sum of all of them.
+    results = app.extensions['mealdb_pool'].map(lookup, ingredients) # Each lookup honours the deadline
+    return merge_ingredient_results(results, len(ingredients), match_mode)
+
+
+def merge_ingredient_results(results, ingredient_count, match_mode):
+    """Merge the filter.php 'meals' lists of each ingredient, ranked by match count."""
+    merged = {} # meal id -> meal, in first-seen order
+    for meals in results:
+        for meal in _simplify_meals(meals):
+            entry = merged.setdefault(meal["id"], dict(meal, matched_ingredients=0))
+            entry["matched_ingredients"] += 1
+
+    ranked = list(merged.values())
+    if match_mode == 'all':
+        ranked = [meal for meal in ranked if meal["matched_ingredients"] == ingredient_count]
+    ranked.sort(key=lambda meal: meal["matched_ingredients"], reverse=True) # Stable, so ties keep upstream order
+    return ranked
+
+
+def parse_search_args():
+    """(query, ingredients, match mode, error response or None) from the search's query string."""
+    # e.g., /api/recipes/search?query=chicken or /api/recipes/search?ingredient=garlic
+    # Several ingredients: ?ingredient=chicken,garlic,lemon (&match=all, the default, or &match=any)
+    search_query = request.args.get('query')
+    ingredients = _parse_ingredients(request.args.getlist('ingredient'))
+    match_mode = request.args.get('match', 'all')
+
+    # --- Validate input ---
+    error = None
+    if not search_query and not ingredients:
+        error = jsonify({"error": "Missing search query or ingredient parameter"}), 400
+    elif len(ingredients) > current_app.config['MEALDB_MAX_INGREDIENTS']:
+        error = jsonify({"error": f"Too many ingredients (max {current_app.config['MEALDB_MAX_INGREDIENTS']})"}), 400
+    elif match_mode not in ('all', 'any'):
+        error = jsonify({"error": "match must be 'all' or 'any'"}), 400
+    return search_query, ingredients, match_mode, error
+
 
 # Route to search recipes from TheMealDB API
 # Note: This does NOT require login, so we don't use @login_required
 # We'll put it under the '/api/recipes' prefix for grouping, maybe '/api/recipes/search'
+# (Served by app/asgi.py's async version instead in ASGI mode)
 @recipe_bp.route('/search', methods=['GET'])
+@rate_limit('search')
+@limit_concurrency('mealdb', deadline_config='MEALDB_REQUEST_DEADLINE')
 def search_external_recipes():
-    # Get search query parameters from the request URL
-    # e.g., /api/recipes/search?query=chicken or /api/recipes/search?ingredient=garlic
-    search_query = request.args.get('query')
-    search_ingredient = request.args.get('ingredient')
+    search_query, ingredients, match_mode, error = parse_search_args()
+    if error:
+        return error
 
-    # --- Validate input ---
-    if not search_query and not search_ingredient:
-        return jsonify({"error": "Missing search query or ingredient parameter"}), 400
-
-    # --- Construct TheMealDB API URL ---
+    # --- Call TheMealDB API (through the shared cache) ---
     # Prioritize search by name if 'query' is provided
-    if search_query:
-        api_url = f"https://www.themealdb.com/api/json/v1/1/search.php?s={search_query}"
-    else: # Otherwise search by ingredient
-        api_url = f"https://www.themealdb.com/api/json/v1/1/filter.php?i={search_ingredient}"
-
-    # --- Call TheMealDB API ---
     try:
-        print(f"Calling TheMealDB API: {api_url}") # Log the API call
-        response = requests.get(api_url, timeout=10) # Add a timeout
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-        data = response.json() # Parse the JSON response
+        if search_query:
+            data = fetch_mealdb('search.php', 's', search_query)
+        elif len(ingredients) == 1: # Otherwise search by ingredient
+            data = fetch_mealdb('filter.php', 'i', ingredients[0])
+        else:
+            return jsonify(_search_by_ingredients(ingredients, match_mode)), 200
 
         # --- Process and Return Results ---
-        # TheMealDB returns {'meals': null} if nothing found, or {'meals': [...]}
-        meals = data.get('meals')
-        if meals is None:
-            return jsonify([]), 200 # Return empty list if no results found
-        else:
-            # If searching by ingredient, the result only contains name, image, id.
-            # If searching by name, it contains more details, but we might want to standardize
-            # For consistency, let's return a list of basic meal info
-            # Frontend can call a separate lookup endpoint if more detail is needed per recipe
-            simplified_meals = []
-            for meal in meals:
-                # Check if essential keys exist before accessing
-                meal_id = meal.get('idMeal')
-                meal_name = meal.get('strMeal')
-                meal_thumb = meal.get('strMealThumb')
-                if meal_id and meal_name and meal_thumb:
-                     simplified_meals.append({
-                        "id": meal_id,
-                        "name": meal_name,
-                        "image_url": meal_thumb
-                    })
-
-            return jsonify(simplified_meals), 200
+        return jsonify(_simplify_meals(data.get('meals'))), 200
 
+    except CircuitOpenError as e:
+        return _upstream_unavailable(e)
     except requests.exceptions.RequestException as e:
         # Handle connection errors, timeouts, etc.
         return jsonify({"error": f"Failed to fetch recipes from external source: {e}"}), 503 # 503 Service Unavailable
@@ -253,27 +621,70 @@ def search_external_recipes():
         # Handle other potential errors (e.g., JSON parsing)
         return jsonify({"error": "Failed to process external recipe data."}), 500
 
+def external_detail_response(data):
+    meal_details = data.get('meals')
+    if meal_details and len(meal_details) > 0:
+         # The API returns a list with one item for lookup by ID
+         full_meal = meal_details[0]
+         similarity_index.add_meal(full_meal) # Viewed meals can show up as similar recipes
+         # You might want to parse/clean the ingredients/instructions here if needed
+         # For simplicity, we return the raw structure for now
+         return jsonify(full_meal), 200
+    else:
+         return jsonify({"error": "External recipe not found"}), 404
+
 # Optional: Add a route to get full details for a specific external recipe ID
+# (Served by app/asgi.py's async version instead in ASGI mode)
 @recipe_bp.route('/external/<string:meal_id>', methods=['GET'])
+@limit_concurrency('mealdb', deadline_config='MEALDB_REQUEST_DEADLINE')
 def get_external_recipe_detail(meal_id):
-    api_url = f"https://www.themealdb.com/api/json/v1/1/lookup.php?i={meal_id}"
     try:
-        print(f"Calling TheMealDB API for details: {api_url}")
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        meal_details = data.get('meals')
-        if meal_details and len(meal_details) > 0:
-             # The API returns a list with one item for lookup by ID
-             full_meal = meal_details[0]
-             # You might want to parse/clean the ingredients/instructions here if needed
-             # For simplicity, we return the raw structure for now
-             return jsonify(full_meal), 200
-        else:
-             return jsonify({"error": "External recipe not found"}), 404
+        return external_detail_response(fetch_mealdb('lookup.php', 'i', meal_id))
 
+    except CircuitOpenError as e:
+        return _upstream_unavailable(e)
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Failed to fetch recipe details from external source: {e}"}), 503
     except Exception as e:
-        return jsonify({"error": "Failed to process external recipe detail data."}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to process external recipe detail data."}), 500
+
+# Route to list what's most like a TheMealDB meal: other meals, and the user's own recipes when logged in
+# e.g. /api/recipes/external/52772/similar?limit=10 (see similarity.py)
+@recipe_bp.route('/external/<string:meal_id>/similar', methods=['GET'])
+@limit_concurrency('mealdb', deadline_config='MEALDB_REQUEST_DEADLINE')
+def similar_to_external_recipe(meal_id):
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= 50:
+        return jsonify({"error": "limit must be 1-50"}), 400
+    if not similarity.available():
+        return _similarity_unavailable()
+
+    def fetch(): # Only for meals neither in the mirror nor seen before
+        meals = fetch_mealdb('lookup.php', 'i', meal_id).get('meals')
+        return meals[0] if meals else None
+
+    try:
+        columns = similarity_index.meal_terms(meal_id, fetch)
+    except CircuitOpenError as e:
+        return _upstream_unavailable(e)
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": f"Failed to fetch recipe details from external source: {e}"}), 503
+    if columns is None:
+        return jsonify({"error": "External recipe not found"}), 404
+    [similar] = similarity_index.similar([columns], user_id=session.get('user_id'), k=limit,
+                                         exclude=[('mealdb', meal_id)])
+    return jsonify(similar), 200
+
+# Cache, upstream and admission counters, used to tune the MEALDB_* and RATE_LIMIT_* settings.
+# Protected like /metrics: 404 until METRICS_TOKEN is set, then the bearer token is required.
+@recipe_bp.route('/cache-stats', methods=['GET'])
+def mealdb_cache_stats():
+    denied = token_denied()
+    if denied is not None:
+        return denied
+    stats = current_app.extensions['mealdb_cache'].stats()
+    stats["upstream"] = current_app.extensions['mealdb_client'].stats()
+    if 'mealdb_async_client' in current_app.extensions: # ASGI mode
+        stats["upstream_async"] = current_app.extensions['mealdb_async_client'].stats()
+    stats["admission"] = admission.stats(current_app)
+    return jsonify(stats), 200
@@ -1,7 +1,12 @@
 # app/routes.py
-from flask import Blueprint, render_template, session, redirect, url_for, flash
+from flask import Blueprint, render_template, session, redirect, url_for, flash, current_app
+from jinja2.utils import htmlsafe_json_dumps
+from . import db
 from .models import Recipe
 from .forms import LoginForm, RegistrationForm, RecipeForm
+from .recipe_routes import recipe_list_payload, recipe_list_version
+from .serializers import recipe_detail
+from .user_cache import current_user
 
 # Create a Blueprint for main application routes (serving HTML pages)
 main_bp = Blueprint('main', __name__)
@@ -31,6 +36,18 @@ def register():
     # --- End check ---
     return render_template('register.html', page_title="Register", form=form)
 
+def _initial_data(key, build):
+    """JSON for a <script type="application/json"> block, safe to put in HTML.
+
+    Cached per process in app.extensions['page_cache']: `key` holds the version
+    of the data (e.g. updated_at), so a change makes a new key instead of needing
+    invalidation, and the old entry just ages out. None if build() returns None.
+    """
+    def load():
+        data = build()
+        return None if data is None else htmlsafe_json_dumps(data, dumps=current_app.json.dumps)
+    return current_app.extensions['page_cache'].get_or_load(key, load)
+
 # Add placeholders for other pages - we'll need login protection later
 @main_bp.route('/my-recipes')
 def my_recipes():
@@ -39,9 +56,15 @@ def my_recipes():
         # If not logged in, redirect to the login page
         return redirect(url_for('main.login'))
 
-    # If logged in, render the my_recipes template
-    # The actual data fetching will happen via JavaScript calling the API
-    return render_template('my_recipes.html', page_title="My Recipes")
+    # The first page is embedded in the HTML (same query and JSON as GET /api/recipes),
+    # so the page shows it without a second request. JS only fetches for search and "Load more".
+    user_id = session['user_id']
+    count, newest = recipe_list_version(user_id) # Cheap, from the index: skips the page query on a cache hit
+    def build():
+        recipes, next_cursor = recipe_list_payload(user_id)
+        return {"recipes": recipes, "next_cursor": next_cursor}
+    initial_recipes = _initial_data(('recipes', user_id, count, newest), build)
+    return render_template('my_recipes.html', page_title="My Recipes", initial_recipes=initial_recipes)
 
 @main_bp.route('/recipe/new')
 def new_recipe_form():
@@ -59,8 +82,26 @@ def view_recipe(recipe_id):
     if 'user_id' not in session:
         return redirect(url_for('main.login'))
 
-    # Pass the recipe_id to the template. JS will fetch the data.
-    return render_template('recipe_detail.html', recipe_id=recipe_id)
+    # Embed the recipe (same JSON as GET /api/recipes/<id>) so JS doesn't have to fetch it.
+    # Only the title and updated_at are read up front; the full row is loaded on a cache miss.
+    user_id = session['user_id']
+    user = current_user()
+    version = (db.session.query(Recipe.title, Recipe.updated_at)
+               .filter_by(recipe_id=recipe_id, user_id=user_id).first())
+    if version is None or user is None:
+        # Not found or not theirs: the page shows the API's error, as before
+        return render_template('recipe_detail.html', recipe_id=recipe_id, recipe_title=None, initial_recipe=None)
+
+    def build():
+        recipe = Recipe.query.filter_by(recipe_id=recipe_id, user_id=user_id).first()
+        if recipe is None: # Deleted since the version lookup
+            return None
+        return recipe_detail.one(recipe, author_username=user.username)
+    initial_recipe = _initial_data(('recipe', recipe_id, version.updated_at, user.username), build)
+    if initial_recipe is None:
+        return render_template('recipe_detail.html', recipe_id=recipe_id, recipe_title=None, initial_recipe=None)
+    return render_template('recipe_detail.html', recipe_id=recipe_id, recipe_title=version.title,
+                           initial_recipe=initial_recipe)
 
 @main_bp.route('/recipe/<int:recipe_id>/edit')
 def edit_recipe_form(recipe_id):
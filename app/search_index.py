@@ -0,0 +1,187 @@
+# app/search_index.py
+# Inverted index for full-text search over personal recipes.
+# Rows in recipe_search_terms are kept in sync from a SQLAlchemy after_flush
+# hook, so every create/update/delete (API, forms, CLI) updates the index in
+# the same transaction as the recipe itself.
+import functools
+import math
+import re
+
+from sqlalchemy import event, delete, func, insert, inspect, select
+from sqlalchemy.orm import Session, aliased
+
+from . import db
+from .models import Recipe, RecipeSearchTerm
+from .sharding import recipe_connections
+
+# How much a match in each field counts towards a recipe's score
+FIELD_WEIGHTS = {'title': 4, 'ingredients': 2, 'description': 1, 'instructions': 1}
+MAX_QUERY_TERMS = 8
+MAX_CANDIDATES = 1000 # Postings read per query term (at least)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into', 'is', 'it',
+    'of', 'on', 'or', 'the', 'then', 'to', 'until', 'with', 'your',
+}
+
+
+@functools.lru_cache(maxsize=65536) # Called for every word of every recipe saved; vocabularies are small
+def stem(word):
+    # Very light plural folding: 'tomatoes' ~ 'tomato', 'berries' ~ 'berry', 'eggs' ~ 'egg'
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith('oes'):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Split text into normalized search terms (lowercase, no stop words, light stemming)."""
+    if not text:
+        return []
+    return [stem(word)[:64] for word in _TOKEN_RE.findall(text.lower())
+            if len(word) > 1 and word not in STOP_WORDS]
+
+
+def recipe_terms(recipe):
+    """Return {term: weight} for one recipe."""
+    weights = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(recipe, field)):
+            weights[term] = weights.get(term, 0) + field_weight
+    return weights
+
+
+# --- Keeping the index in sync ---
+
+def _needs_reindex(recipe):
+    state = inspect(recipe)
+    return any(state.attrs[field].history.has_changes() for field in FIELD_WEIGHTS)
+
+
+def _sync_after_flush(session, flush_context):
+    changed = [obj for obj in session.new if isinstance(obj, Recipe)]
+    changed += [obj for obj in session.dirty if isinstance(obj, Recipe) and _needs_reindex(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Recipe)]
+    if not changed and not deleted:
+        return
+
+    to_index = set(changed) # Deleted recipes only lose their rows
+    # Use the flush's connection directly, session.execute() is not allowed mid-flush
+    # (one connection per shard when recipes are sharded, see app/sharding.py)
+    for connection, recipes in recipe_connections(session, changed + deleted):
+        stale_ids = [recipe.recipe_id for recipe in recipes]
+        connection.execute(delete(RecipeSearchTerm.__table__).where(RecipeSearchTerm.recipe_id.in_(stale_ids)))
+
+        rows = [{"user_id": recipe.user_id, "term": term, "recipe_id": recipe.recipe_id, "weight": weight}
+                for recipe in recipes if recipe in to_index
+                for term, weight in recipe_terms(recipe).items()]
+        if rows:
+            connection.execute(insert(RecipeSearchTerm.__table__), rows) # One executemany per connection
+
+
+def init_app(app):
+    if not event.contains(Session, 'after_flush', _sync_after_flush):
+        event.listen(Session, 'after_flush', _sync_after_flush)
+
+
+def reindex_all(batch_size=500):
+    """Rebuild the whole index from the recipes table. Returns the number of recipes indexed.
+
+    With sharding, runs on one shard: call it inside sharding.using_shard().
+    """
+    db.session.execute(delete(RecipeSearchTerm.__table__))
+    count = 0
+    for recipe in Recipe.query.order_by(Recipe.recipe_id).yield_per(batch_size):
+        rows = [{"user_id": recipe.user_id, "term": term, "recipe_id": recipe.recipe_id, "weight": weight}
+                for term, weight in recipe_terms(recipe).items()]
+        if rows:
+            db.session.execute(insert(RecipeSearchTerm.__table__), rows)
+        count += 1
+    db.session.commit()
+    return count
+
+
+# --- Querying ---
+
+def search_recipes(user_id, text, page=1, per_page=20):
+    """Ranked search over one user's recipes.
+
+    Returns (recipe_ids for the requested page, best first; total number of matches).
+    Ranking: recipes matching more of the query terms come first, then by
+    sum(field weight * idf).
+
+    Only the MAX_CANDIDATES highest-weight postings of each term are read
+    (through the (user_id, term, weight) index; more for pages past that),
+    so ranking costs the same however many recipes there are. When a list
+    is cut off, recipes with every term that none of the lists reached are
+    looked up separately (_full_matches), so they still rank before partial
+    matches, and the total is counted in SQL (the one part that grows with
+    the number of matches).
+    """
+    terms = list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], 0
+    start = (page - 1) * per_page
+    depth = max(MAX_CANDIDATES, start + per_page)
+
+    # Best postings of each term, read through the (user_id, term, weight) index
+    postings = {}
+    for term in terms:
+        postings[term] = (RecipeSearchTerm.query
+                          .filter(RecipeSearchTerm.user_id == user_id, RecipeSearchTerm.term == term)
+                          .order_by(RecipeSearchTerm.weight.desc())
+                          .with_entities(RecipeSearchTerm.recipe_id, RecipeSearchTerm.weight)
+                          .limit(depth).all())
+
+    # Document frequency per term -> idf, so rare terms count more than ones in every recipe.
+    # df is capped at the depth read (all very common terms weigh the same) and idf is
+    # relative to the most common query term, which saves counting all the user's recipes.
+    doc_freq = {term: len(rows) for term, rows in postings.items() if rows}
+    if not doc_freq:
+        return [], 0
+    most_common = max(doc_freq.values())
+    idf = {term: math.log(1 + most_common / df) for term, df in doc_freq.items()}
+    truncated = most_common == depth
+
+    matched = {}
+    scores = {}
+    for term in doc_freq:
+        for recipe_id, weight in postings[term]:
+            matched[recipe_id] = matched.get(recipe_id, 0) + 1
+            scores[recipe_id] = scores.get(recipe_id, 0) + weight * idf[term]
+
+    present = sorted(doc_freq, key=doc_freq.get) # Rarest first
+    if truncated and len(present) > 1:
+        full = sum(1 for count in matched.values() if count == len(present))
+        if full < start + per_page:
+            # Too few recipes with every term among the best postings to fill the page: a recipe
+            # with every term but lower weights may be in none of the lists. Find those in SQL.
+            for recipe_id, *weights in _full_matches(user_id, present, depth):
+                matched[recipe_id] = len(present)
+                scores[recipe_id] = sum(weight * idf[term] for term, weight in zip(present, weights))
+
+    ranked = sorted(scores, key=lambda recipe_id: (matched[recipe_id], scores[recipe_id], recipe_id), reverse=True)
+    total = len(ranked)
+    if truncated: # Not every match was read: count them
+        total = db.session.execute(
+            select(func.count(RecipeSearchTerm.recipe_id.distinct()))
+            .where(RecipeSearchTerm.user_id == user_id, RecipeSearchTerm.term.in_(present))).scalar()
+    return ranked[start:start + per_page], total
+
+
+def _full_matches(user_id, terms, limit):
+    """Up to `limit` (recipe_id, weight per term) rows of recipes having every one of `terms`.
+
+    Driven by the postings of terms[0] (pass the rarest first), with one primary
+    key lookup per other term, instead of grouping every posting of every term.
+    """
+    first, *others = [aliased(RecipeSearchTerm) for _ in terms]
+    query = select(first.recipe_id, first.weight, *(other.weight for other in others))
+    for other, term in zip(others, terms[1:]):
+        query = query.join(other, (other.user_id == first.user_id) & (other.term == term)
+                           & (other.recipe_id == first.recipe_id))
+    return db.session.execute(query.where(first.user_id == user_id, first.term == terms[0]).limit(limit)).all()
@@ -0,0 +1,35 @@
+# app/serializers.py
+# The JSON shapes of a recipe, in one place.
+# Each shape reads its attributes with one precompiled attrgetter call and
+# leaves datetimes as they are; the app's JSON provider (json_provider.py)
+# writes them as ISO 8601 strings.
+from operator import attrgetter
+
+
+class Shape:
+    """A fixed list of attributes to copy from an object (ORM instance or row) into a dict."""
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self._get = attrgetter(*fields) # Needs two or more fields to return a tuple
+
+    def one(self, obj, **extra):
+        data = dict(zip(self.fields, self._get(obj)))
+        if extra:
+            data.update(extra)
+        return data
+
+    def many(self, objs):
+        fields, get = self.fields, self._get
+        return [dict(zip(fields, get(obj))) for obj in objs]
+
+
+# Lists, search results and create/update responses: no ingredients/instructions (see LIST_COLUMNS)
+recipe_summary = Shape('recipe_id', 'title', 'description', 'image_url', 'created_at', 'updated_at')
+
+# GET /api/recipes/<id>; the caller adds author_username
+recipe_detail = Shape('recipe_id', 'title', 'description', 'ingredients', 'instructions', 'image_url',
+                      'created_at', 'updated_at')
+
+# One line of GET /api/recipes/export, and what POST /api/recipes/import accepts back
+recipe_export = recipe_detail
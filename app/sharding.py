@@ -0,0 +1,429 @@
+# app/sharding.py
+# Horizontal sharding of personal recipes by user_id.
+#
+# - Shards: the primary (DATABASE_URL, shard 'primary') plus one bind per URL
+#   in DATABASE_SHARD_URLS ('shard1', 'shard2', ...). Every user's recipes and
+#   their index rows (SHARDED_TABLES) live on exactly one shard; users, the
+#   TheMealDB mirror and everything else stay on the primary.
+# - The user_shards table on the primary says which shard holds whose recipes.
+#   Users without a row are on the primary (the state before sharding); new
+#   users go to the shard with the fewest users. Lookups are cached per process
+#   for SHARD_DIRECTORY_TTL seconds.
+# - Queries on recipe tables go to the shard of the logged-in user (or of
+#   for_user() / using_shard() outside requests); flushes write each row to the
+#   shard of its own user_id. Route code doesn't change.
+# - Recipe ids come from a counter on the primary (id_sequences), reserved in
+#   blocks, so ids stay unique across shards and survive a move unchanged.
+# - `flask shards move` / `flask shards rebalance` move users between shards
+#   (see move_users() for what happens to writes made during a move).
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, has_request_context, session as flask_session
+from sqlalchemy import Column, Index, MetaData, Table, event, func, inspect, insert, literal, select, update, delete
+from sqlalchemy.sql.util import find_tables
+
+from .db_routing import RoutingSession
+
+PRIMARY = 'primary'
+SHARDED_TABLES = ('recipes', 'recipe_search_terms', 'recipe_ingredients', 'ingredients')
+# Tables with a user_id column: what moves with a user ('ingredients' is a vocabulary each shard keeps for itself)
+USER_TABLES = ('recipe_search_terms', 'recipe_ingredients', 'recipes')
+
+
+class NoShardSelected(RuntimeError):
+    """A recipe table was queried without a user to pick the shard from."""
+
+
+class ShardMap:
+    """Shard keys, the cached user -> shard directory, recipe id blocks and counters."""
+
+    def __init__(self, shard_keys, directory_ttl=30, id_block_size=100):
+        self.shard_keys = list(shard_keys)
+        self.directory_ttl = directory_ttl
+        self.id_block_size = id_block_size
+        self._directory = {} # user_id -> (stored_at, shard key)
+        self._next_id = self._id_limit = 0
+        self._lock = threading.Lock()
+        # Counters
+        self.directory_hits = 0
+        self.directory_misses = 0
+        self.id_blocks = 0
+        self.moves = 0
+
+    def shard_of(self, session, user_id):
+        """The shard holding user_id's recipes (one query on the primary on a cache miss)."""
+        with self._lock:
+            entry = self._directory.get(user_id)
+        if entry and time.monotonic() - entry[0] <= self.directory_ttl:
+            self.directory_hits += 1
+            return entry[1]
+        self.directory_misses += 1
+        directory = _table('user_shards')
+        # session.connection() is the primary, and allowed mid-flush (session.execute() isn't)
+        key = session.connection().execute(
+            select(directory.c.shard).where(directory.c.user_id == user_id)).scalar() or PRIMARY
+        self.remember(user_id, key)
+        return key
+
+    def remember(self, user_id, key):
+        with self._lock:
+            if len(self._directory) >= 100000 and user_id not in self._directory:
+                self._directory.clear() # Bounded; a refill costs one query per active user
+            self._directory[user_id] = (time.monotonic(), key)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._directory.clear()
+            else:
+                self._directory.pop(user_id, None)
+
+    def next_id(self, engine):
+        """A recipe id no shard has used, from this process's current block."""
+        with self._lock:
+            if self._next_id >= self._id_limit:
+                self._id_limit = self._reserve_block(engine)
+                self._next_id = self._id_limit - self.id_block_size
+                self.id_blocks += 1
+            self._next_id += 1
+            return self._next_id - 1
+
+    def _reserve_block(self, engine):
+        sequences = _table('id_sequences')
+        # A transaction of its own, committed at once: other processes never wait on a request's transaction
+        with engine.begin() as connection:
+            reserved = connection.execute(update(sequences).where(sequences.c.name == 'recipes')
+                                          .values(next_value=sequences.c.next_value + self.id_block_size)).rowcount
+            if not reserved:
+                raise RuntimeError("The recipe id sequence is missing: run `flask shards init` first.")
+            return connection.execute(select(sequences.c.next_value).where(sequences.c.name == 'recipes')).scalar_one()
+
+    def stats(self):
+        return {"shards": len(self.shard_keys), "directory_entries": len(self._directory),
+                "directory_hits": self.directory_hits, "directory_misses": self.directory_misses,
+                "id_blocks": self.id_blocks, "moves": self.moves}
+
+
+def _shards():
+    return current_app.extensions.get('sharding') if has_app_context() else None
+
+
+def _table(name):
+    from . import db
+    return db.metadata.tables[name]
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        return inspect(mapper).local_table.name in SHARDED_TABLES
+    return clause is not None and any(table.name in SHARDED_TABLES
+                                       for table in find_tables(clause, include_crud=True, include_joins=True))
+
+
+class ShardedSession(RoutingSession):
+    """RoutingSession that sends recipe tables to the right shard when sharding is on."""
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        if _shards() is not None:
+            # Called by the flush for every row it writes, so each row goes to its user's shard
+            self.connection_callable = self._connection_for_row
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard=None, **kwargs):
+        if shard is not None: # Explicit (flush, hooks, CLI): always the shard itself, never a replica
+            return self._db.engines[None if shard == PRIMARY else shard]
+        shards = _shards()
+        if bind is None and shards is not None and _is_sharded(mapper, clause):
+            key = self.current_shard(shards)
+            if key != PRIMARY:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def current_shard(self, shards):
+        """The shard recipe queries of this session go to right now."""
+        key = self.info.get('shard')
+        if key is not None:
+            return key
+        user_id = self.info.get('shard_user_id')
+        if user_id is None and has_request_context():
+            user_id = flask_session.get('user_id')
+        if user_id is None:
+            raise NoShardSelected("Recipe tables are sharded: query them for a logged-in user, "
+                                  "or inside sharding.for_user() / sharding.using_shard().")
+        return shards.shard_of(self, user_id)
+
+    def shard_for_user(self, user_id):
+        return self.info.get('shard') or _shards().shard_of(self, user_id)
+
+    def _connection_for_row(self, mapper, instance):
+        key = None
+        if mapper.local_table.name in SHARDED_TABLES:
+            key = self.shard_for_user(instance.user_id)
+        return self.connection(bind_arguments={'mapper': mapper, 'shard': key})
+
+
+@contextmanager
+def for_user(user_id):
+    """Send recipe queries of db.session to user_id's shard (scripts, CLI, background work)."""
+    from . import db
+    previous = db.session.info.get('shard_user_id')
+    db.session.info['shard_user_id'] = user_id
+    try:
+        yield
+    finally:
+        db.session.info['shard_user_id'] = previous
+
+
+@contextmanager
+def using_shard(key):
+    """Send every recipe query and write of db.session to one shard, whoever the rows belong to."""
+    from . import db
+    previous = db.session.info.get('shard')
+    db.session.info['shard'] = key
+    try:
+        yield
+    finally:
+        db.session.info['shard'] = previous
+
+
+def each_shard():
+    """Yield every shard key with db.session pinned to it (once, with None, when sharding is off)."""
+    shards = _shards()
+    if shards is None:
+        yield None
+        return
+    for key in shards.shard_keys:
+        with using_shard(key):
+            yield key
+
+
+def recipe_connections(session, recipes):
+    """[(connection, recipes)] grouped by the shard holding them, for flush hooks."""
+    if _shards() is None:
+        return [(session.connection(), recipes)]
+    groups = {}
+    for recipe in recipes:
+        groups.setdefault(session.shard_for_user(recipe.user_id), []).append(recipe)
+    return [(session.connection(bind_arguments={'shard': key}), group) for key, group in groups.items()]
+
+
+# --- Flush hooks ---
+
+def _assign_recipe_ids(session, flush_context, instances):
+    from .models import Recipe
+    shards = _shards()
+    if shards is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, Recipe) and obj.recipe_id is None:
+            obj.recipe_id = shards.next_id(session._db.engine)
+
+
+def _place_new_users(session, flush_context):
+    from .models import User
+    shards = _shards()
+    new_users = [obj for obj in session.new if isinstance(obj, User)]
+    if shards is None or not new_users:
+        return
+    directory = _table('user_shards')
+    connection = session.connection()
+    users = dict.fromkeys(shards.shard_keys, 0)
+    users.update((key, count) for key, count in connection.execute(
+        select(directory.c.shard, func.count()).group_by(directory.c.shard)) if key in users)
+    for user in new_users:
+        key = min(users, key=lambda key: (users[key], random.random())) # Fewest users, ties at random
+        users[key] += 1
+        connection.execute(insert(directory).values(user_id=user.user_id, shard=key))
+        shards.remember(user.user_id, key)
+
+
+def init_app(app):
+    shard_keys = [key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('shard')]
+    if not shard_keys:
+        return
+    app.extensions['sharding'] = ShardMap([PRIMARY] + shard_keys,
+                                          directory_ttl=app.config['SHARD_DIRECTORY_TTL'],
+                                          id_block_size=app.config['SHARD_ID_BLOCK_SIZE'])
+    if not event.contains(ShardedSession, 'before_flush', _assign_recipe_ids):
+        event.listen(ShardedSession, 'before_flush', _assign_recipe_ids)
+        event.listen(ShardedSession, 'after_flush', _place_new_users)
+
+
+# --- Administration (flask shards ...) ---
+
+def shard_metadata():
+    """The sharded tables as created on the shard databases: same columns and indexes, no foreign keys.
+
+    Their users live on the primary, and the flush hooks already delete index rows
+    along with their recipe, so nothing on a shard refers to another database.
+    """
+    from . import db
+    metadata = MetaData()
+    for name in SHARDED_TABLES:
+        table = db.metadata.tables[name]
+        Table(name, metadata,
+              *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                       unique=column.unique, autoincrement=column.autoincrement) for column in table.columns],
+              *[Index(index.name, *[column.name for column in index.columns], unique=index.unique)
+                for index in table.indexes])
+    return metadata
+
+
+def init_shards():
+    """Create the recipe tables on every shard, register existing users and start the id sequence.
+
+    Safe to run again (e.g. after adding a shard). Returns {shard: recipes}.
+    """
+    from . import db
+    shards = current_app.extensions['sharding']
+    metadata = shard_metadata()
+    for key in shards.shard_keys[1:]:
+        metadata.create_all(db.engines[key])
+
+    directory, users, sequences = _table('user_shards'), _table('users'), _table('id_sequences')
+    db.session.execute(insert(directory).from_select(
+        ['user_id', 'shard'],
+        select(users.c.user_id, literal(PRIMARY)).where(users.c.user_id.not_in(select(directory.c.user_id)))))
+
+    counts = shard_loads()
+    highest = 0
+    for key in shards.shard_keys:
+        with using_shard(key):
+            highest = max(highest, db.session.execute(select(func.max(_table('recipes').c.recipe_id))).scalar() or 0)
+    current = db.session.execute(select(sequences.c.next_value).where(sequences.c.name == 'recipes')).scalar()
+    if current is None:
+        db.session.execute(insert(sequences).values(name='recipes', next_value=highest + 1))
+    elif current <= highest:
+        db.session.execute(update(sequences).where(sequences.c.name == 'recipes').values(next_value=highest + 1))
+    db.session.commit()
+    return {key: sum(user_counts.values()) for key, user_counts in counts.items()}
+
+
+def shard_loads():
+    """{shard: {user_id: recipes}} for every user in the directory, from the shard the directory names."""
+    from . import db
+    shards = current_app.extensions['sharding']
+    directory, recipes = _table('user_shards'), _table('recipes')
+    loads = {key: {} for key in shards.shard_keys}
+    for user_id, key in db.session.execute(select(directory.c.user_id, directory.c.shard)):
+        loads.setdefault(key, {})[user_id] = 0
+    for key, users in loads.items():
+        with using_shard(key):
+            counts = db.session.execute(select(recipes.c.user_id, func.count())
+                                        .group_by(recipes.c.user_id)).all()
+        users.update((user_id, count) for user_id, count in counts if user_id in users)
+    return loads
+
+
+def _read_rows(key, user_id):
+    from . import db
+    from .models import Recipe
+    with using_shard(key):
+        rows = db.session.execute(select(*Recipe.__table__.columns).where(Recipe.user_id == user_id)).mappings()
+        return {row['recipe_id']: dict(row) for row in rows}
+
+
+def _copy_rows(key, rows, replace_ids=()):
+    """Write recipes to a shard through the ORM, so its flush hooks build the index rows there too."""
+    from . import db
+    from .models import Recipe
+    with using_shard(key):
+        for recipe in (Recipe.query.filter(Recipe.recipe_id.in_(replace_ids)).all() if replace_ids else []):
+            db.session.delete(recipe)
+        db.session.flush()
+        db.session.add_all([Recipe(**row) for row in rows])
+        db.session.commit()
+
+
+def _delete_user_rows(key, user_id, recipe_ids=None):
+    from . import db
+    with using_shard(key):
+        for name in USER_TABLES: # Index rows first, like the ON DELETE CASCADE on the primary
+            table = _table(name)
+            condition = table.c.user_id == user_id
+            if recipe_ids is not None:
+                condition &= table.c.recipe_id.in_(recipe_ids)
+            db.session.execute(delete(table).where(condition))
+        db.session.commit()
+
+
+def move_users(moves, wait=True, echo=print):
+    """Move users' recipes to other shards; moves is [(user_id, target shard)]. Returns the recipes moved.
+
+    1. Copy each user's recipes (same ids) to the target, then point the directory at it.
+    2. Other processes may still use their cached directory entry for up to
+       SHARD_DIRECTORY_TTL seconds and write to the old shard; unless wait=False,
+       wait that long (once for all users), then copy recipes created or edited
+       there meanwhile.
+    3. Delete the recipes from the old shard.
+    A recipe deleted on the old shard during step 2 is not deleted on the target.
+    """
+    from . import db
+    shards = current_app.extensions['sharding']
+    directory = _table('user_shards')
+    moved = []
+    total = 0
+    for user_id, target in moves:
+        if target not in shards.shard_keys:
+            raise ValueError(f"Unknown shard {target!r}, choose from {', '.join(shards.shard_keys)}")
+        shards.invalidate(user_id)
+        source = shards.shard_of(db.session, user_id)
+        if source == target:
+            continue
+        _delete_user_rows(target, user_id) # Leftovers of an interrupted move
+        rows = _read_rows(source, user_id)
+        _copy_rows(target, rows.values())
+        if not db.session.execute(update(directory).where(directory.c.user_id == user_id)
+                                  .values(shard=target)).rowcount:
+            db.session.execute(insert(directory).values(user_id=user_id, shard=target))
+        db.session.commit()
+        shards.remember(user_id, target)
+        moved.append((user_id, source, target))
+        total += len(rows)
+        echo(f"User {user_id}: copied {len(rows)} recipes from {source} to {target}")
+
+    if moved and wait:
+        echo(f"Waiting {shards.directory_ttl:g}s for other processes to see the new shards")
+        time.sleep(shards.directory_ttl)
+    for user_id, source, target in moved:
+        late = _read_rows(source, user_id)
+        on_target = _read_rows(target, user_id)
+        changed = [row for recipe_id, row in late.items()
+                   if recipe_id not in on_target or row['updated_at'] > on_target[recipe_id]['updated_at']]
+        if changed:
+            _copy_rows(target, changed, replace_ids=[row['recipe_id'] for row in changed
+                                                     if row['recipe_id'] in on_target])
+            echo(f"User {user_id}: copied {len(changed)} recipes written to {source} during the move")
+        _delete_user_rows(source, user_id)
+        shards.moves += 1
+    return total
+
+
+def plan_rebalance(loads):
+    """Moves [(user_id, source, target)] that even out recipes per shard.
+
+    Greedy: repeatedly move the largest user of the fullest shard that still
+    narrows the gap to the emptiest one.
+    """
+    totals = {key: sum(users.values()) for key, users in loads.items()}
+    source = {user_id: key for key, users in loads.items() for user_id in users}
+    where = dict(source)
+    sizes = {user_id: count for users in loads.values() for user_id, count in users.items()}
+    moves = []
+    while True:
+        fullest = max(totals, key=totals.get)
+        emptiest = min(totals, key=totals.get)
+        gap = totals[fullest] - totals[emptiest]
+        candidates = [(sizes[user_id], user_id) for user_id, key in where.items()
+                      if key == fullest and 0 < sizes[user_id] < gap]
+        if not candidates: # A user moved twice only moves once, from where it is to where it ends up
+            return [(user_id, source[user_id], where[user_id]) for user_id in dict.fromkeys(moves)
+                    if where[user_id] != source[user_id]]
+        count, user_id = max(candidates)
+        moves.append(user_id)
+        where[user_id] = emptiest
+        totals[fullest] -= count
+        totals[emptiest] += count
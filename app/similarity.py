@@ -0,0 +1,481 @@
+# app/similarity.py
+# "Similar recipes": cosine similarity of TF-IDF weighted ingredient sets, for
+# GET /api/recipes/<id>/similar and /api/recipes/external/<meal_id>/similar.
+#
+# Every recipe (Recipe.ingredients, parsed like the pantry index does) and every
+# TheMealDB meal (strIngredient1..20) becomes a row of a sparse term-incidence
+# matrix; the terms are ingredient names plus their words, so "chicken thigh"
+# and "chicken breast" still share "chicken". Weights are IDF over the user's
+# recipes and the meals together, applied at query time, so a change to one
+# recipe never reweights stored rows.
+#
+# Like suggest_index.py, everything is in memory, per process: one corpus of
+# meal rows (the local mirror, reloaded every SIMILAR_INDEX_TTL seconds, plus
+# every meal whose details were fetched) and an LRU of per-user corpora built
+# from recipe_ingredients on first use and updated after every commit.
+#
+# A query is one sparse matrix product over a corpus (several queries at once
+# in batch) and an argpartition for the top k: no per-recipe Python loop.
+# numpy and scipy are optional: without them the endpoints answer 503.
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError: # Optional: pip install numpy scipy
+    np = sparse = None
+
+from . import sharding
+from .ingredient_index import parse_ingredient_line, parse_ingredients
+from .models import Recipe, Ingredient, RecipeIngredient, MealDBMeal, MealDBIngredient
+
+COMPACT_MIN_PENDING = 256 # Rows changed since the last compaction before the next one...
+COMPACT_SHARE = 16        # ...or 1/16 of the rows, whichever is more
+
+
+def available():
+    return sparse is not None
+
+
+def ingredient_terms(names):
+    """Features of a recipe: its ingredient names plus the words of multi-word names."""
+    terms = set(names)
+    for name in names:
+        words = name.split()
+        if len(words) > 1:
+            terms.update(words)
+    return terms
+
+
+def meal_terms(meal):
+    """Features of a TheMealDB meal dict, from its strIngredient1..20 fields."""
+    names = (parse_ingredient_line(meal.get(f'strIngredient{i}') or '') for i in range(1, 21))
+    return ingredient_terms({name for name in names if name})
+
+
+class Vocabulary:
+    """term -> column, shared by every corpus of the process so their rows line up. Only grows."""
+
+    def __init__(self):
+        self.columns = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns)
+
+    def lookup(self, terms, add=True):
+        """Sorted columns of `terms`; unknown terms get a new column (or are skipped when not add)."""
+        columns = []
+        with self._lock:
+            for term in terms:
+                column = self.columns.get(term)
+                if column is None and add:
+                    column = self.columns[term] = len(self.columns)
+                if column is not None:
+                    columns.append(column)
+        return sorted(columns)
+
+
+_corpus_ids = itertools.count()
+_NO_COLUMNS = np.zeros(0, dtype=np.int32) if np is not None else None
+
+
+def _grow(array, size):
+    return array if len(array) >= size else np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)])
+
+
+class Corpus:
+    """Rows of a binary sparse matrix (one per recipe or meal), changed in place.
+
+    `_matrix` (CSC, for cheap column slices) holds the rows up to the last
+    compaction. Rows added or changed since then are appended after it and
+    scored from a small matrix rebuilt after each change; a changed or removed row is
+    only marked dead. Once enough rows are pending, compaction drops the dead
+    rows and builds a new `_matrix` from the rows' columns (no database access).
+    """
+
+    def __init__(self):
+        self.id = next(_corpus_ids)
+        self.built_at = time.monotonic()
+        self.version = 0     # Bumped on every change (cached norms depend on it)
+        self.labels = {}     # key -> title
+        self._row_of = {}    # key -> row
+        self._keys = []      # row -> key (None once dead)
+        self._columns = []   # row -> int32 array of columns (None once dead)
+        self._compacted = 0  # Rows [0, _compacted) are in _matrix
+        self._matrix = sparse.csc_matrix((0, 0), dtype=np.float64)
+        self._alive = np.zeros(0, dtype=bool)
+        self.df = np.zeros(0, dtype=np.int64) # Live rows per column
+        self._norms = (None, None)   # (weights version, row norms of _matrix)
+        self._pending = (None, None) # ((version, weights version), rows after _matrix), see _pending_part
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def __contains__(self, key):
+        return key in self._row_of
+
+    def columns_of(self, key):
+        with self._lock:
+            return self._columns[self._row_of[key]]
+
+    def load(self, items):
+        """Fill an empty corpus from (key, label, columns) items, compacting once at the end."""
+        with self._lock:
+            for key, label, columns in items:
+                if len(columns):
+                    self._row_of[key] = len(self._keys)
+                    self._keys.append(key)
+                    self._columns.append(np.asarray(columns, dtype=np.int32))
+                    self.labels[key] = label
+            if self._columns:
+                self.df = np.bincount(np.concatenate(self._columns))
+            self.version += 1
+            self._compact()
+
+    def set(self, key, label, columns):
+        columns = np.asarray(columns, dtype=np.int32)
+        with self._lock:
+            self._remove(key)
+            if not len(columns):
+                return
+            row = len(self._keys)
+            self._row_of[key] = row
+            self._keys.append(key)
+            self._columns.append(columns)
+            self.labels[key] = label
+            self.df = _grow(self.df, int(columns[-1]) + 1)
+            self.df[columns] += 1
+            self.version += 1
+            if len(self._keys) - self._compacted >= max(COMPACT_MIN_PENDING, len(self._row_of) // COMPACT_SHARE):
+                self._compact()
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        row = self._row_of.pop(key, None)
+        if row is None:
+            return
+        self.df[self._columns[row]] -= 1
+        self._keys[row] = self._columns[row] = None
+        self.labels.pop(key, None)
+        if row < self._compacted:
+            self._alive[row] = False
+        self.version += 1
+
+    def _compact(self):
+        live = [row for row in range(len(self._keys)) if self._keys[row] is not None]
+        self._keys = [self._keys[row] for row in live]
+        self._columns = [self._columns[row] for row in live]
+        self._row_of = {key: row for row, key in enumerate(self._keys)}
+        self._matrix = _incidence(self._columns, len(self.df)).tocsc()
+        self._compacted = len(self._keys)
+        self._alive = np.ones(self._compacted, dtype=bool)
+        self._norms = (None, None)
+        self._pending = (None, None)
+
+    def top_k(self, queries, weights, weights_version, k):
+        """Per query, the k rows with the highest cosine: [[(cosine, key), ...], ...].
+
+        `queries` are sorted column arrays and `weights` the squared IDF of every column
+        (applied to both sides); `weights_version` changes whenever `weights` do.
+        """
+        with self._lock:
+            if self._norms[0] != weights_version:
+                self._norms = (weights_version, _norms(self._matrix, weights))
+            parts = [(self._matrix, self._norms[1], self._alive, 0)]
+            if len(self._keys) > self._compacted:
+                parts.append(self._pending_part(weights, weights_version))
+            keys = self._keys
+            results = []
+            for columns in queries:
+                found = []
+                results.append(found)
+                if not len(columns):
+                    continue
+                query_norm = np.sqrt(weights[columns].sum())
+                for matrix, norms, alive, offset in parts:
+                    # Dot products with every row in one sparse product over the query's columns
+                    # (columns past the matrix's width are terms none of its rows have)
+                    inside = columns[columns < matrix.shape[1]]
+                    dots = matrix[:, inside] @ weights[inside]
+                    dots[~alive] = 0
+                    cosine = dots / norms / query_norm
+                    count = min(k, len(cosine))
+                    for row in np.argpartition(-cosine, count - 1)[:count] if count else ():
+                        if cosine[row] > 0:
+                            found.append((float(cosine[row]), keys[offset + row]))
+        return results
+
+    def _pending_part(self, weights, weights_version):
+        """(matrix, norms, alive, offset) of the rows added since the last compaction, cached until a change."""
+        cached_for, part = self._pending
+        if cached_for != (self.version, weights_version):
+            rows = self._columns[self._compacted:]
+            alive = np.array([columns is not None for columns in rows])
+            matrix = _incidence([columns if columns is not None else _NO_COLUMNS for columns in rows], len(weights))
+            part = (matrix.tocsc(), _norms(matrix, weights), alive, self._compacted)
+            self._pending = ((self.version, weights_version), part)
+        return part
+
+
+def _norms(matrix, weights):
+    """Row norms under `weights` (1 for empty rows, whose dot products are 0 anyway)."""
+    norms = np.sqrt(matrix @ weights[:matrix.shape[1]])
+    norms[norms == 0] = 1
+    return norms
+
+
+def _incidence(rows, width):
+    """CSR matrix with a 1 at (i, column) for every column of rows[i]."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(columns) for columns in rows], out=indptr[1:])
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(rows), width))
+
+
+class SimilarityIndex:
+    """The meal corpus, an LRU of per-user recipe corpora and the top-k queries over them."""
+
+    def __init__(self, ttl=60, max_recipes=200000, max_meals=20000):
+        self.ttl = ttl
+        self.max_recipes = max_recipes
+        self.max_meals = max_meals
+        self.vocabulary = Vocabulary()
+        self.meals = None # Created on first use (needs numpy)
+        self._meals_loaded_at = None
+        self._meals_lock = threading.Lock() # Held while the meal corpus is (re)loaded from the mirror
+        self._users = OrderedDict() # user_id -> Corpus, least recently used first
+        self._lock = threading.Lock()
+        # Counters
+        self.queries = 0
+        self.builds = 0
+        self.evictions = 0
+
+    # --- Meals ---
+
+    def _meal_corpus(self):
+        with self._lock:
+            if self.meals is None:
+                self.meals = Corpus()
+            return self.meals
+
+    def add_meal(self, meal):
+        """Index a full TheMealDB meal dict (lookup.php / search.php format)."""
+        if not available() or not meal.get('idMeal'):
+            return
+        meals = self._meal_corpus()
+        if len(meals) < self.max_meals or meal['idMeal'] in meals:
+            meals.set(meal['idMeal'], meal.get('strMeal'), self.vocabulary.lookup(meal_terms(meal)))
+
+    def _meals_fresh(self):
+        loaded_at = self._meals_loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at <= self.ttl
+
+    def _refresh_meals(self):
+        if self._meals_fresh():
+            return
+        # One thread loads. The first load is waited for, so nobody reads a half-filled
+        # corpus; during a later reload the others keep using the current one.
+        if not self._meals_lock.acquire(blocking=self._meals_loaded_at is None):
+            return
+        try:
+            if self._meals_fresh(): # Loaded while we waited
+                return
+            started = time.monotonic()
+            self._load_meals()
+            self._meals_loaded_at = started
+        finally:
+            self._meals_lock.release()
+
+    def _load_meals(self):
+        meals = self._meal_corpus()
+        # The same max_meals meals for both queries, so only their ingredient rows are read
+        limited = (MealDBMeal.query.with_entities(MealDBMeal.meal_id)
+                   .order_by(MealDBMeal.meal_id).limit(self.max_meals).subquery())
+        names = dict(MealDBMeal.query.with_entities(MealDBMeal.meal_id, MealDBMeal.name)
+                     .join(limited, limited.c.meal_id == MealDBMeal.meal_id))
+        ingredients = {}
+        for meal_id, ingredient in (MealDBIngredient.query
+                                    .with_entities(MealDBIngredient.meal_id, MealDBIngredient.ingredient)
+                                    .join(limited, limited.c.meal_id == MealDBIngredient.meal_id)):
+            name = parse_ingredient_line(ingredient)
+            if meal_id in names and name: # A meal added between the two queries can shift the limit
+                ingredients.setdefault(meal_id, set()).add(name)
+        items = [(meal_id, names[meal_id], self.vocabulary.lookup(ingredient_terms(found)))
+                 for meal_id, found in ingredients.items()]
+        if not len(meals):
+            meals.load(items)
+        else: # Only meals new or changed since the last load touch the matrix
+            for meal_id, label, columns in items:
+                if meal_id not in meals or list(meals.columns_of(meal_id)) != columns:
+                    meals.set(meal_id, label, columns)
+
+    # --- Personal recipes ---
+
+    def for_user(self, user_id):
+        with self._lock:
+            corpus = self._users.get(user_id)
+            if corpus is not None:
+                self._users.move_to_end(user_id)
+        if corpus is None or time.monotonic() - corpus.built_at > self.ttl:
+            corpus = Corpus()
+            with sharding.for_user(user_id):
+                titles = dict(Recipe.query.with_entities(Recipe.recipe_id, Recipe.title)
+                              .filter(Recipe.user_id == user_id))
+                names = {}
+                for recipe_id, name in (RecipeIngredient.query
+                                        .join(Ingredient, Ingredient.ingredient_id == RecipeIngredient.ingredient_id)
+                                        .with_entities(RecipeIngredient.recipe_id, Ingredient.name)
+                                        .filter(RecipeIngredient.user_id == user_id)):
+                    names.setdefault(recipe_id, []).append(name)
+            corpus.load((recipe_id, titles[recipe_id], self.vocabulary.lookup(ingredient_terms(found)))
+                        for recipe_id, found in names.items() if recipe_id in titles)
+            self.builds += 1
+            with self._lock:
+                self._users[user_id] = corpus
+                self._users.move_to_end(user_id)
+                self._evict()
+        return corpus
+
+    def _evict(self):
+        total = sum(len(corpus) for corpus in self._users.values())
+        while total > self.max_recipes and len(self._users) > 1:
+            _, corpus = self._users.popitem(last=False)
+            total -= len(corpus)
+            self.evictions += 1
+
+    def apply(self, changes):
+        """Apply committed [(user_id, recipe_id, title, ingredients text or None for deleted)]."""
+        with self._lock:
+            corpora = {user_id: self._users.get(user_id) for user_id, _, _, _ in changes}
+        for user_id, recipe_id, title, ingredients in changes:
+            corpus = corpora[user_id]
+            if corpus is None: # Not cached: built fresh on next use
+                continue
+            if ingredients is None:
+                corpus.remove(recipe_id)
+            else:
+                corpus.set(recipe_id, title, self.vocabulary.lookup(ingredient_terms(parse_ingredients(ingredients))))
+        with self._lock:
+            self._evict()
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    # --- Queries ---
+
+    def recipe_terms(self, user_id, recipe_id):
+        """Columns of one of the user's recipes, or None if they have no such recipe."""
+        corpus = self.for_user(user_id)
+        if recipe_id in corpus: # The corpus only holds the user's own recipes
+            return corpus.columns_of(recipe_id)
+        recipe = Recipe.query.filter_by(recipe_id=recipe_id, user_id=user_id).first() # e.g. no ingredients parsed
+        if recipe is None:
+            return None
+        return self.vocabulary.lookup(ingredient_terms(parse_ingredients(recipe.ingredients)), add=False)
+
+    def meal_terms(self, meal_id, fetch):
+        """Columns of a TheMealDB meal; fetch() returns its full dict when it isn't indexed yet."""
+        self._refresh_meals()
+        if meal_id not in self.meals:
+            meal = fetch()
+            if meal is None:
+                return None
+            self.add_meal(meal)
+            if meal_id not in self.meals:
+                return []
+        return self.meals.columns_of(meal_id)
+
+    def similar(self, queries, user_id=None, k=10, exclude=()):
+        """Top k per query: [[{title, source, recipe_id or meal_id, score}, ...], ...].
+
+        `queries` is a list of column lists; `exclude` holds one ('recipe', id) or
+        ('mealdb', id) per query, left out of that query's results (the item itself).
+        """
+        self.queries += len(queries)
+        self._refresh_meals()
+        if not any(len(columns) for columns in queries):
+            return [[] for _ in queries]
+        corpora = [('mealdb', self.meals)]
+        if user_id is not None:
+            corpora.insert(0, ('recipe', self.for_user(user_id)))
+
+        # IDF over everything the user can see: log((1 + n) / (1 + df)) + 1, squared (both vectors carry it)
+        width = len(self.vocabulary)
+        documents = sum(len(corpus) for _, corpus in corpora)
+        df = sum(_grow(corpus.df, width)[:width] for _, corpus in corpora)
+        weights = (np.log((1 + documents) / (1 + df)) + 1) ** 2
+        weights_version = tuple((corpus.id, corpus.version) for _, corpus in corpora)
+
+        queries = [np.asarray(columns, dtype=np.int32) for columns in queries]
+        candidates = [[] for _ in queries] # Per query: (score, source, key, label)
+        for source, corpus in corpora:
+            # One extra per query: the item itself, if it is in this corpus
+            for i, found in enumerate(corpus.top_k(queries, weights, weights_version, k + 1)):
+                candidates[i] += [(score, source, key, corpus.labels.get(key)) for score, key in found
+                                  if (source, key) != (exclude[i] if exclude else None)]
+        results = []
+        for found in candidates:
+            found.sort(key=lambda item: -item[0])
+            results.append([{"title": label, "source": source,
+                             ("recipe_id" if source == 'recipe' else "meal_id"): key,
+                             "score": round(score, 4)} for score, source, key, label in found[:k]])
+        return results
+
+    def stats(self):
+        with self._lock:
+            user_recipes = sum(len(corpus) for corpus in self._users.values())
+            users = len(self._users)
+        return {"available": available(), "meals": len(self.meals) if self.meals is not None else 0,
+                "users": users, "user_recipes": user_recipes, "terms": len(self.vocabulary),
+                "queries": self.queries, "builds": self.builds, "evictions": self.evictions}
+
+
+similarity_index = SimilarityIndex()
+
+
+# --- Keeping the per-user corpora in sync ---
+
+def _collect_after_flush(session, flush_context):
+    changes = [(obj.user_id, obj.recipe_id, obj.title, obj.ingredients) for obj in session.new if isinstance(obj, Recipe)]
+    changes += [(obj.user_id, obj.recipe_id, obj.title, obj.ingredients) for obj in session.dirty
+                if isinstance(obj, Recipe) and (inspect(obj).attrs.ingredients.history.has_changes()
+                                                or inspect(obj).attrs.title.history.has_changes())]
+    changes += [(obj.user_id, obj.recipe_id, None, None) for obj in session.deleted if isinstance(obj, Recipe)]
+    if changes:
+        session.info.setdefault('similarity_changes', []).extend(changes)
+
+
+def _apply_after_commit(session):
+    changes = session.info.pop('similarity_changes', None)
+    if changes and available():
+        similarity_index.apply(changes)
+
+
+def _discard_after_rollback(session):
+    session.info.pop('similarity_changes', None)
+
+
+def init_app(app):
+    similarity_index.ttl = app.config['SIMILAR_INDEX_TTL']
+    similarity_index.max_recipes = app.config['SIMILAR_MAX_RECIPES']
+    similarity_index.max_meals = app.config['SIMILAR_MAX_MEALS']
+    app.extensions['similarity_index'] = similarity_index # For /metrics
+    if not event.contains(Session, 'after_flush', _collect_after_flush):
+        event.listen(Session, 'after_flush', _collect_after_flush)
+        event.listen(Session, 'after_commit', _apply_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
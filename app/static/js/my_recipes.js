@@ -1,16 +1,35 @@
 // app/static/js/my_recipes.js
 
 document.addEventListener('DOMContentLoaded', function() {
-    fetchMyRecipes();
+    // The first page comes with the HTML; only search and "Load more" fetch
+    const initial = readInitialData('initial-recipes');
+    if (initial) { displayMyRecipes(initial.recipes, '', false, initial.next_cursor); }
+    else { fetchMyRecipes(); }
+
+    // Server-side full-text search, 300ms after the user stops typing
+    const searchInput = document.getElementById('my-recipes-search');
+    if (searchInput) {
+        let searchTimeout = null;
+        searchInput.addEventListener('input', () => {
+            clearTimeout(searchTimeout);
+            searchTimeout = setTimeout(() => fetchMyRecipes(searchInput.value.trim()), 300);
+        });
+    }
 });
 
-async function fetchMyRecipes() {
+// `after` is the cursor of the next page (from the X-Next-Cursor header); the page is appended to the list
+async function fetchMyRecipes(searchText = '', after = null) {
     const recipesListDiv = document.getElementById('my-recipes-list');
     if (!recipesListDiv) { return; }
-    recipesListDiv.innerHTML = '<p class="text-muted">Loading your recipes...</p>';
+    if (!after) {
+        recipesListDiv.innerHTML = '<p class="text-muted">Loading your recipes...</p>';
+    }
 
     try {
-        const response = await fetch('/api/recipes'); // Default method is GET
+        let url = '/api/recipes';
+        if (searchText) { url += `?q=${encodeURIComponent(searchText)}&per_page=50`; }
+        else if (after) { url += `?after=${encodeURIComponent(after)}`; }
+        const response = await fetch(url); // Default method is GET
 
         if (response.status === 401) {
             recipesListDiv.innerHTML = '<p class="alert alert-warning">You must be logged in. <a href="/login">Login here</a>.</p>';
@@ -21,7 +40,7 @@ async function fetchMyRecipes() {
             throw new Error(errorResult.error || `HTTP error! status: ${response.status}`);
         }
         const recipes = await response.json();
-        displayMyRecipes(recipes);
+        displayMyRecipes(recipes, searchText, Boolean(after), response.headers.get('X-Next-Cursor'));
 
     } catch (error) {
         console.error('Error fetching recipes:', error);
@@ -29,10 +48,20 @@ async function fetchMyRecipes() {
     }
 }
 
-function displayMyRecipes(recipes) {
+function displayMyRecipes(recipes, searchText = '', append = false, nextCursor = null) {
     const recipesListDiv = document.getElementById('my-recipes-list');
+    const oldLoadMore = document.getElementById('load-more-recipes');
+    if (oldLoadMore) { oldLoadMore.remove(); }
+    if (append) {
+        appendRecipeItems(recipesListDiv.querySelector('ul.list-group'), recipes, recipesListDiv, nextCursor);
+        return;
+    }
      recipesListDiv.innerHTML = ''; // Clear loading/previous
 
+    if ((!recipes || recipes.length === 0) && searchText) {
+        recipesListDiv.innerHTML = '<p>No recipes match your search.</p>';
+        return;
+    }
     if (!recipes || recipes.length === 0) {
         recipesListDiv.innerHTML = '<p>You haven\'t added any recipes yet. <a href="/recipe/new" class="btn btn-sm btn-outline-primary">Create your first recipe!</a></p>';
         return;
@@ -41,7 +70,11 @@ function displayMyRecipes(recipes) {
     // Use Bootstrap List Group
     const ul = document.createElement('ul');
     ul.className = 'list-group shadow-sm'; // Add list-group class
+    recipesListDiv.appendChild(ul);
+    appendRecipeItems(ul, recipes, recipesListDiv, nextCursor);
+}
 
+function appendRecipeItems(ul, recipes, recipesListDiv, nextCursor) {
     recipes.forEach(recipe => {
         const li = document.createElement('li');
         // Add list-group-item classes for styling and layout
@@ -62,8 +95,20 @@ function displayMyRecipes(recipes) {
         `;
         ul.appendChild(li);
     });
-    recipesListDiv.appendChild(ul);
     addDeleteButtonListeners(); // Attach listeners
+
+    // More pages? Offer to load the next one
+    if (nextCursor) {
+        const loadMore = document.createElement('button');
+        loadMore.id = 'load-more-recipes';
+        loadMore.className = 'btn btn-outline-primary mt-3';
+        loadMore.textContent = 'Load more';
+        loadMore.addEventListener('click', () => {
+            loadMore.disabled = true;
+            fetchMyRecipes('', nextCursor);
+        });
+        recipesListDiv.appendChild(loadMore);
+    }
 }
 
 // --- Delete Functionality (remains mostly the same logic) ---
@@ -108,7 +153,8 @@ async function deleteRecipe(recipeId, buttonElement) {
           });
          if (response.ok) {
              // Remove the list item visually or just refresh the whole list
-             fetchMyRecipes(); // Easiest is to just refresh
+             const searchInput = document.getElementById('my-recipes-search');
+             fetchMyRecipes(searchInput ? searchInput.value.trim() : ''); // Easiest is to just refresh
              // Optionally show a temporary success message (using flash or dynamically adding an alert)
          } else {
              const errorResult = await response.json().catch(() => ({ error: 'Failed to delete recipe.' }));
@@ -4,7 +4,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const container = document.getElementById('recipe-detail-container');
     if (container) {
         const recipeId = container.dataset.recipeId;
-        if (recipeId) { fetchRecipeDetails(recipeId); }
+        // The recipe comes with the HTML when it exists; otherwise fetch to show the API's error
+        const initial = readInitialData('initial-recipe');
+        if (recipeId && initial) { populateRecipeDetail(initial, recipeId); }
+        else if (recipeId) { fetchRecipeDetails(recipeId); }
         else { displayDetailError("Recipe ID not found."); }
     }
 });
@@ -1,5 +1,17 @@
 // app/static/js/script.js
 
+// Data the server embedded in a <script type="application/json" id="..."> block, or null
+function readInitialData(id) {
+    const element = document.getElementById(id);
+    if (!element) { return null; }
+    try {
+        return JSON.parse(element.textContent);
+    } catch (error) {
+        console.error(`Invalid initial data in #${id}:`, error);
+        return null; // The caller falls back to fetching
+    }
+}
+
 document.addEventListener('DOMContentLoaded', () => {
     // --- Logout Link Handler ---
     const logoutLink = document.getElementById('logout-link'); // We need to add this ID to the link
@@ -159,6 +159,66 @@ const debouncedSearchByIngredient = debounce(function(ingredient) {
    }
 }, 500); // 500ms delay
 
+// --- Title Suggestions ---
+// Typo-tolerant autocomplete: the user's own recipes first, then TheMealDB meals
+const searchSuggestionsDiv = document.getElementById('search-suggestions');
+let suggestRequest = null; // The in-flight request, aborted when the user keeps typing
+
+function hideSuggestions() {
+    if (!searchSuggestionsDiv) return;
+    searchSuggestionsDiv.classList.add('d-none');
+    searchSuggestionsDiv.innerHTML = '';
+}
+
+function displaySuggestions(suggestions) {
+    searchSuggestionsDiv.innerHTML = '';
+    suggestions.forEach(suggestion => {
+        const item = document.createElement('button');
+        item.type = 'button';
+        item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+        item.textContent = suggestion.title;
+        if (suggestion.source === 'recipe') {
+            const badge = document.createElement('span');
+            badge.className = 'badge bg-success';
+            badge.textContent = 'My recipe';
+            item.appendChild(badge);
+        }
+        // mousedown, so it runs before the input's blur hides the list
+        item.addEventListener('mousedown', (event) => {
+            event.preventDefault();
+            hideSuggestions();
+            if (suggestion.source === 'recipe') {
+                window.location.href = `/recipe/${suggestion.recipe_id}`;
+            } else {
+                searchQueryInput.value = suggestion.title;
+                performSearch('name', suggestion.title);
+            }
+        });
+        searchSuggestionsDiv.appendChild(item);
+    });
+    searchSuggestionsDiv.classList.toggle('d-none', suggestions.length === 0);
+}
+
+function fetchSuggestions(prefix) {
+    if (suggestRequest) suggestRequest.abort();
+    const xhr = suggestRequest = new XMLHttpRequest();
+    xhr.open('GET', `/api/recipes/suggest?prefix=${encodeURIComponent(prefix)}&limit=8`, true);
+    xhr.onload = function() {
+        suggestRequest = null;
+        if (xhr.status >= 200 && xhr.status < 300) {
+            try { displaySuggestions(JSON.parse(xhr.responseText)); } catch (e) { hideSuggestions(); }
+        } else {
+            hideSuggestions(); // Suggestions are a nicety; the search itself still works
+        }
+    };
+    xhr.send();
+}
+
+// Answers take well under a millisecond on the server, so a short pause is enough
+const debouncedSuggest = debounce(function(prefix) {
+    if (prefix.length > 1) { fetchSuggestions(prefix); } else { hideSuggestions(); }
+}, 120);
+
 // --- Modal Handling Functions ---
 function showModal() {
     // if(modal) modal.style.display = "block";
@@ -264,7 +324,7 @@ function displayResults(meals) {
         col.className = 'col';
         col.innerHTML = `
             <div class="card h-100 shadow-sm">
-                <img src="${meal.image_url}" class="card-img-top" alt="${meal.name}" style="height: 200px; object-fit: cover;">
+                <img src="${meal.thumbnail_url || meal.image_url}" class="card-img-top" alt="${meal.name}" loading="lazy" style="height: 200px; object-fit: cover;">
                 <div class="card-body d-flex flex-column">
                     <h5 class="card-title">${meal.name}</h5>
                     <button class="btn btn-primary mt-auto view-details-btn" data-meal-id="${meal.id}">View Details</button>
@@ -361,7 +421,9 @@ if (searchQueryInput) {
     searchQueryInput.addEventListener('input', (event) => {
         const query = event.target.value.trim();
         debouncedSearchByName(query); // Call the debounced function
+        if (searchSuggestionsDiv) debouncedSuggest(query);
     });
+    searchQueryInput.addEventListener('blur', hideSuggestions);
 }
 
 if (searchIngredientInput) {
@@ -376,6 +438,7 @@ if (searchQueryInput && searchByNameBtn) { // Check button exists if keeping log
      searchQueryInput.addEventListener('keypress', (event) => {
         if (event.key === 'Enter') {
             const query = event.target.value.trim();
+            hideSuggestions();
              if (query) { performSearch('name', query); } // Perform immediately on Enter
              // searchByNameBtn.click(); // Or trigger button if keeping it
         }
@@ -401,6 +464,7 @@ if (searchQueryInput && searchByNameBtn) { // Check button exists if keeping log
 //     if (event.target === modal) { hideModal(); }
 // });
 window.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') hideSuggestions();
     if (event.key === 'Escape' && recipeModalInstance) {
         hideModal(); // Use hideModal which uses Bootstrap's API if available
     }
@@ -0,0 +1,367 @@
+# app/suggest_index.py
+# Typo-tolerant title autocomplete for GET /api/recipes/suggest?prefix=...
+#
+# Everything is in memory, per process:
+# - one TitleIndex of TheMealDB meal names: the local mirror's names (reloaded
+#   every SUGGEST_INDEX_TTL seconds) plus every name seen in a search response;
+# - one TitleIndex per user with their recipe titles, built on first use (one
+#   query) and updated after every commit that creates, renames or deletes a
+#   recipe. The least recently used users are dropped once the cached indexes
+#   hold more than SUGGEST_MAX_TITLES titles; SUGGEST_INDEX_TTL bounds how
+#   stale an index can get when another worker process made the change.
+#
+# A lookup completes the last word of the prefix from a sorted vocabulary
+# (bisect), and when that finds few words, also takes vocabulary words whose
+# start is one typo away or shares enough trigrams ("chiken" -> "chicken").
+# Earlier words must be words of the title, corrected the same way when no
+# title has them as typed. Candidates come from the most selective word and are
+# narrowed with set intersections, so a lookup stays well under a millisecond.
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from itertools import chain, islice
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import sharding
+from .models import Recipe, MealDBMeal
+
+MIN_PREFIX = 2
+MAX_SCANNED = 2000    # Titles of the most selective query word considered per lookup...
+MAX_CANDIDATES = 200  # ...and ranked, so common prefixes stay as cheap as rare ones
+MAX_COMPLETIONS = 300 # Vocabulary words a prefix can complete to
+FUZZY_MIN_LENGTH = 3  # Shorter words are only completed, never corrected
+FUZZY_THRESHOLD = 0.5 # Dice similarity of trigram sets
+ONE_EDIT_SCORE = 0.8  # Score of a single typo, whatever the trigrams say (short words lose most of theirs)
+MAX_FUZZY_WORDS = 20  # Closest vocabulary words taken per misspelled word
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """'Crème Brûlée!' -> 'creme brulee'"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD_RE.sub(' ', text).strip()
+
+
+def trigrams(word):
+    # '$' marks the start of the word: typos are rarer there, and it keeps 'ham' away from 'graham'
+    padded = '$' + word
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+def _dice(grams, other):
+    return 2 * len(grams & other) / (len(grams) + len(other))
+
+
+def _one_edit_apart(typed, word, prefix=False):
+    """One letter added, dropped, changed or two swapped ('bef' ~ 'beef'); with prefix, from a start of word."""
+    end = min(len(typed), len(word))
+    i = 0
+    while i < end and typed[i] == word[i]:
+        i += 1
+    if i == len(typed):
+        return prefix or len(word) == i + 1
+    if i == len(word):
+        return len(typed) == i + 1
+
+    def rest_matches(typed_from, word_from):
+        rest = typed[typed_from:]
+        return word.startswith(rest, word_from) if prefix else word[word_from:] == rest
+
+    return (rest_matches(i + 1, i + 1)    # Changed letter
+            or rest_matches(i + 1, i)     # Extra letter
+            or rest_matches(i, i + 1)     # Dropped letter
+            or (i + 1 < end and typed[i] == word[i + 1] and typed[i + 1] == word[i] and rest_matches(i + 2, i + 2)))
+
+
+class TitleIndex:
+    """Titles by key (recipe_id or meal id): a sorted vocabulary, word -> keys and trigram -> words."""
+
+    def __init__(self):
+        self.built_at = time.monotonic()
+        self.titles = {}     # key -> (title, normalized title)
+        self._vocabulary = [] # Sorted distinct words
+        self._keys_of = {}   # word -> set of keys whose title has it
+        self._words_of = {}  # trigram -> set of words
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, key, title):
+        norm = normalize(title)
+        with self._lock:
+            previous = self.titles.get(key)
+            if previous is not None:
+                if previous[0] == title:
+                    return
+                self._unlink(key, previous[1])
+            self.titles[key] = (title, norm)
+            for word in set(norm.split()):
+                keys = self._keys_of.get(word)
+                if keys is None:
+                    keys = self._keys_of[word] = set()
+                    bisect.insort(self._vocabulary, word)
+                    for gram in trigrams(word):
+                        self._words_of.setdefault(gram, set()).add(word)
+                keys.add(key)
+
+    def remove(self, key):
+        with self._lock:
+            previous = self.titles.pop(key, None)
+            if previous is not None:
+                self._unlink(key, previous[1])
+
+    def _unlink(self, key, norm):
+        for word in set(norm.split()):
+            keys = self._keys_of[word]
+            keys.discard(key)
+            if not keys: # Last title with this word: forget the word
+                del self._keys_of[word]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+                for gram in trigrams(word):
+                    words = self._words_of[gram]
+                    words.discard(word)
+                    if not words:
+                        del self._words_of[gram]
+
+    def _completions(self, prefix):
+        """Vocabulary words starting with prefix, shortest first (closest to what was typed)."""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        words = []
+        for word in self._vocabulary[start:start + MAX_COMPLETIONS]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        words.sort(key=len)
+        return words
+
+    def _corrections(self, typed, complete):
+        """{word: similarity} for vocabulary words close to `typed` (to its length when not complete)."""
+        if len(typed) < FUZZY_MIN_LENGTH:
+            return {}
+        grams = trigrams(typed)
+        shared = Counter(word for gram in grams for word in self._words_of.get(gram, ()))
+        # Candidates share half the trigrams, or all but the four a swap of two letters breaks
+        needed = max(1, min(int(len(grams) * FUZZY_THRESHOLD), len(grams) - 4))
+        scores = {}
+        for word, count in shared.most_common():
+            if count < needed:
+                break
+            # A typo adds or drops at most a letter or two
+            if len(word) < len(typed) - 1 or (complete and len(word) > len(typed) + 2):
+                continue
+            if _one_edit_apart(typed, word, prefix=not complete):
+                score = ONE_EDIT_SCORE
+            else: # Compare with the whole word, or with its start while it's being typed
+                score = _dice(grams, trigrams(word if complete else word[:len(typed)]))
+            if score >= FUZZY_THRESHOLD:
+                scores[word] = score
+                if len(scores) >= MAX_FUZZY_WORDS:
+                    break
+        return scores
+
+    def _matches(self, typed, complete):
+        """{word: score} for one query word: 1.0 for exact (or completed) words, the similarity for corrections."""
+        if complete: # A whole word that some title has is taken as meant
+            if typed in self._keys_of:
+                return {typed: 1.0}
+            scores = {}
+        else:
+            scores = dict.fromkeys(self._completions(typed), 1.0)
+        if len(scores) < MAX_FUZZY_WORDS:
+            for word, score in self._corrections(typed, complete).items():
+                scores.setdefault(word, score)
+        return scores
+
+    def lookup(self, query_words, limit):
+        """[(score, starts_title, normalized title, title, key)] of the best matches, best first."""
+        with self._lock:
+            per_word = [self._matches(word, complete=i < len(query_words) - 1) for i, word in enumerate(query_words)]
+            if not all(per_word):
+                return []
+            # Candidates: titles of the most selective query word (best-scoring words first, at most
+            # MAX_SCANNED), narrowed to those that also match every other query word (set intersections)
+            anchor = min(range(len(per_word)), key=lambda i: sum(len(self._keys_of[word]) for word in per_word[i]))
+            words = sorted(per_word[anchor].items(), key=lambda item: (-item[1], len(item[0])))
+            candidates = set(islice(chain.from_iterable(self._keys_of[word] for word, _ in words), MAX_SCANNED))
+            for i, matches in enumerate(per_word):
+                if i != anchor:
+                    candidates = set().union(*(candidates & self._keys_of[word] for word in matches))
+            # Every candidate matches every query word, scoring 1 for words without corrections. With
+            # corrections, its best-scoring matching word counts: set intersections, best words first.
+            exact = sum(1 for matches in per_word if min(matches.values()) == 1.0)
+            scores = dict.fromkeys(islice(candidates, MAX_CANDIDATES), float(exact))
+            for matches in per_word:
+                if min(matches.values()) == 1.0:
+                    continue
+                remaining = set(scores)
+                for word, score in sorted(matches.items(), key=lambda item: -item[1]):
+                    if not remaining:
+                        break
+                    found = remaining & self._keys_of[word]
+                    for key in found:
+                        scores[key] += score
+                    remaining -= found
+            query = ' '.join(query_words)
+            results = []
+            for key, total in scores.items():
+                title, norm = self.titles[key]
+                results.append((total / len(per_word), norm.startswith(query), norm, title, key))
+        results.sort(key=lambda result: (-result[0], not result[1], len(result[2]), result[2]))
+        return results[:limit]
+
+
+class SuggestIndex:
+    """The meal-name index plus an LRU of per-user title indexes."""
+
+    def __init__(self, ttl=60, max_titles=100000, max_meals=20000):
+        self.ttl = ttl
+        self.max_titles = max_titles
+        self.max_meals = max_meals
+        self.meals = TitleIndex()
+        self._meals_loaded_at = None
+        self._users = OrderedDict() # user_id -> TitleIndex, least recently used first
+        self._lock = threading.Lock()
+        # Counters
+        self.lookups = 0
+        self.builds = 0
+        self.evictions = 0
+
+    # --- Meal names ---
+
+    def add_meals(self, meals):
+        """Remember TheMealDB names from a list of {"id", "name"} dicts (e.g. a search response)."""
+        for meal in meals:
+            if len(self.meals) >= self.max_meals and meal["id"] not in self.meals.titles:
+                return
+            self.meals.add(meal["id"], meal["name"])
+
+    def _refresh_meals(self):
+        now = time.monotonic()
+        if self._meals_loaded_at is not None and now - self._meals_loaded_at <= self.ttl:
+            return
+        self._meals_loaded_at = now # Also on failure: don't retry on every keystroke
+        rows = MealDBMeal.query.with_entities(MealDBMeal.meal_id, MealDBMeal.name).limit(self.max_meals).all()
+        self.add_meals({"id": meal_id, "name": name} for meal_id, name in rows)
+
+    # --- Personal titles ---
+
+    def for_user(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+        if index is None or time.monotonic() - index.built_at > self.ttl:
+            index = TitleIndex()
+            with sharding.for_user(user_id):
+                for recipe_id, title in (Recipe.query.with_entities(Recipe.recipe_id, Recipe.title)
+                                         .filter(Recipe.user_id == user_id)):
+                    index.add(recipe_id, title)
+            self.builds += 1
+            with self._lock:
+                self._users[user_id] = index
+                self._users.move_to_end(user_id)
+                self._evict()
+        return index
+
+    def _evict(self):
+        total = sum(len(index) for index in self._users.values())
+        while total > self.max_titles and len(self._users) > 1:
+            _, index = self._users.popitem(last=False)
+            total -= len(index)
+            self.evictions += 1
+
+    def apply(self, changes):
+        """Apply committed [(user_id, recipe_id, title or None for deleted)] to the cached indexes."""
+        with self._lock:
+            indexes = {user_id: self._users.get(user_id) for user_id, _, _ in changes}
+        for user_id, recipe_id, title in changes:
+            index = indexes[user_id]
+            if index is None: # Not cached: built fresh on next use
+                continue
+            if title is None:
+                index.remove(recipe_id)
+            else:
+                index.add(recipe_id, title)
+        with self._lock:
+            self._evict()
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    # --- Lookups ---
+
+    def suggest(self, prefix, user_id=None, limit=8):
+        """Best titles for what the user typed so far: their own recipes first, then TheMealDB meals."""
+        words = normalize(prefix).split()
+        if not words or len(' '.join(words)) < MIN_PREFIX:
+            return []
+        self.lookups += 1
+        self._refresh_meals()
+        results = []
+        if user_id is not None:
+            results += [(score, 0, starts, norm, {"title": title, "source": "recipe", "recipe_id": key})
+                        for score, starts, norm, title, key in self.for_user(user_id).lookup(words, limit)]
+        results += [(score, 1, starts, norm, {"title": title, "source": "mealdb", "meal_id": key})
+                    for score, starts, norm, title, key in self.meals.lookup(words, limit)]
+        results.sort(key=lambda result: (-result[0], result[1], not result[2], len(result[3]), result[3]))
+        seen = set()
+        suggestions = []
+        for _, _, _, norm, suggestion in results:
+            if norm not in seen: # A meal you saved as a recipe shows up once, as your recipe
+                seen.add(norm)
+                suggestions.append(suggestion)
+        return suggestions[:limit]
+
+    def stats(self):
+        with self._lock:
+            user_titles = sum(len(index) for index in self._users.values())
+            users = len(self._users)
+        return {"meal_titles": len(self.meals), "users": users, "user_titles": user_titles,
+                "lookups": self.lookups, "builds": self.builds, "evictions": self.evictions}
+
+
+suggest_index = SuggestIndex()
+
+
+# --- Keeping the per-user indexes in sync ---
+
+def _collect_after_flush(session, flush_context):
+    changes = [(obj.user_id, obj.recipe_id, obj.title) for obj in session.new if isinstance(obj, Recipe)]
+    changes += [(obj.user_id, obj.recipe_id, obj.title) for obj in session.dirty
+                if isinstance(obj, Recipe) and inspect(obj).attrs.title.history.has_changes()]
+    changes += [(obj.user_id, obj.recipe_id, None) for obj in session.deleted if isinstance(obj, Recipe)]
+    if changes:
+        session.info.setdefault('suggest_changes', []).extend(changes)
+
+
+def _apply_after_commit(session):
+    changes = session.info.pop('suggest_changes', None)
+    if changes:
+        suggest_index.apply(changes)
+
+
+def _discard_after_rollback(session):
+    session.info.pop('suggest_changes', None)
+
+
+def init_app(app):
+    suggest_index.ttl = app.config['SUGGEST_INDEX_TTL']
+    suggest_index.max_titles = app.config['SUGGEST_MAX_TITLES']
+    suggest_index.max_meals = app.config['SUGGEST_MAX_MEALS']
+    app.extensions['suggest_index'] = suggest_index # For /metrics
+    if not event.contains(Session, 'after_flush', _collect_after_flush):
+        event.listen(Session, 'after_flush', _collect_after_flush)
+        event.listen(Session, 'after_commit', _apply_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
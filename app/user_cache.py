@@ -0,0 +1,96 @@
+# app/user_cache.py
+# Cache of the logged-in user, so hot paths don't query `users` on every request.
+#
+# Two levels: g.current_user holds the user for the rest of the request, and
+# a small per-process TTL cache keeps it across requests. Cached users are
+# plain CachedUser tuples (never ORM objects), so they are safe to share
+# between threads and sessions. Writes to User rows in this process
+# invalidate the entry right away; `ttl` bounds how stale it can get when
+# another worker process changed the user.
+import threading
+import time
+from collections import namedtuple
+
+from flask import g, session, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import User
+
+CachedUser = namedtuple('CachedUser', ['user_id', 'username', 'email'])
+
+
+class UserCache:
+    """Per-process {user_id: CachedUser} with a TTL. ttl=0 disables it."""
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._users = {}  # user_id -> (stored_at, CachedUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the CachedUser for user_id (one query on a miss), or None if it doesn't exist."""
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._users.get(user_id)
+            if entry and time.monotonic() - entry[0] <= self.ttl:
+                return entry[1]
+        row = (db.session.query(User.user_id, User.username, User.email)
+               .filter(User.user_id == user_id).first())
+        user = CachedUser(*row) if row else None
+        if user:
+            self.set(user)
+        return user
+
+    def set(self, user):
+        if self.ttl <= 0:
+            return
+        if not isinstance(user, CachedUser):
+            user = CachedUser(user.user_id, user.username, user.email)
+        with self._lock:
+            if len(self._users) >= self.max_entries and user.user_id not in self._users:
+                self._users.clear() # Crude but bounded; a refill costs one query per active user
+            self._users[user.user_id] = (time.monotonic(), user)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def current_user():
+    """The logged-in user as a CachedUser, or None. Loaded at most once per request."""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    user = g.get('current_user')
+    if user is None or user.user_id != user_id:
+        user = g.current_user = user_cache.get(user_id)
+    return user
+
+
+def remember(user):
+    """Prime both cache levels with a user we just loaded anyway (e.g. at login)."""
+    user_cache.set(user)
+    g.current_user = CachedUser(user.user_id, user.username, user.email)
+
+
+def _invalidate_after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.user_id is not None:
+            user_cache.invalidate(obj.user_id)
+            if has_app_context(): # Scripts may flush without an app context
+                g.pop('current_user', None)
+
+
+def init_app(app):
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    if not event.contains(Session, 'after_flush', _invalidate_after_flush):
+        event.listen(Session, 'after_flush', _invalidate_after_flush)
@@ -0,0 +1,6 @@
+# asgi.py
+from app.asgi import create_asgi_app
+
+# ASGI entry point, e.g. `uvicorn asgi:application --workers 2` (see app/asgi.py).
+# run.py stays the WSGI entry point.
+application = create_asgi_app()
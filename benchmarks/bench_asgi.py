@@ -0,0 +1,150 @@
+# benchmarks/bench_asgi.py
+# How many concurrent TheMealDB searches one worker holds: today's sync worker
+# (a pool of --threads threads, like gunicorn's gthread) against ASGI mode
+# (uvicorn, one event loop). The MealDB stub answers after --latency seconds and
+# every search is a cache miss. Each server runs in its own process; each level
+# keeps N clients busy for --duration seconds.
+# Needs httpx and uvicorn (pip install httpx uvicorn).
+# Usage: python -m benchmarks.bench_asgi [--latency 0.2] [--threads 8] [--levels 8,32,128,256]
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import socket
+import subprocess
+import sys
+import time
+
+from .common import make_app, percentiles
+from .mealdb_stub import MealDBStub
+
+_queries = itertools.count() # Unique across levels, so no search is ever served from the cache
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve(mode, port, api_base, threads, max_level):
+    """Run one worker in this process until it is killed."""
+    app = make_app(MEALDB_API_BASE=api_base, RATE_LIMIT_SEARCH_RATE=0, PROFILING_ENABLED='false',
+                   MEALDB_READ_TIMEOUT=60, MEALDB_REQUEST_DEADLINE=60, MEALDB_QUEUE_TIMEOUT=60,
+                   MEALDB_QUEUE_SIZE=10000, # Measure capacity, not load shedding
+                   MEALDB_MAX_CONCURRENCY=threads, MEALDB_POOL_SIZE=threads,
+                   MEALDB_ASYNC_MAX_CONCURRENCY=max_level, MEALDB_ASYNC_POOL_SIZE=max_level)
+    if mode == 'asgi':
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+        return
+    # A sync worker: a fixed pool of threads, one request each. HTTP/1.0 (no keep-alive),
+    # so an idle client connection doesn't hold a thread.
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 4096
+        pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING) # No line per request
+    PooledWSGIServer('127.0.0.1', port, app).serve_forever()
+
+
+def wait_until_up(base_url, timeout=30):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/api/auth/status").status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} didn't start")
+
+
+async def run_level(base_url, concurrency, duration):
+    import httpx
+    latencies = []
+    errors = 0
+    # A client (one connection) per user: httpcore scans its whole pool on every request, so
+    # one client with hundreds of connections would be the bottleneck. Built before the clock
+    # starts; verify=False skips loading CA certificates, this is plain HTTP anyway.
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=120, verify=False) for _ in range(concurrency)]
+
+    async def user(client, stop_at):
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                response = await client.get('/api/recipes/search', params={"query": f"miss-{next(_queries)}"})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(client, started + duration) for client in clients))
+    elapsed = time.perf_counter() - started
+    for client in clients:
+        await client.aclose()
+    result = percentiles(latencies) if latencies else {"count": 0}
+    result.update(throughput_rps=round(len(latencies) / elapsed, 1), errors=errors)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds TheMealDB (the stub) takes per call.')
+    parser.add_argument('--threads', type=int, default=8, help='Threads of the sync worker.')
+    parser.add_argument('--levels', default='8,32,128,256', help='Concurrent clients, comma-separated.')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS) # Child process mode
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--api-base', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+    if args.serve:
+        return serve(args.serve, args.port, args.api_base, args.threads, max(levels))
+
+    stub = MealDBStub(latency=args.latency).start()
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode,
+                                   '--port', str(port), '--api-base', stub.api_base,
+                                   '--threads', str(args.threads), '--levels', args.levels])
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_up(base_url)
+            results[mode] = {}
+            for level in levels:
+                stub.max_in_flight = 0
+                result = asyncio.run(run_level(base_url, level, args.duration))
+                result["upstream_max_in_flight"] = stub.max_in_flight # Searches the worker held at once
+                results[mode][level] = result
+        finally:
+            server.terminate()
+            server.wait()
+    stub.stop()
+    print(json.dumps({"latency_s": args.latency, "wsgi_threads": args.threads, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
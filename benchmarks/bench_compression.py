@@ -0,0 +1,54 @@
+# benchmarks/bench_compression.py
+# Size and CPU cost of response compression on real payloads (a 50-row list page,
+# a long recipe, a 5k-recipe export) at several levels, plus the end-to-end
+# latency of GET /api/recipes with and without compression.
+# Usage: python -m benchmarks.bench_compression [--repeat 500]
+import argparse
+import json
+import time
+
+from .common import make_app, create_user, login_as, seed_recipes, time_calls, percentiles
+
+
+def cost(compressor, data, encoding, number=20):
+    started = time.thread_time()
+    for _ in range(number):
+        out = compressor.compress(data, encoding)
+    return {"bytes": len(out), "ratio": round(len(out) / len(data), 3),
+            "cpu_us": round((time.thread_time() - started) / number * 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    from app.compression import Compressor, brotli
+    app = make_app(PASSWORD_HASH_WORKERS=0)
+    user_id = create_user(app)
+    seed_recipes(app, user_id, 5000)
+    client = app.test_client()
+    login_as(client, user_id)
+    identity = {'Accept-Encoding': 'identity'}
+    payloads = {
+        "list_page": client.get('/api/recipes', headers=identity).data,
+        "detail": client.get('/api/recipes/1', headers=identity).data,
+        "export_5k": client.get('/api/recipes/export', headers=identity).data,
+    }
+
+    settings = [('gzip', level) for level in (1, 6, 9)] + ([('br', quality) for quality in (1, 4, 6)] if brotli else [])
+    sizes = {}
+    for name, data in payloads.items():
+        sizes[name] = {"identity_bytes": len(data)}
+        for encoding, level in settings:
+            compressor = Compressor(gzip_level=level, brotli_quality=level)
+            sizes[name][f"{encoding}-{level}"] = cost(compressor, data, encoding)
+
+    latency = {encoding or 'identity': percentiles(time_calls(
+        lambda: client.get('/api/recipes', headers={'Accept-Encoding': encoding}), args.repeat))
+        for encoding in ('', 'gzip') + (('br',) if brotli else ())}
+    print(json.dumps({"payloads": sizes, "list_page_latency": latency}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
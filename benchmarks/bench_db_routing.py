@@ -0,0 +1,113 @@
+# benchmarks/bench_db_routing.py
+# Checks read-replica routing with two SQLite files standing in for a primary and
+# a lagging replica (a snapshot of the primary, then one more row written only to
+# the primary): GETs read the replica, writes and the writer's next reads use the
+# primary, and the pool settings reach the engines. Exits 1 if a check fails.
+# Usage: python -m benchmarks.bench_db_routing
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from .common import make_app, create_user, login_as, seed_recipes
+
+SEEDED = 20
+
+
+class StatementCounter:
+    """SQL statements run on each engine (primary / replica0)."""
+
+    def __init__(self, engines):
+        self.counts = {}
+        for name, engine in engines.items():
+            event.listen(engine, 'before_cursor_execute', self._counter(name))
+
+    def _counter(self, name):
+        def count(*args):
+            self.counts[name] = self.counts.get(name, 0) + 1
+        return count
+
+    def during(self, fn):
+        before = dict(self.counts)
+        result = fn()
+        return result, {name: count - before.get(name, 0) for name, count in self.counts.items()
+                        if count - before.get(name, 0)}
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='flavorfind-replica-')
+    primary, replica = os.path.join(directory, 'primary.db'), os.path.join(directory, 'replica.db')
+    pin_seconds = 1
+    app = make_app(db_path=primary, DATABASE_REPLICA_URLS=f'sqlite:///{replica}', DB_REPLICA_PIN_SECONDS=pin_seconds,
+                   DB_POOL_SIZE=3, DB_MAX_OVERFLOW=2, DB_POOL_PRE_PING='true', USER_CACHE_TTL=0,
+                   PASSWORD_HASH_WORKERS=0)
+    user_id = create_user(app)
+    seed_recipes(app, user_id, SEEDED)
+
+    # "Replication": the replica is a snapshot; then a row lands on the primary only (lag)
+    with sqlite3.connect(primary) as source, sqlite3.connect(replica) as target:
+        source.backup(target)
+    with sqlite3.connect(primary) as conn:
+        conn.execute("INSERT INTO recipes (user_id, title, ingredients, instructions, created_at, updated_at) "
+                     "VALUES (?, 'Not replicated yet', 'x', 'y', datetime('now'), datetime('now'))", (user_id,))
+
+    from app import db
+    checks = {}
+    results = {}
+    with app.app_context():
+        engines = {'primary': db.engine, 'replica0': db.engines['replica0']}
+        checks["pool_size reaches the primary"] = db.engine.pool.size() == 3
+        checks["pool options reach the replica"] = (engines['replica0'].pool.size() == 3
+                                                    and engines['replica0'].pool._pre_ping)
+    counter = StatementCounter(engines)
+
+    writer = app.test_client()
+    login_as(writer, user_id)
+    reader = app.test_client()
+    login_as(reader, user_id)
+
+    listed, used = counter.during(lambda: writer.get('/api/recipes'))
+    results["GET /api/recipes"] = used
+    checks["GET reads the replica"] = len(listed.json) == SEEDED and 'primary' not in used
+    _, used = counter.during(lambda: writer.get('/api/auth/status'))
+    results["GET /api/auth/status"] = used
+    checks["auth status reads the replica"] = 'primary' not in used
+
+    created, used = counter.during(lambda: writer.post('/api/recipes', json={
+        "title": "Fresh", "ingredients": "a", "instructions": "b"}))
+    results["POST /api/recipes"] = used
+    checks["writes go to the primary"] = created.status_code == 201 and 'replica0' not in used
+    checks["a write sets the pin cookie"] = 'db_primary_until' in created.headers.get('Set-Cookie', '')
+    new_id = created.json["recipe"]["recipe_id"]
+
+    listed, used = counter.during(lambda: writer.get('/api/recipes'))
+    results["GET /api/recipes (writer, pinned)"] = used
+    checks["the writer reads its own write"] = (len(listed.json) == SEEDED + 2 and 'replica0' not in used
+                                                and writer.get(f'/api/recipes/{new_id}').status_code == 200)
+    listed = reader.get('/api/recipes')
+    checks["other clients still read the replica"] = (len(listed.json) == SEEDED
+                                                      and reader.get(f'/api/recipes/{new_id}').status_code == 404)
+
+    time.sleep(pin_seconds + 0.1)
+    listed, used = counter.during(lambda: writer.get('/api/recipes'))
+    checks["the pin expires"] = len(listed.json) == SEEDED and 'primary' not in used
+
+    _, used = counter.during(lambda: app.test_client().post(
+        '/api/auth/login', json={"identifier": "bench", "password": "password"}))
+    results["POST /api/auth/login"] = used
+    checks["login reads the primary"] = 'replica0' not in used
+    results["routing"] = app.extensions['db_routing'].stats()
+
+    print(json.dumps({"statements": results, "checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# benchmarks/bench_fulltext.py
+# Latency of GET /api/recipes?q=... as one user's recipe count grows.
+# Usage: python -m benchmarks.bench_fulltext [--sizes 1000,10000,30000] [--repeat 200]
+import argparse
+import json
+from urllib.parse import quote
+
+from .common import make_app, create_user, login_as, seed_recipes, time_calls, percentiles
+
+QUERIES = {
+    "rare term": "#123",             # Matches almost nothing
+    "two terms": "crispy salmon",
+    "common term": "chicken",        # In ~20% of recipes
+    "title + ingredient": "golden garlic lemon",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,30000')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(',')]:
+        app = make_app()
+        user_id = create_user(app)
+        seed_recipes(app, user_id, size)
+        client = app.test_client()
+        login_as(client, user_id)
+
+        results[size] = {}
+        for label, text in QUERIES.items():
+            url = f'/api/recipes?q={quote(text)}&per_page=20'
+            client.get(url) # Warm up
+            results[size][label] = percentiles(time_calls(lambda: client.get(url), args.repeat))
+            print(f"{size:>7} recipes  {label:<20} {results[size][label]}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
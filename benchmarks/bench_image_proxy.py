@@ -0,0 +1,145 @@
+# benchmarks/bench_image_proxy.py
+# Checks and times the /img proxy against a local image host (benchmarks/image_stub.py):
+# each source is fetched once, warm hits and 304s skip the source entirely, bad
+# signatures and private addresses (also via DNS rebinding) are refused, and the disk cache stays under its limit.
+# Exits 1 if a check fails.
+# Usage: python -m benchmarks.bench_image_proxy [--repeat 200] [--latency 0.05]
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+from .common import make_app, create_user, login_as, time_calls, percentiles
+from .image_stub import ImageStub
+from .mealdb_stub import MealDBStub, make_catalog
+
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def rebinding_refused(images):
+    """A host that resolves to a public address for the check, then to the image host (127.0.0.1)."""
+    from unittest import mock
+    from app.image_proxy import ImageStore, ImageFetchError
+    real_getaddrinfo = socket.getaddrinfo
+    answers = iter(['93.184.215.14'])
+
+    def rebinding(host, port, *args, **kwargs):
+        if host == 'rebind.example':
+            return real_getaddrinfo(next(answers, '127.0.0.1'), port, *args, **kwargs)
+        return real_getaddrinfo(host, port, *args, **kwargs)
+
+    store = ImageStore(tempfile.mkdtemp(prefix='flavorfind-images-'), max_bytes=1 << 20)
+    url = images.url('rebind.png').replace('127.0.0.1', 'rebind.example')
+    with mock.patch('socket.getaddrinfo', rebinding):
+        try:
+            store.get(url, 'thumb')
+        except ImageFetchError as e:
+            return e.blocked and images.hits['/rebind.png'] == 0 # Refused before any request went out
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the image host takes per request.')
+    args = parser.parse_args()
+
+    images = ImageStub(latency=args.latency).start()
+    catalog = make_catalog(20)
+    for i, meal in enumerate(catalog):
+        meal["strMealThumb"] = images.url(f'meal-{i}.png')
+    mealdb = MealDBStub(catalog=catalog).start()
+    cache_dir = tempfile.mkdtemp(prefix='flavorfind-images-')
+    app = make_app(MEALDB_API_BASE=mealdb.api_base, IMAGE_CACHE_DIR=cache_dir, IMAGE_CACHE_MAX_BYTES=256 * 1024 * 1024,
+                   IMAGE_PROXY_ALLOW_PRIVATE='true', RATE_LIMIT_SEARCH_RATE=0, PASSWORD_HASH_WORKERS=0)
+    client = app.test_client()
+    checks = {}
+    results = {"source_bytes": len(images._image)}
+
+    # Search results carry proxied thumbnails
+    meals = client.get('/api/recipes/search?query=a').json
+    checks["search returns /img thumbnails"] = bool(meals) and all(m["thumbnail_url"].startswith('/img/thumb/')
+                                                                    for m in meals)
+    thumb = meals[0]["thumbnail_url"]
+
+    # Cold: fetched from the source and resized; then served from disk
+    first = client.get(thumb)
+    checks["cold request 200"] = first.status_code == 200
+    results["thumbnail_bytes"] = len(first.data)
+    results["thumbnail_type"] = first.mimetype
+    checks["long-lived Cache-Control"] = 'immutable' in first.headers.get('Cache-Control', '')
+    cold_urls = [m["thumbnail_url"] for m in meals[1:]]
+    results["cold"] = percentiles(time_calls(lambda: client.get(cold_urls.pop()), len(cold_urls)))
+    results["warm"] = percentiles(time_calls(lambda: client.get(thumb), args.repeat))
+    etag = first.headers['ETag']
+    results["revalidate_304"] = percentiles(time_calls(
+        lambda: client.get(thumb, headers={'If-None-Match': etag}), args.repeat))
+    checks["If-None-Match gives 304"] = client.get(thumb, headers={'If-None-Match': etag}).status_code == 304
+    checks["each source fetched once"] = all(count == 1 for path, count in images.hits.items()
+                                              if path.startswith('/meal-'))
+
+    # Same picture behind another URL (a redirect): fetched again, but stored once (content-addressed)
+    from app.image_proxy import thumbnail_url
+    with app.test_request_context():
+        redirected = thumbnail_url(images.url('redirect/meal-0.png'))
+        private = thumbnail_url('http://127.0.0.1:1/x.png')
+        missing = thumbnail_url(images.url('missing.png'))
+        not_image = thumbnail_url(images.url('page.html'))
+    checks["redirect followed"] = client.get(redirected).status_code == 200
+    store = app.extensions['image_store']
+    checks["same image stored once"] = (store._read_source(images.url('redirect/meal-0.png'))
+                                        == store._read_source(images.url('meal-0.png')))
+
+    # Refusals and fallbacks
+    tampered = thumb.replace('/thumb/', '/thumb/x', 1)
+    checks["bad signature 404"] = client.get(tampered).status_code == 404
+    checks["unknown size 404"] = client.get(thumb.replace('/thumb/', '/huge/', 1)).status_code == 404
+    checks["missing source falls back to 302"] = client.get(missing).status_code == 302
+    checks["non-image falls back to 302"] = client.get(not_image).status_code == 302
+    store.allow_private = False
+    checks["private address refused"] = client.get(private).status_code == 404
+    store.allow_private = True
+    checks["DNS rebinding refused"] = rebinding_refused(images)
+    from app.admission import ConcurrencyLimiter
+    limiters = app.extensions['limiters']
+    limiters['images'], saved = ConcurrencyLimiter(0), limiters['images'] # Every miss is shed
+    with app.test_request_context():
+        busy = thumbnail_url(images.url('busy.png'))
+    checks["miss over the fetch limit redirects to the source"] = client.get(busy).status_code == 302
+    checks["hit ignores the fetch limit"] = client.get(thumb).status_code == 200
+    limiters['images'] = saved
+
+    # Personal recipes list too
+    user_id = create_user(app)
+    login_as(client, user_id)
+    client.post('/api/recipes', json={"title": "Soup", "ingredients": "water", "instructions": "boil",
+                                      "image_url": images.url('soup.png')})
+    listed = client.get('/api/recipes').json
+    checks["list returns /img thumbnails"] = listed[0]["thumbnail_url"].startswith('/img/thumb/')
+
+    # Eviction keeps the directory under IMAGE_CACHE_MAX_BYTES (shrunk to about one original here)
+    max_bytes = store.max_bytes = 4 * 1024 * 1024
+    with app.test_request_context():
+        many = [thumbnail_url(images.url(f'extra-{i}.png')) for i in range(12)]
+    for url in many:
+        client.get(url)
+    results["cache_dir_bytes"] = dir_bytes(cache_dir)
+    results["store"] = store.stats()
+    checks["cache stays under IMAGE_CACHE_MAX_BYTES"] = results["cache_dir_bytes"] <= max_bytes
+    checks["evicted entries are fetched again"] = client.get(many[0]).status_code == 200
+
+    images.stop()
+    mealdb.stop()
+    print(json.dumps({"results": results, "checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/bench_import.py
+# Bulk import vs. one POST /api/recipes per recipe, and export throughput.
+# Usage: python -m benchmarks.bench_import [--count 2000]
+import argparse
+import json
+import random
+import time
+
+from .common import make_app, create_user, login_as, fake_recipe
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    recipes = [fake_recipe(rng, None) for _ in range(args.count)]
+    for recipe in recipes:
+        del recipe['user_id']
+    results = {"recipes": args.count}
+
+    app = make_app()
+    client = app.test_client()
+    login_as(client, create_user(app))
+    started = time.perf_counter()
+    for recipe in recipes:
+        assert client.post('/api/recipes', json=recipe).status_code == 201
+    results["one_by_one_s"] = round(time.perf_counter() - started, 3)
+
+    app = make_app()
+    client = app.test_client()
+    login_as(client, create_user(app))
+    body = '\n'.join(json.dumps(recipe) for recipe in recipes)
+    started = time.perf_counter()
+    response = client.post('/api/recipes/import', data=body, content_type='application/x-ndjson')
+    results["bulk_import_s"] = round(time.perf_counter() - started, 3)
+    assert response.json["imported"] == args.count, response.json
+    results["speedup"] = round(results["one_by_one_s"] / results["bulk_import_s"], 1)
+
+    started = time.perf_counter()
+    lines = sum(1 for line in client.get('/api/recipes/export').response if line.strip())
+    results["export_s"] = round(time.perf_counter() - started, 3)
+    assert lines == args.count
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_metrics.py
+# Overhead of the /metrics instrumentation on a hot endpoint (GET /api/recipes/<id>, 1 SQL statement),
+# end to end and as the direct cost of the hooks.
+# Usage: python -m benchmarks.bench_metrics [--repeat 3000]
+import argparse
+import json
+import timeit
+
+from .common import make_app, create_user, login_as, seed_recipes, time_calls, percentiles
+
+
+def run(enabled, repeat):
+    app = make_app(METRICS_ENABLED=str(enabled).lower(), PASSWORD_HASH_WORKERS=0)
+    user_id = create_user(app)
+    seed_recipes(app, user_id, 10)
+    client = app.test_client()
+    login_as(client, user_id)
+    client.get('/api/recipes/1') # Warm up (user cache, connection)
+    return percentiles(time_calls(lambda: client.get('/api/recipes/1'), repeat))
+
+
+def hook_cost_us(app, number=100000):
+    """Direct cost of one request's instrumentation: request hooks plus one SQL statement's events."""
+    from app import metrics
+
+    class FakeConnection:
+        info = {}
+
+    connection = FakeConnection()
+    with app.test_request_context('/api/recipes/1'):
+        response = app.response_class('')
+
+        def one_request():
+            metrics._before_request()
+            metrics._before_cursor_execute(connection, None, '', None, None, False)
+            metrics._after_cursor_execute(connection, None, '', None, None, False)
+            metrics._after_request(response)
+
+        return round(timeit.timeit(one_request, number=number) / number * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3000)
+    args = parser.parse_args()
+
+    # "off" runs first: the SQLAlchemy engine listeners stay registered for the rest of the process
+    off = run(False, args.repeat)
+    on = run(True, args.repeat)
+    app = make_app(PASSWORD_HASH_WORKERS=0)
+    print(json.dumps({
+        "hook_cost_us_per_request": hook_cost_us(app),
+        "metrics_off": off,
+        "metrics_on": on,
+        "overhead_us_p50": round((on["p50_ms"] - off["p50_ms"]) * 1000, 1), # Within noise; see hook_cost_us_per_request
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
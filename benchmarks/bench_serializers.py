@@ -0,0 +1,64 @@
+# benchmarks/bench_serializers.py
+# Serializing a 10k-recipe list: the old hand-built dicts + stdlib jsonify vs. app/serializers.py
+# with the app's JSON provider (orjson if installed, and the stdlib fallback).
+# Usage: python -m benchmarks.bench_serializers [--count 10000] [--repeat 20]
+import argparse
+import datetime
+import json
+import random
+
+from flask.json.provider import DefaultJSONProvider
+
+from .common import make_app, fake_recipe, time_calls, percentiles
+
+
+def hand_built(recipes):
+    # What the routes did before app/serializers.py
+    return [{
+        "recipe_id": recipe.recipe_id,
+        "title": recipe.title,
+        "description": recipe.description,
+        "image_url": recipe.image_url,
+        "created_at": recipe.created_at.isoformat(),
+        "updated_at": recipe.updated_at.isoformat()
+    } for recipe in recipes]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    from app.models import Recipe
+    from app.serializers import recipe_summary
+    from app.json_provider import JSONProvider
+
+    rng = random.Random(42)
+    now = datetime.datetime(2025, 1, 1, 12, 30, 15, 123456)
+    recipes = [Recipe(recipe_id=i, created_at=now, updated_at=now, **fake_recipe(rng, 1)) for i in range(args.count)]
+
+    old_provider = DefaultJSONProvider(app)
+    stdlib_provider = JSONProvider(app, use_orjson=False)
+    fast_provider = JSONProvider(app)
+    # Same separators response() uses outside debug mode
+    compact = {"separators": (",", ":")}
+
+    assert json.loads(old_provider.dumps(hand_built(recipes[:50]), **compact)) == \
+        json.loads(fast_provider.dumps(recipe_summary.many(recipes[:50])))
+
+    with app.test_request_context():
+        results = {
+            "before (hand-built dicts + json)": percentiles(time_calls(
+                lambda: old_provider.dumps(hand_built(recipes), **compact), args.repeat)),
+            "serializers + json": percentiles(time_calls(
+                lambda: stdlib_provider.response(recipe_summary.many(recipes)), args.repeat)),
+            f"serializers + {fast_provider.backend}": percentiles(time_calls(
+                lambda: fast_provider.response(recipe_summary.many(recipes)), args.repeat)),
+        }
+    print(json.dumps({"recipes": args.count, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/bench_sharding.py
+# Checks recipe sharding with three SQLite files (the primary plus two shards):
+# new users spread over the shards, every recipe and index row lands on its
+# user's shard, the recipe endpoints work unchanged, and `flask shards move` /
+# `rebalance` move users without changing what the API returns.
+# Also prints the SQL statements per shard for a warm GET /api/recipes.
+# Exits 1 if a check fails.
+# Usage: python -m benchmarks.bench_sharding
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+from sqlalchemy import event
+
+from .common import make_app, create_user, login_as, seed_recipes
+
+SIZES = {'ana': 30, 'ben': 60, 'cho': 150}
+
+
+def rows_per_shard(paths, table):
+    """{shard: {user_id: rows}} read straight from the SQLite files."""
+    result = {}
+    for key, path in paths.items():
+        with sqlite3.connect(path) as conn:
+            result[key] = dict(conn.execute(f"SELECT user_id, count(*) FROM {table} GROUP BY user_id").fetchall())
+    return result
+
+
+def api_view(app, user_id, username):
+    """What the API shows one user: list ids, a search, a pantry match and the export."""
+    client = app.test_client()
+    login_as(client, user_id, username)
+    listed = client.get('/api/recipes?limit=200').json
+    return {
+        "ids": sorted(recipe["recipe_id"] for recipe in listed),
+        "search": [recipe["recipe_id"] for recipe in client.get('/api/recipes?q=chicken garlic').json],
+        "pantry": [match["recipe_id"] for match in
+                   client.get('/api/recipes/pantry-match?ingredients=chicken,garlic,onion').json],
+        "export": len(client.get('/api/recipes/export').data.splitlines()),
+    }
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix='flavorfind-shards-')
+    paths = {key: os.path.join(directory, f'{key}.db') for key in ('primary', 'shard1', 'shard2')}
+    app = make_app(db_path=paths['primary'], PASSWORD_HASH_WORKERS=0,
+                   DATABASE_SHARD_URLS=f"sqlite:///{paths['shard1']},sqlite:///{paths['shard2']}")
+    cli = app.test_cli_runner()
+    checks = {}
+    result = cli.invoke(args=['shards', 'init'])
+    checks["shards init"] = result.exit_code == 0
+
+    users = {name: create_user(app, name) for name in SIZES}
+    for seed, (name, count) in enumerate(SIZES.items()):
+        seed_recipes(app, users[name], count, seed=seed)
+
+    from app import db
+    from app.models import UserShard
+    with app.app_context():
+        placement = dict(db.session.query(UserShard.user_id, UserShard.shard))
+    checks["new users spread over the shards"] = sorted(placement.values()) == sorted(paths)
+
+    def stored_where_directory_says():
+        placed = {key: {user_id for user_id, shard in placement.items() if shard == key} for key in paths}
+        return all(set(users_there) == placed[key]
+                   for table in ('recipes', 'recipe_search_terms', 'recipe_ingredients')
+                   for key, users_there in rows_per_shard(paths, table).items())
+
+    checks["rows live only on their user's shard"] = stored_where_directory_says()
+    ids = []
+    for path in paths.values():
+        with sqlite3.connect(path) as conn:
+            ids += [recipe_id for (recipe_id,) in conn.execute("SELECT recipe_id FROM recipes")]
+    checks["recipe ids are unique across shards"] = len(ids) == len(set(ids)) == sum(SIZES.values())
+
+    before = {name: api_view(app, users[name], name) for name in SIZES}
+    checks["endpoints see each user's recipes"] = all(
+        len(view["ids"]) == SIZES[name] and view["export"] == SIZES[name] and view["search"] and view["pantry"]
+        for name, view in before.items())
+
+    ana = app.test_client()
+    login_as(ana, users['ana'], 'ana')
+    created = ana.post('/api/recipes', json={"title": "Shard soup", "ingredients": "2 leeks", "instructions": "Simmer"})
+    new_id = created.json["recipe"]["recipe_id"]
+    updated = ana.put(f'/api/recipes/{new_id}', json={"title": "Shard stew", "ingredients": "2 leeks",
+                                                       "instructions": "Simmer"})
+    found = ana.get('/api/recipes?q=stew').json
+    deleted = ana.delete(f'/api/recipes/{new_id}')
+    checks["create, update, search and delete"] = (
+        created.status_code == 201 and updated.status_code == 200 and deleted.status_code == 200
+        and [recipe["recipe_id"] for recipe in found] == [new_id]
+        and ana.get(f'/api/recipes/{new_id}').status_code == 404)
+    checks["other users' recipe ids stay 404"] = ana.get(f"/api/recipes/{before['cho']['ids'][0]}").status_code == 404
+
+    # Statements per database for a warm list request (directory and user cached) of a user off the primary
+    name = next(name for name in SIZES if placement[users[name]] != 'primary')
+    client = app.test_client()
+    login_as(client, users[name], name)
+    with app.app_context():
+        engines = {key: db.engines[None if key == 'primary' else key] for key in paths}
+    statements = {}
+    for key, engine in engines.items():
+        event.listen(engine, 'before_cursor_execute',
+                     lambda *args, key=key: statements.__setitem__(key, statements.get(key, 0) + 1))
+    client.get('/api/recipes')
+    statements.clear()
+    client.get('/api/recipes?limit=20')
+    warm_statements = dict(statements)
+    checks["a warm list request only queries the user's shard"] = list(warm_statements) == [placement[users[name]]]
+
+    # Move ana next to cho, then let rebalance even the shards out again
+    cho_shard = placement[users['cho']]
+    result = cli.invoke(args=['shards', 'move', str(users['ana']), cho_shard, '--no-wait'])
+    with app.app_context():
+        placement = dict(db.session.query(UserShard.user_id, UserShard.shard))
+    checks["shards move"] = result.exit_code == 0 and placement[users['ana']] == cho_shard
+    checks["rows moved with the user"] = stored_where_directory_says()
+    checks["the API is unchanged after a move"] = api_view(app, users['ana'], 'ana') == before['ana']
+
+    result = cli.invoke(args=['shards', 'rebalance', '--no-wait'])
+    with app.app_context():
+        placement = dict(db.session.query(UserShard.user_id, UserShard.shard))
+    loads = {key: sum(rows_per_shard(paths, 'recipes')[key].values()) for key in paths}
+    checks["shards rebalance"] = result.exit_code == 0 and stored_where_directory_says()
+    checks["rebalanced: no shard holds two users"] = len(set(placement.values())) == len(SIZES)
+    checks["the API is unchanged after rebalancing"] = all(
+        api_view(app, users[name], name) == view for name, view in before.items())
+
+    reindexed = cli.invoke(args=['recipes', 'reindex'])
+    checks["recipes reindex covers every shard"] = f"Indexed {sum(SIZES.values())} recipes" in reindexed.output
+
+    print(json.dumps({"warm_list_statements": warm_statements, "recipes_per_shard": loads,
+                      "sharding": app.extensions['sharding'].stats(), "rebalance_output": result.output.splitlines(),
+                      "checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
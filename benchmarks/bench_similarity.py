@@ -0,0 +1,142 @@
+# benchmarks/bench_similarity.py
+# "Similar recipes" (app/similarity.py) at 100k recipes: corpus build time and
+# memory, single and batched top-k query latency, incremental updates
+# (including compactions), and GET /api/recipes/<id>/similar end to end.
+# Checks the top k against a plain-Python cosine over every recipe and that
+# updates show up without a rebuild. Needs numpy and scipy.
+# Exits 1 if a check fails.
+# Usage: python -m benchmarks.bench_similarity [--recipes 100000] [--repeat 300]
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from .common import FOODS, make_app, create_user, login_as, time_calls, percentiles
+
+SUFFIXES = ['', ' breast', ' thigh', ' stock', ' sauce', ' powder', ' paste', ' oil', ' leaf', ' seed']
+
+
+def make_ingredients(rng, size):
+    """Ingredient names, most common first: the benchmark's foods plus made-up ones and variants."""
+    names = list(FOODS)
+    while len(names) < size:
+        names.append(rng.choice(FOODS + [f'spice{i}' for i in range(size // 4)]) + rng.choice(SUFFIXES))
+    return list(dict.fromkeys(names))
+
+
+def make_recipes(rng, names, count):
+    weights = [1 / rank ** 0.8 for rank in range(1, len(names) + 1)]
+    return [set(rng.choices(names, weights, k=rng.randint(5, 15))) for _ in range(count)]
+
+
+def brute_force(query_terms, recipes, k):
+    """Top k by cosine over every recipe, one Python loop per recipe (the slow way, for checking)."""
+    from app.similarity import ingredient_terms
+    documents = [ingredient_terms(names) for names in recipes]
+    df = {}
+    for terms in documents:
+        for term in terms:
+            df[term] = df.get(term, 0) + 1
+    idf = {term: math.log((1 + len(documents)) / (1 + count)) + 1 for term, count in df.items()}
+    query_norm = math.sqrt(sum(idf[term] ** 2 for term in query_terms))
+    scored = []
+    for key, terms in enumerate(documents):
+        dot = sum(idf[term] ** 2 for term in terms & query_terms)
+        if dot:
+            scored.append((dot / math.sqrt(sum(idf[term] ** 2 for term in terms)) / query_norm, key))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=64)
+    args = parser.parse_args()
+
+    from app import similarity
+    if not similarity.available():
+        print("numpy and scipy are needed: pip install numpy scipy", file=sys.stderr)
+        sys.exit(1)
+    from app.similarity import Corpus, SimilarityIndex, ingredient_terms
+
+    rng = random.Random(42)
+    names = make_ingredients(rng, 2000)
+    recipes = make_recipes(rng, names, args.recipes)
+
+    index = SimilarityIndex()
+    index._meals_loaded_at = float('inf') # No database here: the meal corpus stays empty
+    index.meals = Corpus()
+    tracemalloc.start()
+    started = time.perf_counter()
+    corpus = Corpus()
+    corpus.load((key, f'Recipe {key}', index.vocabulary.lookup(ingredient_terms(found)))
+                for key, found in enumerate(recipes))
+    build_seconds = time.perf_counter() - started
+    memory_mb = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    index._users[1] = corpus
+
+    def random_query():
+        return corpus.columns_of(rng.randrange(len(recipes) // 2)) # Never one of the keys removed below
+
+    index.similar([random_query()], user_id=1) # Norms cached from here on
+    single = percentiles(time_calls(lambda: index.similar([random_query()], user_id=1, k=10), args.repeat))
+    batches = [[random_query() for _ in range(args.batch)] for _ in range(max(1, args.repeat // args.batch))]
+    pending = iter(batches)
+    batched = percentiles(time_calls(lambda: index.similar(next(pending), user_id=1, k=10), len(batches)))
+    print(f"single query  {single}")
+    print(f"batch of {args.batch:<4} {batched}")
+
+    checks = {}
+    agree = 0
+    for key in rng.sample(range(len(recipes)), 5):
+        [found] = index.similar([corpus.columns_of(key)], user_id=1, k=10)
+        expected = brute_force(ingredient_terms(recipes[key]), recipes, 10)
+        agree += all(abs(result["score"] - round(score, 4)) < 1e-3 for result, (score, _) in zip(found, expected))
+    checks["top 10 match a plain cosine over every recipe"] = agree == 5
+
+    # Incremental updates: change and delete recipes, timing each (compactions included)
+    changed = iter(range(len(recipes)))
+    updates = {"set": percentiles(time_calls(lambda: corpus.set(next(changed), 'Changed', index.vocabulary.lookup(
+        ingredient_terms(rng.choice(recipes)))), 2000))}
+    removed = iter(range(len(recipes) - 1, 0, -1))
+    updates["remove"] = percentiles(time_calls(lambda: corpus.remove(next(removed)), 2000))
+    started = time.perf_counter()
+    corpus._compact()
+    updates["compaction_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    probe = len(recipes) // 2
+    corpus.set(probe, 'Probe', index.vocabulary.lookup({'probe-only ingredient', 'chicken'}))
+    [found] = index.similar([index.vocabulary.lookup({'probe-only ingredient'})], user_id=1, k=1)
+    corpus.remove(probe)
+    [gone] = index.similar([index.vocabulary.lookup({'probe-only ingredient'})], user_id=1, k=1)
+    checks["updates show up without a rebuild"] = [r["recipe_id"] for r in found] == [probe] and not gone
+    single_after = percentiles(time_calls(lambda: index.similar([random_query()], user_id=1, k=10), args.repeat))
+
+    # End to end, with the corpus injected for a logged-in user (not built from 100k rows)
+    app = make_app(PASSWORD_HASH_WORKERS=0, SIMILAR_INDEX_TTL=3600, SIMILAR_MAX_RECIPES=args.recipes * 2)
+    user_id = create_user(app)
+    similarity.similarity_index._users[user_id] = corpus
+    similarity.similarity_index.vocabulary = index.vocabulary
+    client = app.test_client()
+    login_as(client, user_id)
+    client.get('/api/recipes/1/similar')
+    ids = iter(rng.randrange(1, len(recipes) // 2) for _ in range(args.repeat))
+    endpoint = percentiles(time_calls(lambda: client.get(f'/api/recipes/{next(ids)}/similar?limit=10'), args.repeat))
+
+    print(json.dumps({"recipes": len(recipes), "terms": len(index.vocabulary), "build_s": round(build_seconds, 2),
+                      "memory_mb": round(memory_mb, 1), "single_query": single,
+                      f"batch_of_{args.batch}": batched, "single_query_after_updates": single_after,
+                      "updates": updates, "endpoint": endpoint, "checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# benchmarks/bench_suggest.py
+# Title autocomplete (app/suggest_index.py) at 100k titles: build time and memory,
+# lookup latency for short and long prefixes, several words and typos, how often
+# a misspelled title still comes back in the top 8, incremental updates, and
+# GET /api/recipes/suggest end to end.
+# Exits 1 if the p95 lookup is over 1 ms or typo recall drops below 90%.
+# Usage: python -m benchmarks.bench_suggest [--titles 100000] [--repeat 2000]
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from urllib.parse import quote
+
+from .common import FOODS, WORDS, make_app, create_user, login_as, time_calls, percentiles
+
+SYLLABLES = [c + v for c in 'bcdfghklmnprstvz' for v in 'aeiou']
+
+
+def make_vocabulary(rng, size):
+    """Recipe-ish words plus made-up ones, most common first (titles pick them Zipf-style)."""
+    words = list(dict.fromkeys(FOODS + WORDS))
+    while len(words) < size:
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        if word not in words:
+            words.append(word)
+    return words
+
+
+def make_titles(rng, vocabulary, count):
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    return [' '.join(rng.choices(vocabulary, weights, k=rng.randint(2, 5))).capitalize() for _ in range(count)]
+
+
+def typo(rng, word):
+    """One random edit: drop, double, swap or change a letter (never the first one)."""
+    i = rng.randrange(1, len(word))
+    kind = rng.choice(('drop', 'double', 'swap', 'change'))
+    if kind == 'drop':
+        return word[:i] + word[i + 1:]
+    if kind == 'double':
+        return word[:i] + word[i] + word[i:]
+    if kind == 'swap' and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice([c for c in 'aeioulnrst' if c != word[i]]) + word[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    from app.suggest_index import TitleIndex, normalize
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng, 5000)
+    titles = make_titles(rng, vocabulary, args.titles)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = TitleIndex()
+    for key, title in enumerate(titles):
+        index.add(key, title)
+    build_seconds = time.perf_counter() - started
+    memory_mb = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+
+    def sample_queries(make_query):
+        return [make_query(normalize(rng.choice(titles)).split()) for _ in range(args.repeat)]
+
+    queries = {
+        "2 letters": sample_queries(lambda words: [words[0][:2]]),
+        "4 letters": sample_queries(lambda words: [words[0][:4]]),
+        "word + 3 letters": sample_queries(lambda words: [words[0], words[1][:3]]),
+        "3 words": sample_queries(lambda words: words[:2] + [words[-1][:3]]),
+        "typo, first word": sample_queries(lambda words: [typo(rng, words[0]) if len(words[0]) > 3 else words[0]]),
+        "typo + 3 letters": sample_queries(
+            lambda words: [typo(rng, words[0]) if len(words[0]) > 3 else words[0], words[1][:3]]),
+    }
+    lookups = {}
+    for label, batch in queries.items():
+        pending = iter(batch * 2)
+        lookups[label] = percentiles(time_calls(lambda: index.lookup(next(pending), 8), len(batch)))
+        print(f"{label:<20} {lookups[label]}")
+
+    # Recall: misspell one word of a whole title (4+ letters) and look for that exact title in the top 8
+    found = tried = 0
+    for _ in range(500):
+        key = rng.randrange(len(titles))
+        words = normalize(titles[key]).split()
+        long_words = [i for i, word in enumerate(words) if len(word) > 3]
+        if not long_words:
+            continue
+        i = rng.choice(long_words)
+        words[i] = typo(rng, words[i])
+        tried += 1
+        # Titles are random, so the same words may make several; any title with the same words counts
+        expected = ' '.join(sorted(normalize(titles[key]).split()))
+        found += any(' '.join(sorted(norm.split())) == expected for _, _, norm, _, _ in index.lookup(words, 8))
+    recall = found / tried
+
+    # Incremental updates: add a title, rename it, remove it
+    next_key = iter(range(len(titles), len(titles) * 2))
+    updates = {
+        "add": percentiles(time_calls(lambda: index.add(next(next_key), rng.choice(titles)), 1000)),
+        "rename": percentiles(time_calls(lambda: index.add(rng.randrange(len(titles)), rng.choice(titles)), 1000)),
+    }
+    removable = iter(range(len(titles), len(titles) + 1000))
+    updates["remove"] = percentiles(time_calls(lambda: index.remove(next(removable)), 1000))
+
+    # End to end: a logged-in user with every title as a recipe (the index is injected, not built from 100k rows)
+    app = make_app(PASSWORD_HASH_WORKERS=0, SUGGEST_INDEX_TTL=3600)
+    user_id = create_user(app)
+    from app.suggest_index import suggest_index
+    suggest_index.max_titles = len(index)
+    suggest_index._users[user_id] = index
+    suggest_index.add_meals({"id": str(key), "name": title} for key, title in enumerate(titles[:500]))
+    client = app.test_client()
+    login_as(client, user_id)
+    urls = iter([f"/api/recipes/suggest?prefix={quote(' '.join(query))}" for query in queries["word + 3 letters"]] * 2)
+    endpoint = percentiles(time_calls(lambda: client.get(next(urls)), args.repeat))
+
+    worst_p95 = max(result["p95_ms"] for result in lookups.values())
+    checks = {
+        "p95 lookup under 1 ms": worst_p95 < 1,
+        "typo recall at least 90%": recall >= 0.9,
+    }
+    print(json.dumps({"titles": len(titles), "vocabulary": len(vocabulary), "build_s": round(build_seconds, 2),
+                      "memory_mb": round(memory_mb, 1), "lookups": lookups, "typo_recall": round(recall, 3),
+                      "updates": updates, "endpoint": endpoint, "stats": suggest_index.stats(),
+                      "checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
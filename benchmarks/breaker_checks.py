@@ -0,0 +1,94 @@
+# benchmarks/breaker_checks.py
+# Circuit breaker edge cases in app/mealdb_client.py, against the TheMealDB stub:
+# a half-open trial that ends without an outcome must not keep the circuit open.
+# Exits 1 if a check fails.
+# Usage: python -m benchmarks.breaker_checks
+import asyncio
+import json
+import socket
+import sys
+import time
+
+from .mealdb_stub import MealDBStub
+
+COOLDOWN = 0.05
+
+
+def closed_port_base():
+    """An API base nothing listens on, so every call fails with a ConnectionError."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/json/v1/1"
+
+
+def half_open_client(stub):
+    """A client whose breaker (threshold=1) was opened by one failed call, with the cooldown over."""
+    from app.mealdb_client import MealDBClient, CircuitBreaker
+    breaker = CircuitBreaker(threshold=1, cooldown=COOLDOWN)
+    try:
+        MealDBClient(closed_port_base(), max_retries=0, breaker=breaker).get_json('search.php', params={'s': 'x'})
+    except Exception:
+        pass
+    time.sleep(COOLDOWN * 2)
+    return MealDBClient(stub.api_base, max_retries=0, breaker=breaker)
+
+
+def recovers(client):
+    """True if the next call goes out (and closes the circuit) instead of being short-circuited."""
+    from app.mealdb_client import CircuitOpenError
+    try:
+        client.get_json('search.php', params={'s': 'chicken'})
+    except CircuitOpenError:
+        return False
+    return client.breaker.state == 'closed'
+
+
+def check_trial_past_deadline(stub):
+    """The trial call's deadline has already run out (e.g. it waited in the fan-out pool queue)."""
+    from app.mealdb_client import DeadlineExceeded
+    client = half_open_client(stub)
+    try:
+        client.get_json('search.php', params={'s': 'chicken'}, deadline=time.monotonic() - 1)
+    except DeadlineExceeded:
+        pass
+    return recovers(client)
+
+
+def check_async_trial_cancelled(stub):
+    """The async trial call is cancelled while waiting on upstream (request timeout, client gone)."""
+    from app.mealdb_client import AsyncMealDBClient
+    client = half_open_client(stub)
+    async_client = AsyncMealDBClient(stub.api_base, max_retries=0, breaker=client.breaker)
+
+    async def cancelled_trial():
+        try:
+            await asyncio.wait_for(async_client.get_json('search.php', params={'s': 'chicken'}), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        await async_client.aclose()
+
+    stub.latency = 0.5
+    asyncio.run(cancelled_trial())
+    stub.latency = 0.0
+    return recovers(client)
+
+
+def main():
+    stub = MealDBStub().start()
+    try:
+        checks = {
+            "trial past its deadline releases the half-open slot": check_trial_past_deadline(stub),
+            "cancelled async trial releases the half-open slot": check_async_trial_cancelled(stub),
+        }
+    finally:
+        stub.stop()
+    print(json.dumps({"checks": checks}, indent=2))
+    failed = [name for name, ok in checks.items() if not ok]
+    if failed:
+        print(f"Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
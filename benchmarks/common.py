@@ -0,0 +1,89 @@
+# benchmarks/common.py
+# Helpers shared by the benchmark scripts.
+# Run them from the repo root, e.g.: python -m benchmarks.bench_fulltext
+import os
+import random
+import statistics
+import tempfile
+import time
+
+FOODS = ['chicken', 'garlic', 'lemon', 'onion', 'tomato', 'beef', 'pork', 'rice', 'pasta', 'butter',
+         'flour', 'egg', 'milk', 'cheese', 'basil', 'thyme', 'pepper', 'carrot', 'potato', 'mushroom',
+         'spinach', 'salmon', 'shrimp', 'ginger', 'chili', 'cumin', 'coconut', 'lime', 'honey', 'apple']
+WORDS = ['slowly', 'stir', 'bake', 'simmer', 'chop', 'golden', 'crispy', 'fresh', 'roast', 'grill',
+         'mix', 'season', 'serve', 'warm', 'hot', 'pan', 'oven', 'bowl', 'minutes', 'sauce']
+
+
+def make_app(db_path=None, **env):
+    """Build the real app through create_app() against a fresh SQLite file."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='flavorfind-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ.update({key: str(value) for key, value in env.items()})
+
+    from app import create_app, db
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False # The benchmark clients don't carry CSRF tokens
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def create_user(app, username='bench'):
+    from app import db
+    from app.models import User
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user.user_id
+
+
+def login_as(client, user_id, username='bench'):
+    # Skip the (deliberately slow) password check, just put the user in the session
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['username'] = username
+
+
+def fake_recipe(rng, user_id):
+    foods = rng.sample(FOODS, 6)
+    return {
+        "user_id": user_id,
+        "title": f"{rng.choice(WORDS).title()} {foods[0]} with {foods[1]} #{rng.randrange(10**6)}",
+        "description": ' '.join(rng.choices(WORDS + FOODS, k=15)),
+        "ingredients": '\n'.join(f"{rng.randint(1, 5)} cups {food}" for food in foods),
+        "instructions": ' '.join(rng.choices(WORDS + FOODS, k=80)),
+    }
+
+
+def seed_recipes(app, user_id, count, batch_size=1000, seed=42):
+    """Insert `count` recipes for a user through the ORM (so indexes are maintained)."""
+    from app import db
+    from app.models import Recipe
+    rng = random.Random(seed)
+    with app.app_context():
+        for start in range(0, count, batch_size):
+            db.session.add_all([Recipe(**fake_recipe(rng, user_id)) for _ in range(min(batch_size, count - start))])
+            db.session.commit()
+
+
+def time_calls(fn, repeat):
+    """Call fn() `repeat` times and return the latencies in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {"count": len(ordered), "mean_ms": round(statistics.fmean(ordered), 3),
+            "p50_ms": round(pick(50), 3), "p95_ms": round(pick(95), 3), "p99_ms": round(pick(99), 3)}
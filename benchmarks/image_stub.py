@@ -0,0 +1,88 @@
+# benchmarks/image_stub.py
+# Local image host for the image proxy checks: /<name>.png serves a generated
+# photo-sized PNG (no Pillow needed; the bytes differ per name), /missing.png
+# a 404, /page.html a non-image and /redirect/<name>.png a 302 to /<name>.png.
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def make_png(width=1200, height=900, seed=0):
+    """A noisy gradient, so it compresses about as badly as a photo."""
+    rng = random.Random(seed)
+    noise = bytes(rng.randrange(48) for _ in range(4096))
+    rows = []
+    for y in range(height):
+        row = bytearray(b'\x00') # Filter type: none
+        for x in range(width):
+            n = noise[(x * 7 + y * 13) % len(noise)]
+            row += bytes(((x * 255 // width + n) & 255, (y * 255 // height + n) & 255, (seed * 40 + n) & 255))
+        rows.append(bytes(row))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0) # 8-bit RGB
+    return (b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', header)
+            + _chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + _chunk(b'IEND', b''))
+
+
+def tag_png(png, text):
+    """The same picture with a text chunk added, so every name gets its own bytes (and digest)."""
+    return png[:-12] + _chunk(b'tEXt', b'Comment\x00' + text.encode()) + png[-12:]
+
+
+class ImageStub:
+    """Start with .start(); image URLs are .url('<name>.png'). Counts requests per path in .hits."""
+
+    def __init__(self, latency=0.0, width=1200, height=900):
+        self.latency = latency
+        self.hits = Counter()
+        self._image = make_png(width, height)
+        self._server = None
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_port}/{path}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.hits[self.path] += 1
+                time.sleep(stub.latency)
+                if self.path.startswith('/redirect/'):
+                    self.send_response(302)
+                    self.send_header('Location', self.path[len('/redirect'):])
+                    self.end_headers()
+                elif self.path == '/missing.png':
+                    self.send_response(404)
+                    self.end_headers()
+                elif self.path == '/page.html':
+                    self._send(b'<html></html>', 'text/html')
+                else:
+                    self._send(tag_png(stub._image, self.path), 'image/png')
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,104 @@
+# benchmarks/mealdb_stub.py
+# In-process stand-in for TheMealDB's v1 API, with configurable latency.
+# Serves search.php (s= / f=), filter.php (i=) and lookup.php (i=) from a generated catalog.
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .common import FOODS, WORDS
+
+
+def make_catalog(count=300, seed=7):
+    rng = random.Random(seed)
+    meals = []
+    for i in range(count):
+        ingredients = rng.sample(FOODS, rng.randint(3, 8))
+        meal = {
+            "idMeal": str(52000 + i),
+            "strMeal": f"{rng.choice(WORDS).title()} {ingredients[0].title()} {i}",
+            "strMealThumb": f"https://www.themealdb.com/images/media/meals/{i}.jpg",
+            "strCategory": rng.choice(['Beef', 'Chicken', 'Dessert', 'Seafood', 'Vegetarian']),
+            "strArea": rng.choice(['British', 'Indian', 'Italian', 'Mexican']),
+            "strInstructions": ' '.join(rng.choices(WORDS, k=40)),
+            "strTags": None,
+        }
+        for n in range(1, 21):
+            meal[f"strIngredient{n}"] = ingredients[n - 1] if n <= len(ingredients) else ""
+            meal[f"strMeasure{n}"] = "1 cup" if n <= len(ingredients) else ""
+        meals.append(meal)
+    return meals
+
+
+class MealDBStub:
+    """Start with .start(); point MEALDB_API_BASE at .api_base. `latency` (seconds) can change at any time."""
+
+    def __init__(self, latency=0.0, catalog=None):
+        self.latency = latency
+        self.meals = catalog or make_catalog()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0 # Most calls waiting on the stub at once
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def api_base(self):
+        return f"http://127.0.0.1:{self._server.server_port}/api/json/v1/1"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.calls += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.in_flight -= 1
+                meals = stub.answer(url.path.rsplit('/', 1)[-1], params)
+                if meals is False:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps({"meals": meals or None}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 1024 # Listen backlog for the concurrency benchmarks
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def answer(self, endpoint, params):
+        if endpoint == 'search.php':
+            if 's' in params:
+                return [m for m in self.meals if params['s'].lower() in m["strMeal"].lower()]
+            return [m for m in self.meals if m["strMeal"].lower().startswith(params.get('f', '').lower())]
+        if endpoint == 'filter.php':
+            ingredient = params.get('i', '').lower()
+            return [{"idMeal": m["idMeal"], "strMeal": m["strMeal"], "strMealThumb": m["strMealThumb"]}
+                    for m in self.meals
+                    if any(m[f"strIngredient{n}"].lower() == ingredient for n in range(1, 21))]
+        if endpoint == 'lookup.php':
+            return [m for m in self.meals if m["idMeal"] == params.get('i')]
+        return False
@@ -0,0 +1,71 @@
+# benchmarks/query_counts.py
+# Counts the SQL statements each hot endpoint runs and fails if one goes over budget.
+# Usage: python -m benchmarks.query_counts
+import json
+import sys
+
+from sqlalchemy import event
+
+from .common import make_app, create_user, login_as, seed_recipes
+
+# Statements per request once the user cache is warm
+BUDGETS = {
+    "GET /api/auth/status": 0,
+    "GET /api/recipes/<id>": 1,
+    "GET /api/recipes/<id> (304)": 1,
+    "POST /api/auth/login": 1,
+    # Pages with embedded data, page cache warm: only the version lookup
+    "GET /my-recipes": 1,
+    "GET /recipe/<id>": 1,
+}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+    def measure(self, fn):
+        before = self.count
+        response = fn()
+        assert response.status_code < 400, response.status_code
+        return self.count - before
+
+
+def main():
+    app = make_app()
+    user_id = create_user(app)
+    seed_recipes(app, user_id, 10)
+    from app import db
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    client = app.test_client()
+    login_as(client, user_id)
+    client.get('/api/auth/status') # Warm the user cache
+    etag = client.get('/api/recipes/1').headers['ETag']
+    client.get('/my-recipes') # Warm the page cache
+    client.get('/recipe/1')
+
+    results = {
+        "GET /api/auth/status": counter.measure(lambda: client.get('/api/auth/status')),
+        "GET /api/recipes/<id>": counter.measure(lambda: client.get('/api/recipes/1')),
+        "GET /api/recipes/<id> (304)": counter.measure(
+            lambda: client.get('/api/recipes/1', headers={'If-None-Match': etag})),
+        "POST /api/auth/login": counter.measure(lambda: app.test_client().post(
+            '/api/auth/login', json={"identifier": "bench", "password": "password"})),
+        "GET /my-recipes": counter.measure(lambda: client.get('/my-recipes')),
+        "GET /recipe/<id>": counter.measure(lambda: client.get('/recipe/1')),
+    }
+    print(json.dumps(results, indent=2))
+    over = {name: count for name, count in results.items() if count > BUDGETS[name]}
+    if over:
+        print(f"Over budget: {over}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
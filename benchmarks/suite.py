@@ -0,0 +1,201 @@
+# benchmarks/suite.py
+# End-to-end benchmark suite: login, recipe CRUD, listing at several sizes and external search,
+# through create_app() against seeded SQLite databases and a local TheMealDB stub.
+#
+# Usage:
+#   python -m benchmarks.suite --out results.json
+#   python -m benchmarks.suite --baseline results.json   # exits 1 if something got slower
+#   python -m benchmarks.suite --sizes 10,1000 --repeat 50 # quick run
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+from .common import make_app, create_user, login_as, seed_recipes, time_calls, percentiles
+from .mealdb_stub import MealDBStub
+
+# Settings for every app the suite builds: no rate limits (one client hammers the API on purpose)
+APP_ENV = {
+    "RATE_LIMIT_SEARCH_RATE": 0,
+    "RATE_LIMIT_LOGIN_RATE": 0,
+    "PROFILING_ENABLED": "false",
+}
+
+
+def measure(fn, repeat):
+    """Latency percentiles plus single-client throughput for `repeat` calls of fn()."""
+    samples = time_calls(fn, repeat)
+    result = percentiles(samples)
+    result["throughput_rps"] = round(len(samples) / (sum(samples) / 1000), 1)
+    return result
+
+
+def check(response, *statuses):
+    assert response.status_code in statuses, (response.status_code, response.get_data(as_text=True)[:200])
+    return response
+
+
+def bench_auth_and_crud(stub, repeat):
+    app = make_app(MEALDB_API_BASE=stub.api_base, **APP_ENV)
+    user_id = create_user(app)
+    seed_recipes(app, user_id, 100)
+    results = {}
+
+    results["auth.login"] = measure(lambda: check(app.test_client().post(
+        '/api/auth/login', json={"identifier": "bench", "password": "password"}), 200), max(10, repeat // 10))
+    client = app.test_client()
+    login_as(client, user_id)
+    results["auth.status"] = measure(lambda: check(client.get('/api/auth/status'), 200), repeat)
+
+    recipe = {"title": "Bench soup", "ingredients": "2 cups water\n1 onion\nsalt",
+              "instructions": "Boil the water, add the onion, simmer for 20 minutes."}
+    created = []
+    results["crud.create"] = measure(
+        lambda: created.append(check(client.post('/api/recipes', json=recipe), 201).json["recipe"]["recipe_id"]), repeat)
+    ids = itertools.cycle(created)
+    results["crud.read"] = measure(lambda: check(client.get(f'/api/recipes/{next(ids)}'), 200), repeat)
+    etag = client.get(f'/api/recipes/{created[0]}').headers['ETag']
+    results["crud.read_304"] = measure(
+        lambda: check(client.get(f'/api/recipes/{created[0]}', headers={'If-None-Match': etag}), 304), repeat)
+    counter = itertools.count()
+    results["crud.update"] = measure(lambda: check(client.put(
+        f'/api/recipes/{next(ids)}', json={"title": f"Bench soup {next(counter)}"}), 200), repeat)
+    to_delete = iter(created)
+    results["crud.delete"] = measure(lambda: check(client.delete(f'/api/recipes/{next(to_delete)}'), 200), repeat)
+    return results
+
+
+def bench_listing(size, repeat):
+    app = make_app(**APP_ENV)
+    user_id = create_user(app)
+    started = time.perf_counter()
+    seed_recipes(app, user_id, size)
+    print(f"  seeded {size} recipes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    client = app.test_client()
+    login_as(client, user_id)
+    results = {}
+
+    results[f"list.first_page@{size}"] = measure(lambda: check(client.get('/api/recipes'), 200), repeat)
+    # A page from the middle of the list, reached through the cursors
+    cursor, pages = None, 0
+    while pages < (size // 50) // 2:
+        cursor = client.get('/api/recipes' + (f'?after={cursor}' if cursor else '')).headers.get('X-Next-Cursor')
+        pages += 1
+    deep = '/api/recipes' + (f'?after={cursor}' if cursor else '')
+    results[f"list.deep_page@{size}"] = measure(lambda: check(client.get(deep), 200), repeat)
+    etag = client.get('/api/recipes').headers['ETag']
+    results[f"list.first_page_304@{size}"] = measure(
+        lambda: check(client.get('/api/recipes', headers={'If-None-Match': etag}), 304), repeat)
+    results[f"search.personal@{size}"] = measure(lambda: check(client.get('/api/recipes?q=garlic lemon'), 200), repeat)
+    return results
+
+
+def bench_external(stub, repeat):
+    app = make_app(MEALDB_API_BASE=stub.api_base, **APP_ENV)
+    client = app.test_client()
+    results = {}
+    foods = ['chicken', 'garlic', 'lemon', 'onion', 'rice', 'beef']
+
+    distinct = itertools.count()
+    results["external.search_uncached"] = measure(
+        lambda: check(client.get(f'/api/recipes/search?query=q{next(distinct)}'), 200), repeat)
+    check(client.get('/api/recipes/search?query=chicken'), 200)
+    results["external.search_cached"] = measure(
+        lambda: check(client.get('/api/recipes/search?query=chicken'), 200), repeat)
+    # Three ingredients, all uncached: a fresh app per call would be slow, so clear the cache instead
+    cache = app.extensions['mealdb_cache']
+
+    def multi():
+        cache.invalidate()
+        check(client.get(f'/api/recipes/search?ingredient={",".join(foods[:3])}&match=any'), 200)
+
+    results["external.multi_ingredient_uncached"] = measure(multi, max(10, repeat // 4))
+    return results
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    from app.json_provider import orjson
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlite": sqlite3.sqlite_version,
+        "json": "orjson" if orjson else "json",
+        "sizes": args.sizes,
+        "repeat": args.repeat,
+        "mealdb_latency_ms": args.mealdb_latency * 1000,
+    }
+
+
+def compare(results, baseline, tolerance, floor_ms, checked=('p50_ms',)):
+    """Print a comparison and return the names of scenarios that got slower than the tolerance allows."""
+    regressions = []
+    print(f"{'scenario':45} {'p50 base':>9} {'p50 now':>9} {'p95 base':>9} {'p95 now':>9}", file=sys.stderr)
+    for name, now in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        flag = ''
+        for key in checked:
+            if now[key] > base[key] * (1 + tolerance) and now[key] - base[key] > floor_ms:
+                flag = '  <-- slower'
+        if flag:
+            regressions.append(name)
+        print(f"{name:45} {base['p50_ms']:9.2f} {now['p50_ms']:9.2f} {base['p95_ms']:9.2f} {now['p95_ms']:9.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,1000,50000', help='Recipe counts for the listing benchmarks.')
+    parser.add_argument('--repeat', type=int, default=200, help='Calls per scenario.')
+    parser.add_argument('--mealdb-latency', type=float, default=0.05, help='Seconds the TheMealDB stub takes per call.')
+    parser.add_argument('--out', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare with an earlier --out file; exit 1 on regressions.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown before flagging, e.g. 0.25 = 25%%.')
+    parser.add_argument('--floor-ms', type=float, default=0.5, help='Ignore differences smaller than this.')
+    parser.add_argument('--check', action='append', choices=['p50_ms', 'p95_ms', 'p99_ms'],
+                        help='Percentiles compared with the baseline (default p50_ms; tails need a large --repeat).')
+    args = parser.parse_args()
+
+    stub = MealDBStub(latency=args.mealdb_latency).start()
+    results = {}
+    print("auth + crud", file=sys.stderr)
+    results.update(bench_auth_and_crud(stub, args.repeat))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        print(f"listing @ {size}", file=sys.stderr)
+        results.update(bench_listing(size, args.repeat))
+    print("external search", file=sys.stderr)
+    results.update(bench_external(stub, args.repeat))
+    stub.stop()
+
+    report = {"environment": environment(args), "results": results}
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.floor_ms, args.check or ['p50_ms'])
+        if regressions:
+            print(f"Slower than baseline: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()